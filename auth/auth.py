@@ -4,15 +4,13 @@ import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
-import bcrypt  # type: ignore[import-not-found]
 from dotenv import load_dotenv
 
+from . import hashing
 from .exceptions import ConfirmCodeError, InvalidCredentialsError
 from log.logger import log
 
 
-
-
 class Auth:
     current_user: str | None = None
     confirmation_code: str | None = None
@@ -25,11 +23,11 @@ class Auth:
 
     @staticmethod
     def hash_password(password: str) -> str:
-        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+        return hashing.hash_password(password)
 
     @staticmethod
     def check_password(stored_hash: str, password: str) -> bool:
-        return bcrypt.checkpw(password.encode("utf-8"), stored_hash.encode("utf-8"))
+        return hashing.check_password(stored_hash, password)
 
     @staticmethod
     def verify_email_exists(email: str) -> bool:
@@ -67,6 +65,7 @@ class Auth:
     @staticmethod
     def check_user_name_exists(username: str):
         from database.utils import Utils as Db_utils
+
         if Db_utils.get_user_by_username(username):
             log.log("ERROR", f"Username '{username}' is already taken")
             return True
@@ -74,10 +73,10 @@ class Auth:
     @staticmethod
     def check_email_exists(email: str):
         from database.utils import Utils as Db_utils
-        if email in Db_utils.get_all_emails():
+
+        if Db_utils.get_username_by_email(email) is not None:
             log.log("ERROR", f"Email '{email}' is already taken")
             return True
-        
 
     @staticmethod
     def register_user(username: str, email: str, password: str, user_code: str) -> None:
@@ -95,16 +94,37 @@ class Auth:
     def login_user(identifier: str, password: str) -> None:
         from database.utils import Utils as Db_utils
 
-        user_password = Db_utils.get_user_password(identifier)
+        record = Db_utils.get_user_record(identifier)
+        stored_hash = Db_utils.get_user_password(identifier)
 
-        if Auth.check_password(user_password, password):
-            log.log("INFO", f"User '{identifier}' logged in successfully.")
-            Auth.current_user = identifier
-            Auth.ENCRYPTION_KEY_USER = f"ENCRYPTION_KEY_{identifier}"
+        if record is not None and Auth.check_password(stored_hash, password):
+            from security.user_key import session_keys
+
+            if hashing.needs_rehash(stored_hash):
+                # The password is at hand only now, so an old cost factor is upgraded on login.
+                Db_utils.update_user_password(record.username, Auth.hash_password(password))
+                log.log("INFO", f"Rehashed the password of '{record.username}' at {hashing.BCRYPT_ROUNDS} rounds.")
+            log.log("INFO", f"User '{record.username}' logged in successfully.")
+            Auth.current_user = record.username
+            Auth.ENCRYPTION_KEY_USER = f"ENCRYPTION_KEY_{record.username}"
+            session_keys.open(record.username)
         else:
             log.log("ERROR", "Invalid credentials")
             raise InvalidCredentialsError("Invalid username/email or password")
 
+    @staticmethod
+    def logout_user() -> None:
+        from database.utils import Utils as Db_utils
+        from expenses.repository import expense_repository
+        from security.user_key import session_keys
+
+        log.log("INFO", f"User '{Auth.current_user}' logged out.")
+        Auth.current_user = None
+        Auth.ENCRYPTION_KEY_USER = None
+        session_keys.clear()
+        expense_repository.clear()
+        Db_utils.forget_user_record()
+
     @staticmethod
     def verify_confirmation_code(email: str, code: str) -> bool:
         if Auth.confirmation_code is None:
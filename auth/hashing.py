@@ -0,0 +1,64 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+bcrypt on a small process pool, so hashing a password never holds the caller's interpreter.
+
+The cost factor comes from ``BCRYPT_ROUNDS`` (default 12); ``calibrate_rounds`` picks one for a
+target latency on the current machine, see ``benchmarks/bench_bcrypt_cost.py``.
+"""
+
+import os
+import time
+
+import bcrypt  # type: ignore[import-not-found]
+
+from workers import SpawnPool
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+MIN_ROUNDS, MAX_ROUNDS = 4, 31  # what bcrypt accepts
+MAX_WORKERS = min(2, os.cpu_count() or 1)
+
+_pool = SpawnPool(MAX_WORKERS)
+
+
+def _hash(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password: bytes, stored_hash: bytes) -> bool:
+    return bcrypt.checkpw(password, stored_hash)
+
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    return _pool.get().submit(_hash, password.encode("utf-8"), rounds).result().decode("utf-8")
+
+
+def check_password(stored_hash: str, password: str) -> bool:
+    return _pool.get().submit(_check, password.encode("utf-8"), stored_hash.encode("utf-8")).result()
+
+
+def hash_rounds(stored_hash: str) -> int:
+    """The cost factor of a ``$2b$<rounds>$...`` hash."""
+    return int(stored_hash.split("$")[2])
+
+
+def needs_rehash(stored_hash: str, rounds: int = BCRYPT_ROUNDS) -> bool:
+    return hash_rounds(stored_hash) != rounds
+
+
+def calibrate_rounds(target_seconds: float, samples: int = 3) -> dict[int, float]:
+    """
+    Time one hash per cost factor, from the cheapest up, until a cost takes longer than
+    ``target_seconds``; return the best of ``samples`` timings per measured cost.
+    """
+    timings: dict[int, float] = {}
+    for rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+        best = float("inf")
+        for _ in range(samples):
+            began = time.perf_counter()
+            _hash(b"calibration", rounds)
+            best = min(best, time.perf_counter() - began)
+        timings[rounds] = best
+        if best > target_seconds:
+            break
+    return timings
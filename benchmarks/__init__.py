@@ -0,0 +1 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
@@ -0,0 +1,93 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+import os
+import random
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from auth import Auth
+from database.connection import db
+from database.create_database import DEFAULT_CATEGORIES, create_full_database
+from database.dates import DATE_FORMAT
+from database.money import to_minor
+from database.rollup import rebuild_monthly_totals
+from database.utils import Utils
+from security.key import ensure_encryption_key
+from security.user_key import ensure_user_encryption_key, generate_salt_bytes
+from security.utils import get_row_cipher, get_user_cipher, reload_encryption_key
+
+PASSWORD = "Benchmark#2025"  # noqa: S105
+HISTORY_DAYS = 10 * 365
+LAST_DAY = date(2025, 12, 31).toordinal()
+
+
+@contextmanager
+def workspace() -> Iterator[Path]:
+    """Run the block inside a throwaway directory with its own .env and database."""
+    previous_cwd = Path.cwd()
+    previous_path = db.path
+    with tempfile.TemporaryDirectory(prefix="tracker-bench-") as tmp:
+        os.chdir(tmp)
+        Path(".env").write_text("")
+        db.configure(path=str(Path(tmp) / "tracker.db"))
+        try:
+            ensure_encryption_key()
+            load_dotenv(".env", override=True)
+            reload_encryption_key()
+            create_full_database()
+            yield Path(tmp)
+        finally:
+            db.configure(path=previous_path)
+            os.chdir(previous_cwd)
+
+
+def create_user(username: str = "bench_user") -> str:
+    Utils.add_user(username, f"{username}@example.com", Auth.hash_password(PASSWORD), generate_salt_bytes())
+    ensure_user_encryption_key(username)
+    Auth.current_user = username
+    return username
+
+
+def fill_expenses(username: str, rows: int, batch: int = 50_000, *, legacy: bool = False) -> None:
+    """
+    Replace the user's history with ``rows`` expenses spread over the last ten years.
+
+    Rows are sealed into ``payload`` like the app writes them, or with ``legacy=True``
+    stored as the old pair of Fernet tokens. Encrypting a million distinct tokens would
+    dominate the setup, so legacy rows draw from pools of pre-encrypted amounts and
+    dates; decrypting them costs the same.
+    """
+    cipher, row_cipher = get_user_cipher(username), get_row_cipher(username)
+    first_day = LAST_DAY - HISTORY_DAYS + 1
+    day_tokens = {
+        day: cipher.encrypt(date.fromordinal(day).strftime(DATE_FORMAT).encode()).decode()
+        for day in range(first_day, LAST_DAY + 1)
+    }
+    amounts = [round(random.uniform(1, 5000), 2) for _ in range(1000)]
+    amount_tokens = [(cipher.encrypt(str(amount).encode()).decode(), to_minor(amount)) for amount in amounts]
+    Utils.clear_table(username, categories=False)
+    with db.connection() as conn:
+        user_id = conn.execute("SELECT user_id FROM users WHERE username = ?", (username,)).fetchone()[0]
+    for offset in range(0, rows, batch):
+        values = []
+        for _ in range(min(batch, rows - offset)):
+            day = random.randint(first_day, LAST_DAY)
+            category = random.choice(DEFAULT_CATEGORIES)
+            amount_token, amount_minor = random.choice(amount_tokens)
+            if legacy:
+                encrypted = (None, amount_token, day_tokens[day])
+            else:
+                encrypted = (row_cipher.seal(user_id, amount_minor, day), None, None)
+            values.append((user_id, category, *encrypted, day, amount_minor))
+        with db.connection() as conn:
+            conn.executemany(
+                "INSERT INTO expenses (user_id, category, payload, amount, expense_date, expense_day, amount_minor) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                values,
+            )
+    rebuild_monthly_totals(user_id)
@@ -0,0 +1,124 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+Aggregate a synthetic ten-year history with loops over expense dicts (the shape ``Utils.get_user_expenses``
+returns and the views used to sum) and with ``expenses.analytics.ExpenseColumns``, then time the
+``expenses.reports.TrendReport`` queries the "Тренди" tab makes when the window or period changes.
+
+No database is involved: both sides start from rows already in memory. Column building is timed separately.
+
+Run from the repository root: ``python -m benchmarks.bench_analytics [rows ...]``
+"""
+
+import random
+import sys
+import time
+from collections.abc import Callable
+from datetime import date, timedelta
+from typing import Any
+
+from database.create_database import DEFAULT_CATEGORIES
+from database.dates import day_datetime
+from database.money import from_minor
+from expenses.analytics import ExpenseColumns
+from expenses.reports import TrendReport
+from ._common import HISTORY_DAYS, LAST_DAY
+
+SIZES = [100_000, 1_000_000]
+QUARTER = (date(2025, 1, 1), date(2025, 3, 31))
+
+
+def by_month_and_category(expenses: list[dict[str, Any]]) -> dict[tuple[int, int], dict[str, float]]:
+    totals: dict[tuple[int, int], dict[str, float]] = {}
+    for expense in expenses:
+        month = totals.setdefault((expense["date"].year, expense["date"].month), {})
+        month[expense["category"]] = month.get(expense["category"], 0) + expense["amount"]
+    return totals
+
+
+def by_week(expenses: list[dict[str, Any]]) -> dict[date, float]:
+    totals: dict[date, float] = {}
+    for expense in expenses:
+        monday = expense["date"].date() - timedelta(days=expense["date"].weekday())
+        totals[monday] = totals.get(monday, 0) + expense["amount"]
+    return totals
+
+
+def by_year(expenses: list[dict[str, Any]]) -> dict[int, float]:
+    totals: dict[int, float] = {}
+    for expense in expenses:
+        totals[expense["date"].year] = totals.get(expense["date"].year, 0) + expense["amount"]
+    return totals
+
+
+def quarter_sum(expenses: list[dict[str, Any]]) -> float:
+    start, end = (day_datetime(day.toordinal()) for day in QUARTER)
+    return sum(expense["amount"] for expense in expenses if start <= expense["date"] <= end)
+
+
+def timed(func: Callable[[], Any], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        began = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - began)
+    return best
+
+
+def compare(size: int) -> None:
+    first_day = LAST_DAY - HISTORY_DAYS + 1
+    rows = [
+        (random.choice(DEFAULT_CATEGORIES), random.randint(100, 500_000), random.randint(first_day, LAST_DAY))
+        for _ in range(size)
+    ]
+    expenses = [
+        {"expense_id": i, "amount": from_minor(minor), "category": category, "date": day_datetime(day)}
+        for i, (category, minor, day) in enumerate(rows)
+    ]
+    began = time.perf_counter()
+    columns = ExpenseColumns(rows)
+    for period in ("week", "month", "year"):
+        columns.period_keys(period)
+    build = time.perf_counter() - began
+    print(f"{size:>10,} {'build columns and keys':>22} {'':>10} {build * 1000:>10.1f}")
+    cases = [
+        (
+            "month x category",
+            lambda: by_month_and_category(expenses),
+            lambda: columns.totals_by_period_and_category("month"),
+        ),
+        ("week", lambda: by_week(expenses), lambda: columns.totals_by_period("week")),
+        ("year", lambda: by_year(expenses), lambda: columns.totals_by_period("year")),
+        ("quarter sum", lambda: quarter_sum(expenses), lambda: columns.range_sum(*QUARTER)),
+    ]
+    for name, loop, vectorised in cases:
+        loop_time, numpy_time = timed(loop), timed(vectorised)
+        print(
+            f"{size:>10,} {name:>22} {loop_time * 1000:>10.1f} {numpy_time * 1000:>10.2f} "
+            f"{loop_time / numpy_time:>8.0f}x"
+        )
+
+    report_build = timed(lambda: TrendReport(columns), repeat=1)
+    report = TrendReport(columns)
+    print(f"{size:>10,} {'build trend report':>22} {'':>10} {report_build * 1000:>10.2f}")
+    switches = [
+        ("12 weeks", lambda: report.weekly_totals(12)),
+        ("years", report.yearly_totals),
+        ("3-month average", lambda: report.rolling_average(3, 2025, 12)),
+        ("12-month average", lambda: report.rolling_average(12, 2025, 12)),
+        ("year over year", lambda: report.year_over_year(2025, 12)),
+        ("apply one expense", lambda: report.apply(DEFAULT_CATEGORIES[0], 100, LAST_DAY)),
+    ]
+    for name, query in switches:
+        print(f"{size:>10,} {name:>22} {'':>10} {timed(query) * 1000:>10.3f}")
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f"{'rows':>10} {'aggregation':>22} {'dicts, ms':>10} {'numpy, ms':>10} {'speed-up':>9}")
+    for size in sizes:
+        compare(size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+Pick the bcrypt cost factor for this machine: the highest ``BCRYPT_ROUNDS`` whose hash
+still fits in the target latency (milliseconds, default 250).
+
+Run from the repository root: ``python -m benchmarks.bench_bcrypt_cost [target_ms]``
+"""
+
+import sys
+
+from auth import hashing
+
+TARGET_MS = 250.0
+
+
+def main() -> None:
+    target_ms = float(sys.argv[1]) if len(sys.argv) > 1 else TARGET_MS
+    timings = hashing.calibrate_rounds(target_ms / 1000)
+    print(f"{'rounds':>6} {'hash, ms':>9}")
+    for rounds, seconds in timings.items():
+        print(f"{rounds:>6} {seconds * 1000:>9.1f}")
+    fitting = [rounds for rounds, seconds in timings.items() if seconds <= target_ms / 1000]
+    chosen = max(fitting, default=hashing.MIN_ROUNDS)
+    print(f"BCRYPT_ROUNDS={chosen}  # current: {hashing.BCRYPT_ROUNDS}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+Count SQLite connects per user action.
+
+"before" opens a fresh connection for every statement, the way ``Utils`` used to;
+"after" uses the shared per-thread connection of ``database.connection.db``.
+
+Run from the repository root: ``python -m benchmarks.bench_connections``
+"""
+
+from collections.abc import Callable
+
+from auth import Auth
+from database.connection import db
+from database.utils import Utils
+from expenses import Expense
+from ._common import PASSWORD, create_user, workspace
+
+REPEATS = 20
+
+
+def login(username: str) -> None:
+    Utils.get_user_status(username)
+    Auth.login_user(username, PASSWORD)
+    Expense.get_all_user_expenses()
+
+
+def add_expense(_username: str) -> None:
+    Expense.add_expense("Транспорт", 42.5, "01/02/2025")
+
+
+def connects_per_action(action: Callable[[str], None], username: str, *, persistent: bool) -> float:
+    db.configure(persistent=persistent)
+    action(username)  # warm-up: the persistent mode opens its thread connection here
+    start = db.connects
+    for _ in range(REPEATS):
+        action(username)
+    return (db.connects - start) / REPEATS
+
+
+def main() -> None:
+    with workspace():
+        username = create_user()
+        print(f"{'action':<12} {'before':>8} {'after':>8}")
+        for name, action in (("login", login), ("add expense", add_expense)):
+            before = connects_per_action(action, username, persistent=False)
+            after = connects_per_action(action, username, persistent=True)
+            print(f"{name:<12} {before:>8.1f} {after:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
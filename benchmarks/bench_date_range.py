@@ -0,0 +1,46 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+Time one month of expenses (what ``MonthlyStatsView`` asks for on every month switch).
+
+"before" loads and decrypts the whole history and filters it in Python, the way
+``Expense.get_expenses_by_date_range`` used to; "after" is the range query of
+``Utils.get_user_expenses_by_date_range``.
+
+Run from the repository root: ``python -m benchmarks.bench_date_range [rows ...]``
+"""
+
+import sys
+import time
+from datetime import UTC, date, datetime
+
+from database.utils import Utils
+from ._common import LAST_DAY, create_user, fill_expenses, workspace
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    last = date.fromordinal(LAST_DAY)
+    start, end = datetime(last.year, last.month, 1, tzinfo=UTC), datetime(last.year, last.month, last.day, tzinfo=UTC)
+    with workspace():
+        username = create_user()
+        print(f"{'rows':>10} {'month rows':>11} {'before, s':>10} {'after, s':>10}")
+        for size in sizes:
+            fill_expenses(username, size)
+
+            began = time.perf_counter()
+            before = [e for e in Utils.get_user_expenses(username) if start <= e["date"] <= end]
+            before_time = time.perf_counter() - began
+
+            began = time.perf_counter()
+            after = Utils.get_user_expenses_by_date_range(username, start, end)
+            after_time = time.perf_counter() - began
+
+            assert len(before) == len(after)
+            print(f"{size:>10,} {len(after):>11,} {before_time:>10.3f} {after_time:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
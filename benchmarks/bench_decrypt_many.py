@@ -0,0 +1,73 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+Time a cold load of the whole history: fetch the rows and decrypt and parse both columns.
+
+The history is stored as legacy Fernet tokens. "row loop" is the old per-row ``decrypt``
++ ``strptime`` loop; the other columns are ``Utils.decode_rows`` without a pool and with
+the thread and process pools. The process
+pool is warmed up first so the one-off worker start-up is not counted.
+
+Run from the repository root: ``python -m benchmarks.bench_decrypt_many [rows ...]``
+"""
+
+import os
+import sys
+import time
+from datetime import UTC, datetime
+
+from database.connection import db
+from database.dates import DATE_FORMAT
+from database.utils import EXPENSE_COLUMNS, Utils
+from security.utils import decrypt_many, get_user_cipher
+from ._common import create_user, fill_expenses, workspace
+
+SIZES = [100_000, 1_000_000]
+POOLS = ["none", "thread", "process"]
+
+
+def _fetch(username: str) -> list[tuple]:
+    with db.connection() as conn:
+        return conn.execute(
+            f"SELECT {EXPENSE_COLUMNS} FROM expenses WHERE user_id = (SELECT user_id FROM users WHERE username = ?)",
+            (username,),
+        ).fetchall()
+
+
+def _row_loop(username: str) -> list[dict]:
+    cipher = get_user_cipher(username)
+    return [
+        {
+            "expense_id": expense_id,
+            "amount": float(cipher.decrypt(amount.encode()).decode()),
+            "category": category,
+            "date": datetime.strptime(cipher.decrypt(date.encode()).decode(), DATE_FORMAT).replace(tzinfo=UTC),
+        }
+        for expense_id, _, category, _, amount, date in _fetch(username)
+    ]
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    with workspace():
+        username = create_user()
+        cipher = get_user_cipher(username)
+        decrypt_many([[cipher.encrypt(b"0").decode()]], cipher, pool="process", threshold=0)
+        print(f"cpus: {os.cpu_count()}")
+        print(f"{'rows':>10} {'row loop, s':>12}" + "".join(f" {pool + ', s':>11}" for pool in POOLS))
+        for size in sizes:
+            fill_expenses(username, size, legacy=True)
+
+            began = time.perf_counter()
+            expected = _row_loop(username)
+            timings = [time.perf_counter() - began]
+            for pool in POOLS:
+                began = time.perf_counter()
+                decoded = Utils.decode_rows(_fetch(username), username, pool=pool, threshold=0)
+                timings.append(time.perf_counter() - began)
+                assert decoded == expected
+            print(f"{size:>10,} {timings[0]:>12.2f}" + "".join(f" {t:>11.2f}" for t in timings[1:]))
+
+
+if __name__ == "__main__":
+    main()
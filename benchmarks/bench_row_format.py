@@ -0,0 +1,49 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+Compare the legacy pair of Fernet tokens per expense with the sealed AES-GCM ``payload``:
+database file size after ``VACUUM`` and single-threaded decode throughput of ``Utils.decode_rows``.
+
+Run from the repository root: ``python -m benchmarks.bench_row_format [rows ...]``
+"""
+
+import sys
+import time
+from pathlib import Path
+
+from database.connection import db
+from database.utils import EXPENSE_COLUMNS, Utils
+from ._common import create_user, fill_expenses, workspace
+
+SIZES = [100_000, 1_000_000]
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    with workspace():
+        username = create_user()
+        print(f"{'rows':>10} {'format':>7} {'db, MiB':>8} {'bytes/row':>10} {'decode, s':>10} {'rows/s':>10}")
+        for size in sizes:
+            for legacy in (True, False):
+                fill_expenses(username, size, legacy=legacy)
+                with db.connection() as conn:
+                    conn.execute("VACUUM")
+                with db.connection() as conn:
+                    # Under WAL the vacuumed pages sit in the -wal file until they are checkpointed.
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                db_size = Path(db.path).stat().st_size
+                with db.connection() as conn:
+                    rows = conn.execute(f"SELECT {EXPENSE_COLUMNS} FROM expenses").fetchall()
+
+                began = time.perf_counter()
+                Utils.decode_rows(rows, username, pool="none")
+                elapsed = time.perf_counter() - began
+
+                print(
+                    f"{size:>10,} {'fernet' if legacy else 'sealed':>7} {db_size / 2**20:>8.1f} "
+                    f"{db_size / size:>10.0f} {elapsed:>10.2f} {size / elapsed:>10,.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+Insert and read throughput of an expense-shaped table under each storage profile.
+
+Inserts commit one row at a time, the way ``Utils.add_expense`` does; the
+baseline row uses SQLite's defaults (rollback journal, synchronous=FULL).
+
+Run from the repository root: ``python -m benchmarks.bench_storage_profiles``
+"""
+
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from database.connection import PROFILES, ConnectionManager
+
+ROWS = 2_000
+READS = 20_000
+PAYLOAD = "gAAAAA" + "x" * 94  # roughly the size of a Fernet token
+
+
+class _DefaultsManager(ConnectionManager):
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=self.cached_statements)
+        self._open_connections.append(conn)
+        return conn
+
+
+def run(manager: ConnectionManager) -> tuple[float, float]:
+    with manager.connection() as conn:
+        conn.execute(
+            "CREATE TABLE expenses (expense_id INTEGER PRIMARY KEY, category TEXT, amount TEXT, expense_date TEXT)"
+        )
+
+    start = time.perf_counter()
+    for _ in range(ROWS):
+        with manager.connection() as conn:
+            conn.execute(
+                "INSERT INTO expenses (category, amount, expense_date) VALUES (?, ?, ?)", ("Дім", PAYLOAD, PAYLOAD)
+            )
+    inserts = ROWS / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with manager.connection() as conn:
+        for i in range(READS):
+            conn.execute("SELECT amount, expense_date FROM expenses WHERE expense_id = ?", (i % ROWS + 1,)).fetchone()
+    reads = READS / (time.perf_counter() - start)
+    return inserts, reads
+
+
+def main() -> None:
+    print(f"{'profile':<10} {'inserts/s':>12} {'reads/s':>12}")
+    with tempfile.TemporaryDirectory(prefix="tracker-bench-") as tmp:
+        managers = {"defaults": _DefaultsManager(str(Path(tmp) / "defaults.db"))}
+        managers.update({name: ConnectionManager(str(Path(tmp) / f"{name}.db"), profile=name) for name in PROFILES})
+        for name, manager in managers.items():
+            inserts, reads = run(manager)
+            manager.close_all()
+            print(f"{name:<10} {inserts:>12,.0f} {reads:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+Time per-field decryption with and without the session key cache.
+
+"before" clears ``session_keys``, so every ``decrypt_data_user`` call looks up the
+wrapped key and the user's id and salt and re-derives the key, as it did before
+the cache; "after" opens the session the way ``Auth.login_user`` does.
+
+Run from the repository root: ``python -m benchmarks.bench_user_key_cache [fields]``
+"""
+
+import sys
+import time
+
+from security.user_key import session_keys
+from security.utils import decrypt_data_user, encrypt_data_user
+from ._common import create_user, workspace
+
+FIELDS = 2_000
+
+
+def _time_per_field(tokens: list[str]) -> float:
+    began = time.perf_counter()
+    for token in tokens:
+        decrypt_data_user(token)
+    return (time.perf_counter() - began) / len(tokens)
+
+
+def main() -> None:
+    fields = int(sys.argv[1]) if len(sys.argv) > 1 else FIELDS
+    with workspace():
+        username = create_user()
+        session_keys.open(username)
+        tokens = [encrypt_data_user(str(i)) for i in range(fields)]
+
+        session_keys.clear()
+        before = _time_per_field(tokens)
+        session_keys.open(username)
+        after = _time_per_field(tokens)
+        session_keys.clear()
+
+    print(f"{'fields':>8} {'before, us/field':>17} {'after, us/field':>16} {'speedup':>8}")
+    print(f"{fields:>8,} {before * 1e6:>17.1f} {after * 1e6:>16.1f} {before / after:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+Time ``security.integrity.scan_database`` over one user's sealed history on each decrypt pool.
+
+Run from the repository root: ``python -m benchmarks.bench_verify [rows ...]``
+"""
+
+import os
+import sys
+import time
+
+from security.integrity import scan_database
+from ._common import create_user, fill_expenses, workspace
+
+SIZES = [100_000, 1_000_000]
+POOLS = ["none", "thread", "process"]
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f"CPUs: {os.cpu_count()}")
+    with workspace():
+        username = create_user()
+        print(f"{'rows':>10} {'pool':>8} {'scan, s':>8} {'rows/s':>10}")
+        for size in sizes:
+            fill_expenses(username, size)
+            for pool in POOLS:
+                began = time.perf_counter()
+                report = scan_database(pool=pool)
+                elapsed = time.perf_counter() - began
+                assert report.ok, report
+                print(f"{size:>10,} {pool:>8} {elapsed:>8.2f} {size / elapsed:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
 # Copyright (c) 2025 ililihayy. All rights reserved.
 
+from .aio import AsyncUtils, run_blocking
+from .connection import ConnectionManager, db
 from .utils import Utils
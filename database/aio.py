@@ -0,0 +1,40 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+import asyncio
+import functools
+import os
+from collections.abc import Callable, Coroutine
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from .utils import Utils
+
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+# SQLite, bcrypt and Fernet calls block; a small pool keeps them off the Flet event loop
+# without letting a burst of clicks start an unbounded number of threads.
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tracker-io")
+
+
+async def run_blocking(func: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+class AsyncFacade:
+    """Awaitable mirror of a class of static methods: ``await AsyncUtils.get_user_status(name)``."""
+
+    def __init__(self, target: type):
+        self._target = target
+
+    def __getattr__(self, name: str) -> Callable[..., Coroutine[Any, Any, Any]]:
+        func = getattr(self._target, name)
+
+        @functools.wraps(func)
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await run_blocking(func, *args, **kwargs)
+
+        return call
+
+
+AsyncUtils = AsyncFacade(Utils)
@@ -0,0 +1,165 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+import os
+import sqlite3
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from log.logger import log
+
+DATABASE = os.getenv("TRACKER_DB", "tracker.db")
+CACHED_STATEMENTS = 256
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    """PRAGMA settings applied to every new connection."""
+
+    journal_mode: str
+    synchronous: str
+    cache_size: int  # negative values are KiB, positive values are pages
+    mmap_size: int
+    temp_store: str
+    busy_timeout: int  # milliseconds
+
+    def apply(self, conn: sqlite3.Connection) -> None:
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout}")
+        conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA cache_size = {self.cache_size}")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        conn.execute(f"PRAGMA temp_store = {self.temp_store}")
+
+
+PROFILES = {
+    # WAL with an fsync on every commit: a committed expense survives a power loss.
+    "durable": StorageProfile(
+        journal_mode="WAL",
+        synchronous="FULL",
+        cache_size=-16_000,
+        mmap_size=64 * 1024 * 1024,
+        temp_store="MEMORY",
+        busy_timeout=5_000,
+    ),
+    # WAL syncs only at checkpoints: safe against app crashes, the last commits may be lost on power loss.
+    "fast": StorageProfile(
+        journal_mode="WAL",
+        synchronous="NORMAL",
+        cache_size=-64_000,
+        mmap_size=256 * 1024 * 1024,
+        temp_store="MEMORY",
+        busy_timeout=5_000,
+    ),
+}
+DEFAULT_PROFILE = os.getenv("TRACKER_DB_PROFILE", "durable")
+
+
+def get_profile(name: str) -> StorageProfile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown storage profile '{name}', expected one of {sorted(PROFILES)}") from None
+
+
+class ConnectionManager:
+    """
+    Hands out one long-lived SQLite connection per thread.
+
+    ``connection()`` is re-entrant: nested blocks on the same thread share the
+    outer transaction, which is committed (or rolled back) only when the
+    outermost block exits.
+    """
+
+    def __init__(
+        self,
+        path: str = DATABASE,
+        *,
+        profile: str = DEFAULT_PROFILE,
+        persistent: bool = True,
+        cached_statements: int = CACHED_STATEMENTS,
+    ):
+        self.path = path
+        self.profile = get_profile(profile)
+        self.persistent = persistent
+        self.cached_statements = cached_statements
+        self.connects = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open_connections: list[sqlite3.Connection] = []
+
+    def configure(
+        self,
+        path: str | None = None,
+        *,
+        profile: str | None = None,
+        persistent: bool | None = None,
+        cached_statements: int | None = None,
+    ) -> None:
+        """Change the settings and drop every connection opened with the old ones."""
+        self.close_all()
+        if path is not None:
+            self.path = path
+        if profile is not None:
+            self.profile = get_profile(profile)
+        if persistent is not None:
+            self.persistent = persistent
+        if cached_statements is not None:
+            self.cached_statements = cached_statements
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=self.cached_statements)
+        self.profile.apply(conn)
+        with self._lock:
+            self.connects += 1
+            if self.persistent:
+                self._open_connections.append(conn)
+        return conn
+
+    def _thread_connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        if not self.persistent:
+            conn = self._open()
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+            return
+
+        conn = self._thread_connection()
+        outermost = self._local.depth == 0
+        self._local.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            if outermost:
+                conn.rollback()
+            raise
+        else:
+            if outermost:
+                conn.commit()
+        finally:
+            self._local.depth -= 1
+
+    def close_all(self) -> None:
+        with self._lock:
+            connections, self._open_connections = self._open_connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as err:
+                log.log("WARNING", f"Failed to close database connection: {err}")
+        self._local = threading.local()
+
+
+db = ConnectionManager()
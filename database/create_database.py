@@ -1,38 +1,19 @@
 # Copyright (c) 2025 ililihayy. All rights reserved.
 
-import sqlite3
-
+from .connection import db
+from .migrations import migrate
 from log.logger import log
 
-path = "tracker.db"  # дефолт на випадок відсутності змінної
+DEFAULT_CATEGORIES = ["Харчування", "Здоров'я", "Транспорт", "Дім", "Розваги", "Одяг", "Секретні витрати"]
 
 
 def create_full_database() -> None:
     create_users_table()
-
-
-def create_user_expenses_table(username: str) -> None:
-    table_name = f"expenses_{username}"
-    with sqlite3.connect(path, check_same_thread=False) as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            f"""
-            CREATE TABLE IF NOT EXISTS {table_name} (
-                expense_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                category TEXT NOT NULL,
-                amount TEXT NOT NULL,
-                expense_date TEXT NOT NULL,
-                FOREIGN KEY (category) REFERENCES categories_{username} (name)
-            )
-            """
-        )
-        conn.commit()
-    log.log("INFO", f"Create expenses table for username {username}")
-    create_user_categories_table(username)
+    migrate()
 
 
 def create_users_table() -> None:
-    with sqlite3.connect(path, check_same_thread=False) as conn:
+    with db.connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             """
@@ -46,35 +27,16 @@ def create_users_table() -> None:
             )
             """
         )
-        conn.commit()
     log.log("INFO", "Create users table")
 
 
-def create_user_categories_table(username: str) -> None:
-    table_name = f"categories_{username}"
-    with sqlite3.connect(path, check_same_thread=False) as conn:
+def insert_user_default_categories(user_id: int) -> None:
+    with db.connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            f"""
-            CREATE TABLE IF NOT EXISTS {table_name} (
-                category_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL
-            )
-            """
+        cursor.executemany(
+            "INSERT OR IGNORE INTO categories (user_id, name) VALUES (?, ?)",
+            [(user_id, category) for category in DEFAULT_CATEGORIES],
         )
-        conn.commit()
-    insert_user_default_categories(username)
-    log.log("INFO", f"Create categories table for username {username}")
-
-
-def insert_user_default_categories(username: str) -> None:
-    categories_table = f"categories_{username}"
-    categories = ["Харчування", "Здоров'я", "Транспорт", "Дім", "Розваги", "Одяг", "Секретні витрати"]
-    with sqlite3.connect(path, check_same_thread=False) as conn:
-        cursor = conn.cursor()
-        for category in categories:
-            cursor.execute(f"INSERT OR IGNORE INTO {categories_table} (name) VALUES (?)", (category,))
-        conn.commit()
     log.log("INFO", "Insert default categories")
 
 
@@ -0,0 +1,42 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+from calendar import monthrange
+from datetime import UTC, date, datetime
+from functools import lru_cache
+
+DATE_FORMAT = "%d/%m/%Y"
+
+
+def _parse_day(expense_date: str) -> date:
+    """A ``DD/MM/YYYY`` string, zero padding optional, as a ``date``; ``ValueError`` if it is not one."""
+    day, month, year = expense_date.split("/")
+    return date(int(year), int(month), int(day))
+
+
+def day_ordinal(expense_date: str) -> int:
+    """Convert a ``DD/MM/YYYY`` string to the proleptic Gregorian ordinal stored in ``expense_day``."""
+    return _parse_day(expense_date).toordinal()
+
+
+@lru_cache(maxsize=8192)
+def parse_date(expense_date: str) -> datetime:
+    """
+    A ``DD/MM/YYYY`` string as the ``datetime`` expense dicts carry, see ``day_datetime``; a history
+    repeats the same few thousand days, so results are cached.
+    """
+    return day_datetime(_parse_day(expense_date).toordinal())
+
+
+@lru_cache(maxsize=8192)
+def day_datetime(expense_day: int) -> datetime:
+    """
+    Midnight UTC of an ``expense_day`` ordinal. An expense is dated by calendar day, not by instant,
+    so only the date part means anything; UTC just keeps the value timezone-aware.
+    """
+    return datetime.fromordinal(expense_day).replace(tzinfo=UTC)
+
+
+def month_bounds(year: int, month: int) -> tuple[int, int]:
+    """First and last day ordinals of a month, both inclusive."""
+    _, last_day = monthrange(year, month)
+    return date(year, month, 1).toordinal(), date(year, month, last_day).toordinal()
@@ -5,3 +5,6 @@ class UserAlreadyExistError(Exception): ...
 
 
 class CategoryAlreadyExistsError(Exception): ...
+
+
+class CategoryNotFoundError(Exception): ...
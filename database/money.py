@@ -0,0 +1,14 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+from decimal import ROUND_HALF_UP, Decimal
+
+MINOR_UNITS = 100  # kopecks per hryvnia
+
+
+def to_minor(amount: float | str | Decimal) -> int:
+    """Round an amount to whole kopecks, going through ``str`` so ``0.1`` stays ``10``."""
+    return int((Decimal(str(amount)) * MINOR_UNITS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(amount_minor: int) -> float:
+    return amount_minor / MINOR_UNITS
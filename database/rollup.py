@@ -0,0 +1,92 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+import sqlite3
+from collections import Counter
+from collections.abc import Iterable
+from datetime import date
+
+from .connection import db
+from log.logger import log
+
+# expense_day is a date.toordinal(); adding this offset turns it into the Julian day SQLite date functions expect.
+JULIAN_DAY_OFFSET = 1721424.5
+
+Delta = tuple[int, str, int]  # (expense_day, category, amount_minor) of one expense
+
+
+def create_monthly_totals_table() -> None:
+    with db.connection() as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS expense_monthly_totals (
+                user_id INTEGER NOT NULL,
+                year INTEGER NOT NULL,
+                month INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                total_minor INTEGER NOT NULL,
+                expense_count INTEGER NOT NULL,
+                PRIMARY KEY (user_id, year, month, category)
+            ) WITHOUT ROWID
+            """
+        )
+
+
+def apply_deltas(conn: sqlite3.Connection, user_id: int, expenses: Iterable[Delta], sign: int = 1) -> None:
+    """
+    Add (``sign=1``) or remove (``sign=-1``) expenses from the monthly totals.
+
+    Call it on the connection that writes the expenses so both land in the same transaction.
+    """
+    totals: Counter[tuple[int, int, str]] = Counter()
+    counts: Counter[tuple[int, int, str]] = Counter()
+    for expense_day, category, amount_minor in expenses:
+        if expense_day is None or amount_minor is None:
+            continue
+        day = date.fromordinal(expense_day)
+        key = (day.year, day.month, category)
+        totals[key] += sign * amount_minor
+        counts[key] += sign
+    if not counts:
+        return
+
+    conn.executemany(
+        """
+        INSERT INTO expense_monthly_totals (user_id, year, month, category, total_minor, expense_count)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, year, month, category) DO UPDATE SET
+            total_minor = total_minor + excluded.total_minor,
+            expense_count = expense_count + excluded.expense_count
+        """,
+        [(user_id, *key, totals[key], count) for key, count in counts.items()],
+    )
+    if sign < 0:
+        conn.executemany(
+            "DELETE FROM expense_monthly_totals "
+            "WHERE user_id = ? AND year = ? AND month = ? AND category = ? AND expense_count <= 0",
+            [(user_id, *key) for key in counts],
+        )
+
+
+def rebuild_monthly_totals(user_id: int | None = None) -> None:
+    """Recompute the totals from the expenses, for one user or for everyone, to recover from drift."""
+    only_user = "AND user_id = ?" if user_id is not None else ""
+    params = (user_id,) if user_id is not None else ()
+    with db.connection() as conn:
+        conn.execute(f"DELETE FROM expense_monthly_totals WHERE 1 {only_user}", params)
+        conn.execute(
+            f"""
+            INSERT INTO expense_monthly_totals (user_id, year, month, category, total_minor, expense_count)
+            SELECT
+                user_id,
+                CAST(strftime('%Y', expense_day + {JULIAN_DAY_OFFSET}) AS INTEGER),
+                CAST(strftime('%m', expense_day + {JULIAN_DAY_OFFSET}) AS INTEGER),
+                category,
+                SUM(amount_minor),
+                COUNT(*)
+            FROM expenses
+            WHERE expense_day IS NOT NULL AND amount_minor IS NOT NULL {only_user}
+            GROUP BY 1, 2, 3, 4
+            """,
+            params,
+        )
+    log.log("INFO", f"Rebuilt monthly totals for {'user ' + str(user_id) if user_id is not None else 'all users'}")
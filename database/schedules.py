@@ -0,0 +1,97 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+Schedules of recurring expenses and the days they fall on.
+
+A schedule is ``daily``, ``weekly`` (on the weekday of its first day), ``monthly`` (on its first day's day of
+the month, or the last day of shorter months) or a cron-like ``"<day of month> <month> <day of week>"`` with
+``*``, lists, ranges and ``/`` steps; days of the week run 0-6 from Sunday, and 7 is Sunday too. As in cron, a
+day matches either restricted day field when both are restricted.
+
+``occurrences`` steps from one occurrence to the next inside the days it is asked for, so its cost follows the
+length of that range, not how long the schedule has been running.
+"""
+
+from calendar import monthrange
+from collections.abc import Iterator
+from datetime import date
+
+SCHEDULES = ("daily", "weekly", "monthly")
+
+
+def _field(text: str, low: int, high: int) -> frozenset[int] | None:
+    """The values a cron field allows, or ``None`` for ``*``."""
+    if text == "*":
+        return None
+    values: set[int] = set()
+    for part in text.split(","):
+        base, _, step = part.partition("/")
+        if base == "*":
+            first, last = low, high
+        elif "-" in base:
+            first, last = (int(value) for value in base.split("-", 1))
+        else:
+            first = int(base)
+            last = high if step else first
+        if not low <= first <= last <= high or (step and int(step) < 1):
+            raise ValueError(f"'{part}' is outside {low}-{high}")
+        values.update(range(first, last + 1, int(step) if step else 1))
+    return frozenset(values)
+
+
+def _months(first: int, last: int) -> Iterator[tuple[int, int]]:
+    day = date.fromordinal(first)
+    year, month = day.year, day.month
+    end = date.fromordinal(last)
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+class Schedule:
+    def __init__(self, spec: str, start_day: int):
+        """Raises ``ValueError`` for a ``spec`` that is neither a named schedule nor three cron fields."""
+        self.spec = spec.strip().lower()
+        self.start_day = start_day
+        if self.spec in SCHEDULES:
+            return
+        fields = self.spec.split()
+        if len(fields) != 3:
+            raise ValueError(f"Unknown schedule '{spec}'")
+        self.days = _field(fields[0], 1, 31)
+        self.months = _field(fields[1], 1, 12)
+        weekdays = _field(fields[2], 0, 7)
+        self.weekdays = None if weekdays is None else frozenset(day % 7 for day in weekdays)
+
+    def _matches(self, day: int, day_of_month: int) -> bool:
+        # date(1, 1, 1) is a Monday, so an ordinal modulo 7 is cron's day of the week.
+        if self.days is not None and self.weekdays is not None:
+            return day_of_month in self.days or day % 7 in self.weekdays
+        return (self.days is None or day_of_month in self.days) and (self.weekdays is None or day % 7 in self.weekdays)
+
+    def occurrences(self, first: int, last: int) -> Iterator[int]:
+        """Day ordinals the schedule falls on from ``first`` to ``last``, both inclusive, never before its start."""
+        first = max(first, self.start_day)
+        if first > last:
+            return
+        if self.spec == "daily":
+            yield from range(first, last + 1)
+        elif self.spec == "weekly":
+            yield from range(first + (self.start_day - first) % 7, last + 1, 7)
+        elif self.spec == "monthly":
+            day_of_month = date.fromordinal(self.start_day).day
+            for year, month in _months(first, last):
+                day = date(year, month, min(day_of_month, monthrange(year, month)[1])).toordinal()
+                if first <= day <= last:
+                    yield day
+        else:
+            yield from self._cron_days(first, last)
+
+    def _cron_days(self, first: int, last: int) -> Iterator[int]:
+        for year, month in _months(first, last):
+            if self.months is not None and month not in self.months:
+                continue
+            month_start = date(year, month, 1).toordinal()
+            for day in range(max(first, month_start), min(last, month_start + monthrange(year, month)[1] - 1) + 1):
+                if self._matches(day, day - month_start + 1):
+                    yield day
@@ -1,15 +1,78 @@
 # Copyright (c) 2025 ililihayy. All rights reserved.
 
+import math
 import sqlite3
+import threading
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
 from datetime import datetime
+from itertools import islice
 from typing import Any
 
-from .create_database import create_user_categories_table, create_user_expenses_table
-from .exceptions import CategoryAlreadyExistsError, UserAlreadyExistError
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import InvalidToken
+
+from .connection import db
+from .create_database import insert_user_default_categories
+from .dates import DATE_FORMAT, day_datetime, day_ordinal
+from .money import from_minor, to_minor
+from .rollup import apply_deltas
+from .schedules import Schedule
+from .exceptions import CategoryAlreadyExistsError, CategoryNotFoundError, UserAlreadyExistError
 from log.logger import log
-from security.utils import decrypt_data, decrypt_data_user, encrypt_data, encrypt_data_user
+from security.utils import (
+    blind_index,
+    decrypt_data,
+    decrypt_many,
+    encrypt_data,
+    get_row_cipher,
+    get_user_cipher,
+    open_rows,
+)
+
+USER_ID = "(SELECT user_id FROM users WHERE username = ?)"
+EXPENSE_COLUMNS = "expense_id, user_id, category, payload, amount, expense_date"  # the row shape decode_rows takes
+BULK_CHUNK_SIZE = 5000
+
+
+# What a row that does not decrypt raises, whether sealed (InvalidTag, an unknown format version) or legacy.
+_DECODE_ERRORS = (InvalidTag, InvalidToken, ArithmeticError, ValueError)
+
+
+def _decode_each(
+    rows: list[tuple], decode: Callable[[list[tuple]], list[tuple[int, int]]], username: str
+) -> dict[int, tuple[int, int]]:
+    """
+    ``decode(rows)`` by ``expense_id``. When a row does not decrypt the batch is decoded again row by row
+    and only that row is left out, so one damaged row does not make the whole history unreadable.
+    """
+    try:
+        return dict(zip((row[0] for row in rows), decode(rows), strict=True))
+    except _DECODE_ERRORS:
+        pass
+    values = {}
+    for row in rows:
+        try:
+            values[row[0]] = decode([row])[0]
+        except _DECODE_ERRORS:
+            log.log("ERROR", f"Cannot decrypt expense {row[0]} of user '{username}', left out")
+    return values
+
+
+@dataclass(frozen=True)
+class UserRecord:
+    """The ``users`` row login, key derivation and password reset need, read in one query."""
 
-DATABASE = "tracker.db"
+    user_id: int
+    username: str
+    email: str  # encrypted with the master key
+    password: str  # encrypted bcrypt hash
+    salt: bytes | None
+    is_blocked: bool
+
+
+_user_records: dict[str, UserRecord] = {}  # by the username or email it was looked up with
+_user_records_lock = threading.Lock()
 
 
 class Utils:
@@ -19,15 +82,13 @@ class Utils:
         encrypted_password = encrypt_data(password)
 
         try:
-            with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
+            with db.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                    "INSERT INTO users (username, email, password, salt) VALUES (?, ?, ?, ?)",
-                    (username, encrypted_email, encrypted_password, salt),
+                    "INSERT INTO users (username, email, email_index, password, salt) VALUES (?, ?, ?, ?, ?)",
+                    (username, encrypted_email, blind_index(email), encrypted_password, salt),
                 )
-                conn.commit()
-            create_user_expenses_table(username)
-            create_user_categories_table(username)
+                insert_user_default_categories(cursor.lastrowid)
 
             log.log("INFO", f"Add user '{username}' with email '{encrypted_email}'")
         except sqlite3.IntegrityError as err:
@@ -35,264 +96,586 @@ class Utils:
             raise UserAlreadyExistError(f"User {username} or email {encrypted_email} already exists") from err
 
     @staticmethod
-    def add_expense(username: str, category: str, amount: float, expense_date: str) -> None:
-        table_name = f"expenses_{username}"
-        encrypted_amount = encrypt_data_user(str(amount))
-        encrypted_date = encrypt_data_user(expense_date)
+    def add_expense(username: str, category: str, amount: float, expense_date: str) -> int:
+        row_cipher = get_row_cipher(username)
+        expense_day, amount_minor = day_ordinal(expense_date), to_minor(amount)
 
-        with sqlite3.connect(DATABASE, check_same_thread=False) as conn:
+        with db.connection() as conn:
             cursor = conn.cursor()
+            user_id = Utils._user_id(cursor, username)
             cursor.execute(
-                f"INSERT INTO {table_name} (category, amount, expense_date) VALUES (?, ?, ?)",
-                (category, encrypted_amount, encrypted_date),
+                "INSERT INTO expenses (user_id, category, payload, expense_day, amount_minor) VALUES (?, ?, ?, ?, ?)",
+                (user_id, category, row_cipher.seal(user_id, amount_minor, expense_day), expense_day, amount_minor),
             )
-            conn.commit()
-        log.log("INFO", f"Add expense {username} - {category} - {encrypted_amount} - {encrypted_date}")
+            apply_deltas(conn, user_id, [(expense_day, category, amount_minor)])
+        log.log("INFO", f"Add expense {username} - {category} - {cursor.lastrowid}")
+        return cursor.lastrowid
+
+    @staticmethod
+    def add_expenses_bulk(username: str, expenses: Iterable[tuple[str, float, str]]) -> list[int]:
+        """
+        Insert ``(category, amount, expense_date)`` rows in one transaction and return their ids.
+
+        The user's cipher is resolved once for the whole batch; rows are encrypted
+        and written in chunks so memory stays bounded for long imports.
+        """
+        row_cipher = get_row_cipher(username)
+        rows = iter(expenses)
+        expense_ids: list[int] = []
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            user_id = Utils._user_id(cursor, username)
+            while chunk := list(islice(rows, BULK_CHUNK_SIZE)):
+                deltas = [(day_ordinal(date), category, to_minor(amount)) for category, amount, date in chunk]
+                cursor.executemany(
+                    "INSERT INTO expenses (user_id, category, payload, expense_day, amount_minor) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (user_id, category, row_cipher.seal(user_id, minor, day), day, minor)
+                        for day, category, minor in deltas
+                    ],
+                )
+                apply_deltas(conn, user_id, deltas)
+                # The write lock is held until commit, so AUTOINCREMENT hands this chunk consecutive ids.
+                last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+                expense_ids.extend(range(last_id - len(chunk) + 1, last_id + 1))
+        log.log("INFO", f"Add {len(expense_ids)} expenses for {username} in bulk")
+        return expense_ids
+
+    @staticmethod
+    def add_recurring_expense(
+        username: str, category: str, amount: float, schedule: str, start_date: str, end_date: str | None = None
+    ) -> int:
+        """
+        Add a rule and return its id. Nothing is written to ``expenses`` here: occurrences are added by
+        ``materialize_recurring_expenses`` once they are due.
+        """
+        start_day = day_ordinal(start_date)
+        end_day = None if end_date is None else day_ordinal(end_date)
+        Schedule(schedule, start_day)  # raises ValueError for a schedule that cannot be parsed
+        if end_day is not None and end_day < start_day:
+            raise ValueError("A recurring expense cannot end before it starts")
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO recurring_expenses "
+                "(user_id, category, amount_minor, schedule, start_day, end_day, materialized_through) "
+                f"VALUES ({USER_ID}, ?, ?, ?, ?, ?, ?)",
+                (username, category, to_minor(amount), schedule, start_day, end_day, start_day - 1),
+            )
+        log.log("INFO", f"Add recurring expense {username} - {category} - {schedule} - {cursor.lastrowid}")
+        return cursor.lastrowid
+
+    @staticmethod
+    def get_recurring_expenses(username: str) -> list[dict[str, Any]]:
+        with db.connection() as conn:
+            rows = conn.execute(
+                "SELECT rule_id, category, amount_minor, schedule, start_day, end_day FROM recurring_expenses "
+                f"WHERE user_id = {USER_ID} ORDER BY rule_id",
+                (username,),
+            ).fetchall()
+        return [
+            {
+                "rule_id": rule_id,
+                "category": category,
+                "amount": from_minor(amount_minor),
+                "schedule": schedule,
+                "start_date": day_datetime(start_day),
+                "end_date": None if end_day is None else day_datetime(end_day),
+            }
+            for rule_id, category, amount_minor, schedule, start_day, end_day in rows
+        ]
+
+    @staticmethod
+    def delete_recurring_expense(username: str, rule_id: int) -> None:
+        """Stop a rule; expenses it already added stay."""
+        with db.connection() as conn:
+            conn.execute(
+                f"DELETE FROM recurring_expenses WHERE rule_id = ? AND user_id = {USER_ID}", (rule_id, username)
+            )
+        log.log("INFO", f"Delete recurring expense {username} - {rule_id}")
+
+    @staticmethod
+    def materialize_recurring_expenses(username: str, through: datetime) -> list[tuple[int, str, int, int]]:
+        """
+        Add every occurrence due by ``through`` that is not in ``expenses`` yet, in one bulk insert, and return
+        them as ``(expense_id, category, amount_minor, expense_day)``.
+
+        Only rules whose ``materialized_through`` is behind ``through`` are read, and each one from that day on,
+        so the cost follows the occurrences added, not the age of the rules. The rows and the moved cursors are
+        committed together; a rule never adds the same day twice.
+        """
+        through_day = through.toordinal()
+        with db.connection() as conn:
+            rules = conn.execute(
+                "SELECT rule_id, category, amount_minor, schedule, start_day, end_day, materialized_through "
+                f"FROM recurring_expenses WHERE user_id = {USER_ID} AND materialized_through < ? "
+                "AND (end_day IS NULL OR materialized_through < end_day)",
+                (username, through_day),
+            ).fetchall()
+            if not rules:
+                return []
+            occurrences, cursors = [], []
+            for rule_id, category, amount_minor, schedule, start_day, end_day, done in rules:
+                last = through_day if end_day is None else min(through_day, end_day)
+                days = Schedule(schedule, start_day).occurrences(done + 1, last)
+                occurrences.extend((category, amount_minor, day) for day in days)
+                cursors.append((last, rule_id))
+            expense_ids = Utils.add_expenses_bulk(
+                username,
+                (
+                    (category, from_minor(amount_minor), day_datetime(day).strftime(DATE_FORMAT))
+                    for category, amount_minor, day in occurrences
+                ),
+            )
+            conn.executemany("UPDATE recurring_expenses SET materialized_through = ? WHERE rule_id = ?", cursors)
+        log.log("INFO", f"Materialized {len(expense_ids)} recurring expenses of {username} through {through:%d/%m/%Y}")
+        return [(expense_id, *occurrence) for expense_id, occurrence in zip(expense_ids, occurrences, strict=True)]
+
+    @staticmethod
+    def get_upcoming_recurring_expenses(username: str, start_day: int, end_day: int) -> list[tuple[int, str, int, int]]:
+        """
+        Occurrences from ``start_day`` to ``end_day`` that are not in ``expenses`` yet, computed without being
+        stored, as ``(rule_id, category, amount_minor, expense_day)`` ordered by day. Only rules active in the
+        range are read, and each from its ``materialized_through`` or ``start_day`` on, whichever is later.
+        """
+        with db.connection() as conn:
+            rules = conn.execute(
+                "SELECT rule_id, category, amount_minor, schedule, start_day, end_day, materialized_through "
+                f"FROM recurring_expenses WHERE user_id = {USER_ID} AND start_day <= ? "
+                "AND materialized_through < ? AND (end_day IS NULL OR end_day >= ?)",
+                (username, end_day, end_day, start_day),
+            ).fetchall()
+        upcoming = []
+        for rule_id, category, amount_minor, schedule, first_day, last_day, done in rules:
+            last = end_day if last_day is None else min(end_day, last_day)
+            days = Schedule(schedule, first_day).occurrences(max(start_day, done + 1), last)
+            upcoming.extend((rule_id, category, amount_minor, day) for day in days)
+        upcoming.sort(key=lambda occurrence: occurrence[3])
+        return upcoming
 
     @staticmethod
     def add_user_category(username: str, category_name: str) -> None:
-        categories_table = f"categories_{username}"
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
+        with db.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(f"SELECT COUNT(*) FROM {categories_table} WHERE name = ?", (category_name,))
+            cursor.execute(
+                f"SELECT COUNT(*) FROM categories WHERE user_id = {USER_ID} AND name = ?", (username, category_name)
+            )
             if cursor.fetchone()[0] > 0:
                 log.log("ERROR", f"Category '{category_name}' exists")
                 raise CategoryAlreadyExistsError(f"Category '{category_name}' exists")
 
-            cursor.execute(f"INSERT INTO {categories_table} (name) VALUES (?)", (category_name,))
-            conn.commit()
+            cursor.execute(f"INSERT INTO categories (user_id, name) VALUES ({USER_ID}, ?)", (username, category_name))
         log.log("INFO", f"Add category for {username} - {category_name}")
 
     @staticmethod
     def clear_table(username: str, *, expenses: bool = True, categories: bool = True) -> None:
-        expenses_table = f"expenses_{username}"
-        categories_table = f"categories_{username}"
-
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
+        with db.connection() as conn:
             cursor = conn.cursor()
             if expenses:
-                cursor.execute(f"DELETE FROM {expenses_table}")
+                cursor.execute(f"DELETE FROM expenses WHERE user_id = {USER_ID}", (username,))
+                cursor.execute(f"DELETE FROM expense_monthly_totals WHERE user_id = {USER_ID}", (username,))
                 log.log("INFO", f"Clear table expenses for {username} ")
             if categories:
-                cursor.execute(f"DELETE FROM {categories_table}")
+                cursor.execute(f"DELETE FROM categories WHERE user_id = {USER_ID}", (username,))
                 log.log("INFO", f"Clear table categories for {username} ")
-            conn.commit()
 
     @staticmethod
     def delete_user(username: str) -> None:
-        expenses_table = f"expenses_{username}"
-        categories_table = f"categories_{username}"
-
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
+        with db.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(f"DROP TABLE IF EXISTS {expenses_table}")
-            cursor.execute(f"DROP TABLE IF EXISTS {categories_table}")
+            cursor.execute(f"DELETE FROM expenses WHERE user_id = {USER_ID}", (username,))
+            cursor.execute(f"DELETE FROM expense_monthly_totals WHERE user_id = {USER_ID}", (username,))
+            cursor.execute(f"DELETE FROM categories WHERE user_id = {USER_ID}", (username,))
+            cursor.execute(f"DELETE FROM recurring_expenses WHERE user_id = {USER_ID}", (username,))
+            cursor.execute(f"DELETE FROM user_keys WHERE user_id = {USER_ID}", (username,))
             cursor.execute("DELETE FROM users WHERE username = ?", (username,))
-            conn.commit()
+        Utils.forget_user_record(username)
         log.log("INFO", f"Delete user '{username}'")
 
     @staticmethod
-    def get_user_email(username: str) -> str:
-        with sqlite3.connect(DATABASE, check_same_thread=False) as conn:
+    def get_user_record(identifier: str) -> UserRecord | None:
+        """
+        The user with this username or email. Records are cached until ``forget_user_record``,
+        which every ``Utils`` method that changes a user calls.
+        """
+        with _user_records_lock:
+            record = _user_records.get(identifier)
+        if record is not None:
+            return record
+        columns = "user_id, username, email, password, salt, is_blocked"
+        with db.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT email FROM users WHERE username = ?", (username,))
-            encrypted_email = cursor.fetchone()[0]
-        return decrypt_data(encrypted_email)
+            cursor.execute(f"SELECT {columns} FROM users WHERE username = ?", (identifier,))
+            result = cursor.fetchone()
+            if result is None and "@" in identifier:
+                cursor.execute(f"SELECT {columns} FROM users WHERE email_index = ?", (blind_index(identifier),))
+                result = cursor.fetchone()
+        if result is None:
+            return None
+        record = UserRecord(*result[:5], is_blocked=bool(result[5]))
+        with _user_records_lock:
+            _user_records[identifier] = record
+        return record
+
+    @staticmethod
+    def forget_user_record(username: str | None = None) -> None:
+        """Drop the cached record of ``username``, or of every user."""
+        with _user_records_lock:
+            if username is None:
+                _user_records.clear()
+                return
+            for identifier in [key for key, record in _user_records.items() if record.username == username]:
+                del _user_records[identifier]
+
+    @staticmethod
+    def get_user_email(username: str) -> str | None:
+        record = Utils.get_user_record(username)
+        return decrypt_data(record.email) if record else None
 
     @staticmethod
     def get_user_name(password: str) -> str:
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
+        with db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT email FROM users WHERE password = ?", (encrypt_data(password),))
             result = cursor.fetchone()
         return result[0] if result else None
 
     @staticmethod
-    def get_user_id(username: str) -> str:
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT user_id FROM users WHERE username = ?", (username,))
-            result = cursor.fetchone()
-        return result[0] if result else None
+    def get_user_id(username: str) -> int | None:
+        record = Utils.get_user_record(username)
+        return record.user_id if record else None
 
     @staticmethod
-    def get_user_salt(username: str) -> str:
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT salt FROM users WHERE username = ?", (username,))
-            result = cursor.fetchone()
-        return result[0] if result else None
+    def get_user_salt(username: str) -> bytes | None:
+        record = Utils.get_user_record(username)
+        return record.salt if record else None
 
     @staticmethod
-    def get_user_password(identifier: str) -> str:
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT password FROM users WHERE username = ? or email = ?", (identifier, encrypt_data(identifier))
-            )
-            result = cursor.fetchone()
-        return decrypt_data(result[0]) if result else None
+    def get_user_password(identifier: str) -> str | None:
+        record = Utils.get_user_record(identifier)
+        return decrypt_data(record.password) if record else None
 
     @staticmethod
     def get_monthly_expenses_by_category(username: str, category: str, month: str, year: str) -> float:
-        table_name = f"expenses_{username}"
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
+        with db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 f"""
-                SELECT amount FROM {table_name}
-                WHERE category = ?
-                AND strftime('%m', expense_date) = ?
-                AND strftime('%Y', expense_date) = ?
+                SELECT COALESCE(SUM(total_minor), 0) FROM expense_monthly_totals
+                WHERE user_id = {USER_ID}
+                AND year = ? AND month = ? AND category = ?
                 """,
-                (category, month, year),
+                (username, int(year), int(month), category),
             )
-            expenses = cursor.fetchall()
-        total = sum(float(decrypt_data_user(expense[0])) for expense in expenses)
+            total = from_minor(cursor.fetchone()[0])
         log.log("INFO", f"Total expenses for {username} in category '{category}' in {month}/{year}: {total}")
         return total
 
     @staticmethod
     def get_monthly_expenses(username: str, month: str, year: str) -> float:
-        table_name = f"expenses_{username}"
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
+        with db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 f"""
-                SELECT amount FROM {table_name}
-                WHERE strftime('%m', expense_date) = ?
-                AND strftime('%Y', expense_date) = ?
+                SELECT COALESCE(SUM(total_minor), 0) FROM expense_monthly_totals
+                WHERE user_id = {USER_ID}
+                AND year = ? AND month = ?
                 """,
-                (month, year),
+                (username, int(year), int(month)),
             )
-            expenses = cursor.fetchall()
-        total = sum(float(decrypt_data_user(expense[0])) for expense in expenses)
+            total = from_minor(cursor.fetchone()[0])
         log.log("INFO", f"Total expenses for {username} in {month}/{year}: {total}")
         return total
 
+    @staticmethod
+    def get_monthly_totals_by_category(username: str, month: str, year: str) -> dict[str, float]:
+        """Per-category totals of a month, read from the rollup: O(categories), not O(expenses)."""
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""
+                SELECT category, total_minor FROM expense_monthly_totals
+                WHERE user_id = {USER_ID}
+                AND year = ? AND month = ?
+                ORDER BY total_minor DESC
+                """,
+                (username, int(year), int(month)),
+            )
+            return {category: from_minor(total) for category, total in cursor.fetchall()}
+
     @staticmethod
     def get_user_categories(username: str) -> list[str]:
-        categories_table = f"categories_{username}"
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
+        with db.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(f"SELECT name FROM {categories_table}")
+            cursor.execute(f"SELECT name FROM categories WHERE user_id = {USER_ID} ORDER BY category_id", (username,))
             categories = cursor.fetchall()
         result = [category[0] for category in categories]
         log.log("INFO", f"Fetched categories for user '{username}': {result}")
         return result
 
+    @staticmethod
+    def set_category_budget(username: str, category: str, monthly_limit: float | None) -> None:
+        """Set the monthly budget of ``category``; ``None`` removes it."""
+        if monthly_limit is not None and not (math.isfinite(monthly_limit) and monthly_limit > 0):
+            raise ValueError("A budget must be a positive amount")
+        limit_minor = None if monthly_limit is None else to_minor(monthly_limit)
+        with db.connection() as conn:
+            cursor = conn.execute(
+                f"UPDATE categories SET monthly_limit_minor = ? WHERE user_id = {USER_ID} AND name = ?",
+                (limit_minor, username, category),
+            )
+            if cursor.rowcount == 0:
+                log.log("ERROR", f"Category '{category}' does not exist")
+                raise CategoryNotFoundError(f"Category '{category}' does not exist")
+        log.log("INFO", f"Set the monthly budget of {username} - {category} to {monthly_limit}")
+
+    @staticmethod
+    def get_category_budgets(username: str) -> dict[str, float]:
+        """Monthly budgets of the categories that have one."""
+        with db.connection() as conn:
+            cursor = conn.execute(
+                f"""
+                SELECT name, monthly_limit_minor FROM categories
+                WHERE user_id = {USER_ID} AND monthly_limit_minor IS NOT NULL
+                ORDER BY category_id
+                """,
+                (username,),
+            )
+            return {name: from_minor(limit) for name, limit in cursor.fetchall()}
+
     @staticmethod
     def get_user_expenses(username: str) -> list[dict[str, Any]]:
-        table_name = f"expenses_{username}"
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""
+                SELECT {EXPENSE_COLUMNS} FROM expenses
+                WHERE user_id = {USER_ID}
+                ORDER BY expense_day DESC, expense_id DESC
+                """,
+                (username,),
+            )
+            rows = cursor.fetchall()
+
+        return Utils.decode_rows(rows, username)
+
+    @staticmethod
+    def get_user_expenses_by_date_range(
+        username: str, start_date: datetime, end_date: datetime
+    ) -> list[dict[str, Any]]:
+        """Expenses dated from ``start_date`` to ``end_date`` inclusive; only these rows are fetched and decrypted."""
+        with db.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(f"""
-                SELECT expense_id, amount, category, expense_date FROM {table_name}
-                ORDER BY expense_date DESC
-            """)
+            cursor.execute(
+                f"""
+                SELECT {EXPENSE_COLUMNS} FROM expenses
+                WHERE user_id = {USER_ID}
+                AND expense_day BETWEEN ? AND ?
+                ORDER BY expense_day DESC, expense_id DESC
+                """,
+                (username, start_date.toordinal(), end_date.toordinal()),
+            )
             rows = cursor.fetchall()
 
-        expenses = []
-        for expense_id, amount, category, date_str in rows:
-            date = datetime.strptime(decrypt_data_user(date_str), "%d/%m/%Y")
-            expenses.append({
-                "expense_id": expense_id,
-                "amount": float(decrypt_data_user(amount)),
-                "category": category,
-                "date": date,
-            })
+        return Utils.decode_rows(rows, username)
+
+    @staticmethod
+    def get_user_expenses_page(
+        username: str, limit: int, after: tuple[int, int] | None = None
+    ) -> tuple[list[dict[str, Any]], tuple[int, int] | None]:
+        """
+        One page of the history, newest first, keyset-paginated on ``(expense_day, expense_id)``.
+
+        Pass the returned cursor as ``after`` to get the next page; it is ``None`` on the last page.
+        """
+        # A separate statement per case keeps the keyset condition a range seek on the index.
+        keyset = "AND (expense_day, expense_id) < (?, ?)" if after else ""
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""
+                SELECT {EXPENSE_COLUMNS}, expense_day FROM expenses
+                WHERE user_id = {USER_ID}
+                {keyset}
+                ORDER BY expense_day DESC, expense_id DESC
+                LIMIT ?
+                """,
+                (username, *(after or ()), limit),
+            )
+            rows = cursor.fetchall()
+
+        next_cursor = (rows[-1][-1], rows[-1][0]) if len(rows) == limit else None
+        return Utils.decode_rows([row[:-1] for row in rows], username), next_cursor
+
+    @staticmethod
+    def _open_expense_rows(rows: list[tuple], username: str, **options: Any) -> dict[int, tuple[int, int]]:
+        """
+        ``(amount_minor, expense_day)`` by ``expense_id`` of ``username``'s rows selected as ``EXPENSE_COLUMNS``.
+
+        Sealed rows are opened in one ``open_rows`` pass; rows still in the legacy
+        Fernet format are decrypted with ``decrypt_many``. ``options`` go to both.
+        Rows that do not decrypt are logged and left out.
+        """
+        sealed = [row for row in rows if row[3] is not None]
+        legacy = [row for row in rows if row[3] is None]
+        values: dict[int, tuple[int, int]] = {}
+        if sealed:
+            row_cipher = get_row_cipher(username)
+
+            def open_batch(batch: list[tuple]) -> list[tuple[int, int]]:
+                return open_rows([(row[1], row[3]) for row in batch], row_cipher, **options)
+
+            values.update(_decode_each(sealed, open_batch, username))
+        if legacy:
+            cipher = get_user_cipher(username)
+
+            def decrypt_batch(batch: list[tuple]) -> list[tuple[int, int]]:
+                columns = [[row[4] for row in batch], [row[5] for row in batch]]
+                return list(zip(*decrypt_many(columns, cipher, [to_minor, day_ordinal], **options), strict=True))
+
+            values.update(_decode_each(legacy, decrypt_batch, username))
+        return values
+
+    @staticmethod
+    def decode_rows(rows: list[tuple], username: str, **options: Any) -> list[dict[str, Any]]:
+        """Turn ``username``'s rows selected as ``EXPENSE_COLUMNS`` into expense dicts."""
+        values = Utils._open_expense_rows(rows, username, **options)
+        return [
+            {
+                "expense_id": row[0],
+                "amount": from_minor(values[row[0]][0]),
+                "category": row[2],
+                "date": day_datetime(values[row[0]][1]),
+            }
+            for row in rows
+            if row[0] in values
+        ]
+
+    @staticmethod
+    def get_user_expense_rows(username: str) -> list[tuple[int, str, int, int]]:
+        """Every expense of the user as ``(expense_id, category, amount_minor, expense_day)``, by ``expense_id``."""
+        with db.connection() as conn:
+            rows = conn.execute(
+                f"SELECT {EXPENSE_COLUMNS} FROM expenses WHERE user_id = {USER_ID} ORDER BY expense_id", (username,)
+            ).fetchall()
 
-        return expenses
+        values = Utils._open_expense_rows(rows, username)
+        return [(row[0], row[2], *values[row[0]]) for row in rows if row[0] in values]
 
     @staticmethod
     def delete_user_expense(username: str, expense_id: int):
-        table_name = f"expenses_{username}"
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
+        with db.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(f"DELETE FROM {table_name} WHERE expense_id = ?", (expense_id,))
-            conn.commit()
+            user_id = Utils._user_id(cursor, username)
+            old = Utils._expense_delta(cursor, user_id, expense_id)
+            cursor.execute("DELETE FROM expenses WHERE expense_id = ? AND user_id = ?", (expense_id, user_id))
+            apply_deltas(conn, user_id, old, sign=-1)
 
     @staticmethod
     def update_user_expense(username: str, expense_id: int, category: str, amount: float, date: str):
-        table_name = f"expenses_{username}"
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
+        row_cipher = get_row_cipher(username)
+        expense_day, amount_minor = day_ordinal(date), to_minor(amount)
+        with db.connection() as conn:
             cursor = conn.cursor()
+            user_id = Utils._user_id(cursor, username)
+            old = Utils._expense_delta(cursor, user_id, expense_id)
             cursor.execute(
-                f"""
-                UPDATE {table_name}
-                SET category = ?, amount = ?, expense_date = ?
-                WHERE expense_id = ?
+                """
+                UPDATE expenses
+                SET category = ?, payload = ?, amount = NULL, expense_date = NULL, expense_day = ?, amount_minor = ?
+                WHERE expense_id = ? AND user_id = ?
                 """,
-                (category, str(amount), date, expense_id),
+                (
+                    category,
+                    row_cipher.seal(user_id, amount_minor, expense_day),
+                    expense_day,
+                    amount_minor,
+                    expense_id,
+                    user_id,
+                ),
             )
-            conn.commit()
+            if old:
+                apply_deltas(conn, user_id, old, sign=-1)
+                apply_deltas(conn, user_id, [(expense_day, category, amount_minor)])
+
+    @staticmethod
+    def _user_id(cursor: sqlite3.Cursor, username: str) -> int:
+        cursor.execute("SELECT user_id FROM users WHERE username = ?", (username,))
+        return cursor.fetchone()[0]
+
+    @staticmethod
+    def _expense_delta(cursor: sqlite3.Cursor, user_id: int, expense_id: int) -> list[tuple[int, str, int]]:
+        cursor.execute(
+            "SELECT expense_day, category, amount_minor FROM expenses WHERE expense_id = ? AND user_id = ?",
+            (expense_id, user_id),
+        )
+        return cursor.fetchall()
 
     @staticmethod
     def block_user(username: str):
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
+        with db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """UPDATE users SET is_blocked = ? WHERE username = ?""",
                 (1, username),
             )
-            conn.commit()
+        Utils.forget_user_record(username)
 
     @staticmethod
     def unblock_user(username: str):
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
+        with db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """UPDATE users SET is_blocked = ? WHERE username = ?""",
                 (False, username),
             )
-            conn.commit()
+        Utils.forget_user_record(username)
 
     @staticmethod
     def get_user_status(identifier: str) -> bool | None:
-        with sqlite3.connect("tracker.db", check_same_thread=False) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT is_blocked FROM users WHERE username = ?", (identifier,))
-            result = cursor.fetchone()
-        if result is None:
-            return None
-        return bool(result[0])
+        record = Utils.get_user_record(identifier)
+        return record.is_blocked if record else None
 
     @staticmethod
     def update_user_password(username: str, new_password: str) -> None:
         encrypted_password = encrypt_data(new_password)
-        with sqlite3.connect(DATABASE, check_same_thread=False) as conn:
+        with db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("UPDATE users SET password = ? WHERE username = ?", (encrypted_password, username))
-            conn.commit()
+        Utils.forget_user_record(username)
         log.log("INFO", f"Updated password for user '{username}'")
 
     @staticmethod
     def get_username_by_email(email: str) -> str | None:
-        encrypted_email = encrypt_data(email)
-        with sqlite3.connect(DATABASE, check_same_thread=False) as conn:
+        with db.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT username FROM users WHERE email = ?", (encrypted_email,))
+            cursor.execute("SELECT username FROM users WHERE email_index = ?", (blind_index(email),))
             result = cursor.fetchone()
         return result[0] if result else None
 
     @staticmethod
     def get_user_by_username(username: str) -> str | None:
-        with sqlite3.connect(DATABASE, check_same_thread=False) as conn:
+        with db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT email FROM users WHERE username = ?", (username,))
             result = cursor.fetchone()
             return result[0] if result else None
-       
 
     @staticmethod
     def get_all_emails() -> list[str]:
         """Retrieve and decrypt all email addresses from the database."""
-        with sqlite3.connect(DATABASE, check_same_thread=False) as conn:
+        with db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT email FROM users")
             encrypted_emails = cursor.fetchall()
-        
+
         # Decrypt each email address
         decrypted_emails = [decrypt_data(email[0]) for email in encrypted_emails]
         log.log("INFO", f"Retrieved {len(decrypted_emails)} email addresses from database")
         return decrypted_emails
+
+    @staticmethod
+    def get_all_usernames() -> list[str]:
+        with db.connection() as conn:
+            return [row[0] for row in conn.execute("SELECT username FROM users ORDER BY user_id")]
@@ -1,3 +1,4 @@
 # Copyright (c) 2025 ililihayy. All rights reserved.
 
+from .aio import AsyncExpense
 from .expense import Expense
@@ -0,0 +1,6 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+from .expense import Expense
+from database.aio import AsyncFacade
+
+AsyncExpense = AsyncFacade(Expense)
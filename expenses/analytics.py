@@ -0,0 +1,136 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+A user's history as NumPy columns, for aggregations that would otherwise loop over lists of expense dicts.
+
+Rows are sorted by day, so a range of days is a slice found by binary search and a range sum is two lookups
+in a running total. Group-bys turn each row's period (and category) into a small integer key and sum the
+amounts with one ``np.bincount``.
+"""
+
+from collections.abc import Iterable
+from datetime import date
+from typing import Literal
+
+import numpy as np
+import numpy.typing as npt
+
+from database.money import from_minor
+
+Period = Literal["week", "month", "year"]
+
+# date(1970, 1, 1).toordinal(): turns a day ordinal into days since the epoch, which datetime64[D] counts.
+EPOCH_ORDINAL = 719163
+
+
+def sum_kopecks(
+    indexes: npt.NDArray[np.int64], amounts: npt.NDArray[np.int64], minlength: int = 0
+) -> npt.NDArray[np.int64]:
+    """``totals[i]``: the sum of the ``amounts`` whose index is ``i``; indexes are small non-negative integers."""
+    # bincount sums in float64, exact up to 2**53 kopecks
+    return np.bincount(indexes, weights=amounts, minlength=minlength).round().astype(np.int64)
+
+
+class ExpenseColumns:
+    """
+    ``days`` (int32 day ordinals), ``amounts`` (int64 kopecks) and ``categories`` (int16 codes into
+    ``names``), sorted by day. Period keys are a week's Monday as a ``date``, ``(year, month)`` or the year.
+    """
+
+    def __init__(self, rows: Iterable[tuple[str, int, int]]):
+        """``rows`` are ``(category, amount_minor, expense_day)``, as ``ExpenseRepository`` keeps them."""
+        codes: dict[str, int] = {}
+        categories, amounts, days = [], [], []
+        for category, amount_minor, expense_day in rows:
+            categories.append(codes.setdefault(category, len(codes)))
+            amounts.append(amount_minor)
+            days.append(expense_day)
+        order = np.argsort(np.array(days, dtype=np.int32), kind="stable")
+        self.days: npt.NDArray[np.int32] = np.array(days, dtype=np.int32)[order]
+        self.amounts: npt.NDArray[np.int64] = np.array(amounts, dtype=np.int64)[order]
+        self.categories: npt.NDArray[np.int16] = np.array(categories, dtype=np.int16)[order]
+        self.names = list(codes)
+        self._period_keys: dict[Period, npt.NDArray[np.int64]] = {}
+        # running[i] is the sum of the first i amounts, so any slice sums with two lookups
+        self.running: npt.NDArray[np.int64] = np.concatenate(([0], np.cumsum(self.amounts)))
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def _bounds(self, start: date | None, end: date | None) -> slice:
+        # np.int32 keeps searchsorted from casting the whole column to the type of a Python int
+        first = 0 if start is None else int(np.searchsorted(self.days, np.int32(start.toordinal()), side="left"))
+        last = len(self.days)
+        if end is not None:
+            last = int(np.searchsorted(self.days, np.int32(end.toordinal()), side="right"))
+        return slice(first, last)
+
+    def range_sum(self, start: date | None = None, end: date | None = None) -> float:
+        """Total from ``start`` to ``end``, both inclusive and optional."""
+        span = self._bounds(start, end)
+        return from_minor(int(self.running[span.stop] - self.running[span.start]))
+
+    def period_keys(self, period: Period, span: slice = slice(None)) -> npt.NDArray[np.int64]:
+        """
+        A week as its Monday's ordinal (``date(1, 1, 1)`` is a Monday), a month as months since
+        January 1970 and a year as itself. Computed for the whole history on first use.
+        """
+        keys = self._period_keys.get(period)
+        if keys is None:
+            days = self.days.astype(np.int64)
+            if period == "week":
+                keys = days - (days - 1) % 7
+            else:
+                months = (days - EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+                keys = months if period == "month" else months // 12 + 1970
+            self._period_keys[period] = keys
+        return keys[span]
+
+    @staticmethod
+    def period_label(period: Period, key: int) -> date | tuple[int, int] | int:
+        if period == "week":
+            return date.fromordinal(key)
+        if period == "month":
+            return 1970 + key // 12, key % 12 + 1
+        return key
+
+    @staticmethod
+    def _sum_by(
+        keys: npt.NDArray[np.int64], amounts: npt.NDArray[np.int64]
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+        """Distinct keys and the amount total of each; keys span a small range, so offsets index a bincount."""
+        if len(keys) == 0:
+            return keys, amounts
+        low = keys.min()
+        totals = sum_kopecks(keys - low, amounts)
+        present = np.bincount(keys - low) > 0
+        return np.flatnonzero(present) + low, totals[present]
+
+    def totals_by_period(
+        self, period: Period, start: date | None = None, end: date | None = None
+    ) -> dict[date | tuple[int, int] | int, float]:
+        span = self._bounds(start, end)
+        keys, totals = self._sum_by(self.period_keys(period, span), self.amounts[span])
+        return {
+            self.period_label(period, key): from_minor(total)
+            for key, total in zip(keys.tolist(), totals.tolist(), strict=True)
+        }
+
+    def totals_by_category(self, start: date | None = None, end: date | None = None) -> dict[str, float]:
+        span = self._bounds(start, end)
+        codes, totals = self._sum_by(self.categories[span].astype(np.int64), self.amounts[span])
+        return {
+            self.names[code]: from_minor(total) for code, total in zip(codes.tolist(), totals.tolist(), strict=True)
+        }
+
+    def totals_by_period_and_category(
+        self, period: Period, start: date | None = None, end: date | None = None
+    ) -> dict[date | tuple[int, int] | int, dict[str, float]]:
+        span = self._bounds(start, end)
+        width = max(len(self.names), 1)
+        keys, totals = self._sum_by(self.period_keys(period, span) * width + self.categories[span], self.amounts[span])
+        grouped: dict[date | tuple[int, int] | int, dict[str, float]] = {}
+        for key, total in zip(keys.tolist(), totals.tolist(), strict=True):
+            period_key, code = divmod(key, width)
+            grouped.setdefault(self.period_label(period, period_key), {})[self.names[code]] = from_minor(total)
+        return grouped
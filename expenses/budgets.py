@@ -0,0 +1,31 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+from dataclasses import dataclass
+
+from database.money import from_minor
+
+
+@dataclass(frozen=True)
+class BudgetStatus:
+    """A category's monthly budget against what was spent in that month, both in kopecks."""
+
+    category: str
+    limit_minor: int
+    spent_minor: int
+
+    @property
+    def limit(self) -> float:
+        return from_minor(self.limit_minor)
+
+    @property
+    def spent(self) -> float:
+        return from_minor(self.spent_minor)
+
+    @property
+    def remaining(self) -> float:
+        """Negative once the budget is exceeded."""
+        return from_minor(self.limit_minor - self.spent_minor)
+
+    @property
+    def exceeded(self) -> bool:
+        return self.spent_minor > self.limit_minor
@@ -1,7 +1,12 @@
+from collections.abc import Iterable
 from datetime import datetime
 
 from auth import Auth
 from database import Utils as Db
+from .analytics import ExpenseColumns
+from .budgets import BudgetStatus
+from .reports import TrendReport
+from .repository import expense_repository
 
 
 class Expense:
@@ -14,23 +19,71 @@ class Expense:
         Db.add_user_category(Auth.current_user, category)
 
     @staticmethod
-    def add_expense(category: str, amount: float, expense_date: str):
-        Db.add_expense(Auth.current_user, category, amount, expense_date)
+    def add_expense(category: str, amount: float, expense_date: str) -> int:
+        return expense_repository.add(Auth.current_user, category, amount, expense_date)
+
+    @staticmethod
+    def add_expenses(expenses: Iterable[tuple[str, float, str]]) -> list[int]:
+        return expense_repository.add_many(Auth.current_user, expenses)
 
     @staticmethod
     def get_all_user_expenses():
-        return Db.get_user_expenses(Auth.current_user)
+        return expense_repository.expenses(Auth.current_user)
+
+    @staticmethod
+    def get_expenses_page(limit: int, after: tuple[int, int] | None = None):
+        return expense_repository.page(Auth.current_user, limit, after)
 
     @staticmethod
     def delete_expense(id: int):
-        Db.delete_user_expense(Auth.current_user, id)
+        expense_repository.delete(Auth.current_user, id)
 
     @staticmethod
     def get_expenses_by_date_range(start_date: datetime, end_date: datetime) -> list[dict]:
-        all_expenses = Db.get_user_expenses(Auth.current_user)
-        filtered_expenses = [expense for expense in all_expenses if start_date <= expense["date"] <= end_date]
-        return filtered_expenses
+        return expense_repository.by_date_range(Auth.current_user, start_date, end_date)
+
+    @staticmethod
+    def get_monthly_totals(year: int, month: int) -> dict[str, float]:
+        return expense_repository.monthly_totals(Auth.current_user, year, month)
+
+    @staticmethod
+    def get_budgets() -> dict[str, float]:
+        return expense_repository.budgets(Auth.current_user)
+
+    @staticmethod
+    def set_budget(category: str, monthly_limit: float | None):
+        expense_repository.set_budget(Auth.current_user, category, monthly_limit)
+
+    @staticmethod
+    def get_budget_status(category: str, year: int, month: int) -> BudgetStatus | None:
+        return expense_repository.budget_status(Auth.current_user, category, year, month)
+
+    @staticmethod
+    def add_recurring_expense(
+        category: str, amount: float, schedule: str, start_date: str, end_date: str | None = None
+    ) -> int:
+        return expense_repository.add_recurring(Auth.current_user, category, amount, schedule, start_date, end_date)
+
+    @staticmethod
+    def get_recurring_expenses() -> list[dict]:
+        return Db.get_recurring_expenses(Auth.current_user)
+
+    @staticmethod
+    def delete_recurring_expense(rule_id: int):
+        Db.delete_recurring_expense(Auth.current_user, rule_id)
+
+    @staticmethod
+    def get_upcoming_expenses(year: int, month: int) -> list[dict]:
+        return expense_repository.upcoming(Auth.current_user, year, month)
 
     @staticmethod
     def update_expense(expense_id: int, category: str, amount: float, expense_date: str):
-        Db.update_user_expense(Auth.current_user, expense_id, category, amount, expense_date)
+        expense_repository.update(Auth.current_user, expense_id, category, amount, expense_date)
+
+    @staticmethod
+    def analytics() -> ExpenseColumns:
+        return expense_repository.columns(Auth.current_user)
+
+    @staticmethod
+    def trends() -> TrendReport:
+        return expense_repository.trends(Auth.current_user)
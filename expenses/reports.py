@@ -0,0 +1,102 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+Trend reports from two dense aggregates: a months x categories matrix and a per-week vector of totals.
+
+Both are built once from ``ExpenseColumns``, after which ``apply`` keeps them current one expense at a time.
+Rolling averages are differences of a running total down the month axis and year-over-year deltas compare
+rows twelve apart, so switching the period or the window never touches the expense rows.
+"""
+
+from datetime import UTC, date, datetime
+
+import numpy as np
+import numpy.typing as npt
+
+from .analytics import ExpenseColumns, sum_kopecks
+from database.money import from_minor
+
+
+def _month_key(day: date) -> int:
+    return (day.year - 1970) * 12 + day.month - 1
+
+
+def _monday(expense_day: int) -> int:
+    return expense_day - (expense_day - 1) % 7
+
+
+class TrendReport:
+    def __init__(self, columns: ExpenseColumns, today: date | None = None):
+        today = today or datetime.now(UTC).astimezone().date()
+        self.names = list(columns.names)
+        self._codes = {name: code for code, name in enumerate(self.names)}
+        width = max(len(self.names), 1)
+
+        months, weeks = columns.period_keys("month"), columns.period_keys("week")
+        # The ranges run to today, so the latest windows exist even after a quiet stretch.
+        self.first_month = int(months.min()) if len(months) else _month_key(today)
+        last_month = max(int(months.max()) if len(months) else 0, _month_key(today))
+        self.first_week = int(weeks.min()) if len(weeks) else _monday(today.toordinal())
+        last_week = max(int(weeks.max()) if len(weeks) else 0, _monday(today.toordinal()))
+
+        cells = (months - self.first_month) * width + columns.categories
+        size = (last_month - self.first_month + 1) * width
+        self.monthly: npt.NDArray[np.int64] = sum_kopecks(cells, columns.amounts, size).reshape(-1, width)
+        self.weekly: npt.NDArray[np.int64] = sum_kopecks(
+            (weeks - self.first_week) // 7, columns.amounts, (last_week - self.first_week) // 7 + 1
+        )
+        self._running: npt.NDArray[np.int64] | None = None
+
+    def apply(self, category: str, amount_minor: int, expense_day: int, sign: int = 1) -> bool:
+        """
+        Add (``sign=1``) or remove (``sign=-1``) one expense. Returns ``False`` when it falls outside
+        the aggregates (a new category, or a day before the first or after the last period): rebuild then.
+        """
+        code = self._codes.get(category)
+        month = _month_key(date.fromordinal(expense_day)) - self.first_month
+        week = (_monday(expense_day) - self.first_week) // 7
+        if code is None or not 0 <= month < len(self.monthly) or not 0 <= week < len(self.weekly):
+            return False
+        self.monthly[month, code] += sign * amount_minor
+        self.weekly[week] += sign * amount_minor
+        self._running = None
+        return True
+
+    def _row(self, year: int, month: int) -> int:
+        return _month_key(date(year, month, 1)) - self.first_month
+
+    def _by_category(self, values: npt.NDArray[np.int64]) -> dict[str, float]:
+        return {name: from_minor(value) for name, value in zip(self.names, values.tolist(), strict=False)}
+
+    def weekly_totals(self, count: int = 12) -> list[tuple[date, float]]:
+        """The last ``count`` weeks, oldest first, as ``(monday, total)``."""
+        first = max(len(self.weekly) - count, 0)
+        return [
+            (date.fromordinal(self.first_week + 7 * week), from_minor(total))
+            for week, total in enumerate(self.weekly[first:].tolist(), start=first)
+        ]
+
+    def yearly_totals(self) -> dict[int, float]:
+        years = (self.first_month + np.arange(len(self.monthly))) // 12 + 1970
+        totals = sum_kopecks(years - years[0], self.monthly.sum(axis=1))
+        return {int(years[0]) + offset: from_minor(total) for offset, total in enumerate(totals.tolist())}
+
+    def monthly_totals(self, year: int, month: int) -> dict[str, float]:
+        row = self._row(year, month)
+        if not 0 <= row < len(self.monthly):
+            return dict.fromkeys(self.names, 0.0)
+        return self._by_category(self.monthly[row])
+
+    def rolling_average(self, window: int, year: int, month: int) -> dict[str, float]:
+        """Average monthly spend per category, to the kopeck, over ``window`` months ending with ``year``/``month``."""
+        if self._running is None:
+            # running[i] is the per-category total of the first i months
+            self._running = np.vstack((np.zeros_like(self.monthly[:1]), np.cumsum(self.monthly, axis=0)))
+        end = self._row(year, month) + 1
+        start, end = (min(max(row, 0), len(self.monthly)) for row in (end - window, end))
+        return self._by_category(((self._running[end] - self._running[start]) / window).round().astype(np.int64))
+
+    def year_over_year(self, year: int, month: int) -> dict[str, tuple[float, float, float]]:
+        """``(month total, same month a year before, change)`` per category."""
+        current, previous = self.monthly_totals(year, month), self.monthly_totals(year - 1, month)
+        return {name: (current[name], previous[name], round(current[name] - previous[name], 2)) for name in self.names}
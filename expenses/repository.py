@@ -0,0 +1,238 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from collections.abc import Iterable
+from datetime import UTC, datetime
+from typing import Any
+
+from .analytics import ExpenseColumns
+from .budgets import BudgetStatus
+from .reports import TrendReport
+from database import Utils as Db
+from database.dates import day_datetime, day_ordinal, month_bounds
+from database.money import from_minor, to_minor
+from log.logger import log
+
+Row = tuple[str, int, int]  # (category, amount_minor, expense_day)
+
+
+class ExpenseRepository:
+    """
+    The logged-in user's expenses, decrypted once per session and kept in memory by id, with the spend of
+    every month and category kept next to them so budget checks are a dict lookup.
+
+    Mutations go to SQLite first and are applied to memory only when the write succeeded; reads are
+    answered from memory. Rows are kept as small tuples and turned into the expense dicts ``Utils``
+    returns only when they are read. ``clear()`` is called at logout; asking for another user reloads.
+    Recurring expenses that fell due are written to SQLite when the user is loaded and whenever a month is
+    opened, and applied to memory like any other add.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.username: str | None = None
+        self._rows: dict[int, Row] = {}
+        self._spent: dict[tuple[int, int], Counter[str]] = {}  # (year, month) -> kopecks by category
+        self._budgets: dict[str, int] = {}  # monthly limits in kopecks
+        self._order: list[tuple[int, int]] | None = None  # (-expense_day, -expense_id), i.e. newest first
+        self._columns: ExpenseColumns | None = None
+        self._trends: TrendReport | None = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self.username, self._rows, self._spent, self._budgets = None, {}, {}, {}
+            self._order, self._columns, self._trends = None, None, None
+
+    def _load(self, username: str) -> None:
+        if username == self.username:
+            return
+        self.clear()
+        Db.materialize_recurring_expenses(username, datetime.now(UTC).astimezone())
+        for expense_id, *row in Db.get_user_expense_rows(username):
+            self._put(expense_id, tuple(row))
+        self._budgets = {category: to_minor(limit) for category, limit in Db.get_category_budgets(username).items()}
+        self.username = username
+        log.log("INFO", f"Loaded {len(self._rows)} expenses of '{username}' into memory")
+
+    @staticmethod
+    def _month(expense_day: int) -> tuple[int, int]:
+        day = day_datetime(expense_day)
+        return day.year, day.month
+
+    def _put(self, expense_id: int, row: Row) -> None:
+        self._rows[expense_id] = row
+        self._spent.setdefault(self._month(row[2]), Counter())[row[0]] += row[1]
+        self._columns = None
+        if self._trends is not None and not self._trends.apply(*row):
+            self._trends = None
+        if self._order is not None:
+            insort(self._order, (-row[2], -expense_id))
+
+    def _pop(self, expense_id: int) -> None:
+        row = self._rows.pop(expense_id, None)
+        if row is None:
+            return
+        self._spent[self._month(row[2])][row[0]] -= row[1]
+        self._columns = None
+        if self._trends is not None and not self._trends.apply(*row, sign=-1):
+            self._trends = None
+        if self._order is not None:
+            del self._order[bisect_left(self._order, (-row[2], -expense_id))]
+
+    def _newest_first(self) -> list[tuple[int, int]]:
+        if self._order is None:
+            self._order = sorted((-row[2], -expense_id) for expense_id, row in self._rows.items())
+        return self._order
+
+    def _expense(self, expense_id: int) -> dict[str, Any]:
+        category, amount_minor, expense_day = self._rows[expense_id]
+        return {
+            "expense_id": expense_id,
+            "amount": from_minor(amount_minor),
+            "category": category,
+            "date": day_datetime(expense_day),
+        }
+
+    def expenses(self, username: str) -> list[dict[str, Any]]:
+        with self._lock:
+            self._load(username)
+            return [self._expense(-key[1]) for key in self._newest_first()]
+
+    def page(
+        self, username: str, limit: int, after: tuple[int, int] | None = None
+    ) -> tuple[list[dict[str, Any]], tuple[int, int] | None]:
+        """Same contract as ``Utils.get_user_expenses_page``."""
+        with self._lock:
+            self._load(username)
+            order = self._newest_first()
+            start = bisect_right(order, (-after[0], -after[1])) if after else 0
+            keys = order[start : start + limit]
+            next_cursor = (-keys[-1][0], -keys[-1][1]) if len(keys) == limit else None
+            return [self._expense(-key[1]) for key in keys], next_cursor
+
+    def by_date_range(self, username: str, start_date: datetime, end_date: datetime) -> list[dict[str, Any]]:
+        with self._lock:
+            self._load(username)
+            order = self._newest_first()
+            first = bisect_left(order, (-end_date.toordinal(),))
+            last = bisect_left(order, (-start_date.toordinal() + 1,))
+            return [self._expense(-key[1]) for key in order[first:last]]
+
+    def monthly_totals(self, username: str, year: int, month: int) -> dict[str, float]:
+        with self._lock:
+            self._load(username)
+            totals = self._spent.get((year, month), Counter())
+            return {category: from_minor(total) for category, total in totals.items() if total}
+
+    def budgets(self, username: str) -> dict[str, float]:
+        with self._lock:
+            self._load(username)
+            return {category: from_minor(limit) for category, limit in self._budgets.items()}
+
+    def set_budget(self, username: str, category: str, monthly_limit: float | None) -> None:
+        with self._lock:
+            Db.set_category_budget(username, category, monthly_limit)
+            if username == self.username:
+                if monthly_limit is None:
+                    self._budgets.pop(category, None)
+                else:
+                    self._budgets[category] = to_minor(monthly_limit)
+
+    def budget_status(self, username: str, category: str, year: int, month: int) -> BudgetStatus | None:
+        """The budget of ``category`` against its spend in ``year``/``month``; ``None`` if it has no budget."""
+        with self._lock:
+            self._load(username)
+            limit = self._budgets.get(category)
+            if limit is None:
+                return None
+            return BudgetStatus(category, limit, self._spent.get((year, month), Counter())[category])
+
+    def columns(self, username: str) -> ExpenseColumns:
+        """The history as ``ExpenseColumns``, rebuilt on the first call after a change."""
+        with self._lock:
+            self._load(username)
+            if self._columns is None:
+                self._columns = ExpenseColumns(self._rows.values())
+            return self._columns
+
+    def trends(self, username: str) -> TrendReport:
+        """Trend aggregates, built once and then updated by every change made through the repository."""
+        with self._lock:
+            if self._trends is None or username != self.username:
+                self._trends = TrendReport(self.columns(username))
+            return self._trends
+
+    def add(self, username: str, category: str, amount: float, expense_date: str) -> int:
+        with self._lock:
+            expense_id = Db.add_expense(username, category, amount, expense_date)
+            if username == self.username:
+                self._put(expense_id, (category, to_minor(amount), day_ordinal(expense_date)))
+            return expense_id
+
+    def add_many(self, username: str, expenses: Iterable[tuple[str, float, str]]) -> list[int]:
+        with self._lock:
+            if username != self.username:
+                return Db.add_expenses_bulk(username, expenses)
+            expenses = list(expenses)
+            expense_ids = Db.add_expenses_bulk(username, expenses)
+            self._order = None  # one sort on the next read instead of an insert per row
+            for expense_id, (category, amount, expense_date) in zip(expense_ids, expenses, strict=True):
+                self._put(expense_id, (category, to_minor(amount), day_ordinal(expense_date)))
+            return expense_ids
+
+    def materialize(self, username: str, through: datetime | None = None) -> int:
+        """Write the recurring expenses due by ``through`` (now by default); return how many were added."""
+        with self._lock:
+            rows = Db.materialize_recurring_expenses(username, through or datetime.now(UTC).astimezone())
+            if username == self.username:
+                if len(rows) > 1:
+                    self._order = None
+                for expense_id, *row in rows:
+                    self._put(expense_id, tuple(row))
+            return len(rows)
+
+    def add_recurring(
+        self, username: str, category: str, amount: float, schedule: str, start_date: str, end_date: str | None = None
+    ) -> int:
+        """Add a recurring expense and write the occurrences already due, such as one starting today."""
+        with self._lock:
+            rule_id = Db.add_recurring_expense(username, category, amount, schedule, start_date, end_date)
+            self.materialize(username)
+            return rule_id
+
+    def upcoming(self, username: str, year: int, month: int) -> list[dict[str, Any]]:
+        """
+        Recurring expenses of a month that are not due yet, oldest first; the ones that are due
+        are written first, so a month's expenses and its upcoming ones never overlap.
+        """
+        with self._lock:
+            self._load(username)
+            self.materialize(username)
+            occurrences = Db.get_upcoming_recurring_expenses(username, *month_bounds(year, month))
+            return [
+                {
+                    "rule_id": rule_id,
+                    "amount": from_minor(amount_minor),
+                    "category": category,
+                    "date": day_datetime(day),
+                }
+                for rule_id, category, amount_minor, day in occurrences
+            ]
+
+    def update(self, username: str, expense_id: int, category: str, amount: float, expense_date: str) -> None:
+        with self._lock:
+            Db.update_user_expense(username, expense_id, category, amount, expense_date)
+            if username == self.username and expense_id in self._rows:
+                self._pop(expense_id)
+                self._put(expense_id, (category, to_minor(amount), day_ordinal(expense_date)))
+
+    def delete(self, username: str, expense_id: int) -> None:
+        with self._lock:
+            Db.delete_user_expense(username, expense_id)
+            if username == self.username:
+                self._pop(expense_id)
+
+
+expense_repository = ExpenseRepository()
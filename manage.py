@@ -0,0 +1,91 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""Maintenance commands: ``python manage.py <command> --help``."""
+
+import argparse
+
+from database.create_database import create_full_database
+from database.rollup import rebuild_monthly_totals
+from database.utils import Utils
+from security import keystore, rotation
+from security.integrity import scan_database
+from security.utils import DECRYPT_POOL
+
+
+def rebuild_totals(args: argparse.Namespace) -> None:
+    user_id = None
+    if args.user:
+        user_id = Utils.get_user_id(args.user)
+        if user_id is None:
+            raise SystemExit(f"User '{args.user}' does not exist")
+    rebuild_monthly_totals(user_id)
+    print("Monthly totals rebuilt")
+
+
+def import_keys(args: argparse.Namespace) -> None:
+    print(f"Imported {keystore.import_env_keys(args.env)} user keys")
+    if args.prune:
+        print(f"Removed {keystore.prune_env_keys(args.env)} entries from {args.env}")
+
+
+def rotate_master_key(_args: argparse.Namespace) -> None:
+    print(f"Re-encrypted {rotation.rotate_master_key()} users with the new main key")
+
+
+def rotate_user_key(args: argparse.Namespace) -> None:
+    usernames = [args.user] if args.user else Utils.get_all_usernames()
+    for username in usernames:
+        try:
+            rotated = rotation.rotate_user_key(username)
+        except ValueError as e:
+            raise SystemExit(str(e)) from e
+        print(f"Re-encrypted {rotated} expenses of '{username}' with a new key")
+
+
+def verify(args: argparse.Namespace) -> None:
+    report = scan_database(pool=args.pool)
+    print(f"Checked {report.users_checked} users and {report.expenses_checked} expenses")
+    if report.bad_users:
+        print(f"Users that fail to decrypt: {', '.join(map(str, report.bad_users))}")
+    if report.bad_expenses:
+        print(f"Expenses that fail to decrypt: {', '.join(map(str, report.bad_expenses))}")
+    if not report.ok:
+        raise SystemExit(1)
+    print("All rows decrypt")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Finance Tracker maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-totals", help="recompute the monthly per-category totals from the expenses")
+    rebuild.add_argument("--user", help="only this username (default: everyone)")
+    rebuild.set_defaults(handler=rebuild_totals)
+
+    keys = commands.add_parser("import-keys", help="copy ENCRYPTION_KEY_<username> entries from .env to the keystore")
+    keys.add_argument("--env", default=".env", help="file to import from (default: .env)")
+    keys.add_argument("--prune", action="store_true", help="then remove the imported entries from the file")
+    keys.set_defaults(handler=import_keys)
+
+    master = commands.add_parser("rotate-master-key", help="re-encrypt user records under a new ENCRYPTION_KEY")
+    master.set_defaults(handler=rotate_master_key)
+
+    user_key = commands.add_parser("rotate-user-key", help="re-encrypt expenses under a new user key")
+    only = user_key.add_mutually_exclusive_group(required=True)
+    only.add_argument("--user", help="this username")
+    only.add_argument("--all", action="store_true", help="every user")
+    user_key.set_defaults(handler=rotate_user_key)
+
+    check = commands.add_parser("verify", help="report user and expense rows that no longer decrypt")
+    check.add_argument(
+        "--pool", choices=["process", "thread", "none"], default=DECRYPT_POOL, help="workers to decrypt on"
+    )
+    check.set_defaults(handler=verify)
+
+    args = parser.parse_args(argv)
+    create_full_database()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
 # Copyright (c) 2025 ililihayy. All rights reserved.
 
 from .key import ensure_encryption_key
-from .utils import decrypt_data, encrypt_data
+from .utils import decrypt_data, encrypt_data, reload_encryption_key
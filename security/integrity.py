@@ -0,0 +1,171 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+Offline check that every encrypted field in the database still decrypts. It only reads: a user whose key is
+missing from the keystore has all their expenses reported as bad, and no key is imported or created for them.
+
+``scan_database`` walks ``users`` (email and password, main key) and ``expenses`` (``payload`` or the legacy
+Fernet tokens, the owner's key) in keyset chunks of ``DECRYPT_CHUNK_SIZE`` rows and authenticates them on the
+decrypt pool, with at most ``MAX_PENDING`` chunks in flight, and returns the ids of the rows that fail.
+"""
+
+from collections import deque
+from collections.abc import Callable, Sequence
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from typing import Any
+
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+from .row_cipher import RowCipher
+from .user_key import stored_user_ciphers
+from .utils import DECRYPT_CHUNK_SIZE, DECRYPT_POOL, _decrypt_pool, get_master_cipher
+from log.logger import log
+
+MAX_PENDING = 8
+
+
+@dataclass
+class IntegrityReport:
+    users_checked: int = 0
+    expenses_checked: int = 0
+    bad_users: list[int] = field(default_factory=list)
+    bad_expenses: list[int] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.bad_users and not self.bad_expenses
+
+
+def _bad_tokens(cipher: Fernet | MultiFernet, rows: Sequence[tuple[int, Sequence[str | None]]]) -> list[int]:
+    """Ids of the ``(row_id, tokens)`` rows with a token that is missing or fails to decrypt."""
+    bad = []
+    for row_id, tokens in rows:
+        if None in tokens:
+            bad.append(row_id)
+            continue
+        try:
+            for token in tokens:
+                cipher.decrypt(token.encode())
+        except InvalidToken:
+            bad.append(row_id)
+    return bad
+
+
+def _bad_payloads(keys: tuple[bytes, ...], user_id: int, rows: Sequence[tuple[int, bytes]]) -> list[int]:
+    row_cipher = RowCipher(*keys)
+    bad = []
+    for expense_id, payload in rows:
+        try:
+            row_cipher.open(user_id, payload)
+        except (InvalidTag, ValueError, IndexError):
+            bad.append(expense_id)
+    return bad
+
+
+class _Checks:
+    """Runs chunk checks on the pool, keeping a bounded number in flight, and collects the bad ids."""
+
+    def __init__(self, executor: Executor | None):
+        self.executor = executor
+        self.pending: deque[tuple[Future, list[int]]] = deque()
+
+    def submit(self, bad_ids: list[int], func: Callable[..., list[int]], *args: Any) -> None:
+        if self.executor is None:
+            bad_ids.extend(func(*args))
+            return
+        while len(self.pending) >= MAX_PENDING:
+            self._collect_oldest()
+        self.pending.append((self.executor.submit(func, *args), bad_ids))
+
+    def _collect_oldest(self) -> None:
+        future, bad_ids = self.pending.popleft()
+        bad_ids.extend(future.result())
+
+    def wait(self) -> None:
+        while self.pending:
+            self._collect_oldest()
+
+
+def _scan_users(checks: _Checks, report: IntegrityReport) -> None:
+    from database.connection import db
+
+    cipher = get_master_cipher()
+    last_id = 0
+    while True:
+        with db.connection() as conn:
+            rows = conn.execute(
+                "SELECT user_id, email, password FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                (last_id, DECRYPT_CHUNK_SIZE),
+            ).fetchall()
+        if not rows:
+            return
+        checks.submit(report.bad_users, _bad_tokens, cipher, [(user_id, tokens) for user_id, *tokens in rows])
+        report.users_checked += len(rows)
+        last_id = rows[-1][0]
+
+
+def _scan_expenses(checks: _Checks, report: IntegrityReport, user_id: int, username: str) -> None:
+    from database.connection import db
+
+    try:
+        ciphers = stored_user_ciphers(user_id, username)
+    except (InvalidToken, ValueError):
+        ciphers = None
+    if ciphers is None:
+        log.log("ERROR", f"Cannot resolve the encryption key of user '{username}', all their expenses are unreadable")
+        cipher = row_cipher = None
+    else:
+        cipher, row_cipher = ciphers
+
+    last_id = 0
+    while True:
+        with db.connection() as conn:
+            rows = conn.execute(
+                "SELECT expense_id, payload, amount, expense_date FROM expenses "
+                "WHERE user_id = ? AND expense_id > ? ORDER BY expense_id LIMIT ?",
+                (user_id, last_id, DECRYPT_CHUNK_SIZE),
+            ).fetchall()
+        if not rows:
+            return
+        report.expenses_checked += len(rows)
+        last_id = rows[-1][0]
+        if cipher is None or row_cipher is None:
+            report.bad_expenses.extend(row[0] for row in rows)
+            continue
+        sealed = [(expense_id, payload) for expense_id, payload, _, _ in rows if payload is not None]
+        legacy = [(expense_id, tokens) for expense_id, payload, *tokens in rows if payload is None]
+        if sealed:
+            checks.submit(report.bad_expenses, _bad_payloads, row_cipher.keys, user_id, sealed)
+        if legacy:
+            checks.submit(report.bad_expenses, _bad_tokens, cipher, legacy)
+
+
+def scan_database(*, pool: str = DECRYPT_POOL) -> IntegrityReport:
+    """Check every user and expense row; expenses of users that no longer exist are reported as bad too."""
+    from database.connection import db
+
+    report = IntegrityReport()
+    checks = _Checks(_decrypt_pool(pool))
+    _scan_users(checks, report)
+
+    with db.connection() as conn:
+        users = conn.execute("SELECT user_id, username FROM users ORDER BY user_id").fetchall()
+        orphans = conn.execute(
+            "SELECT expense_id FROM expenses WHERE user_id NOT IN (SELECT user_id FROM users)"
+        ).fetchall()
+    for user_id, username in users:
+        _scan_expenses(checks, report, user_id, username)
+    report.expenses_checked += len(orphans)
+    report.bad_expenses.extend(row[0] for row in orphans)
+
+    checks.wait()
+    report.bad_users.sort()
+    report.bad_expenses.sort()
+    log.log(
+        "INFO",
+        f"Integrity scan: {len(report.bad_users)} of {report.users_checked} users and "
+        f"{len(report.bad_expenses)} of {report.expenses_checked} expenses fail to decrypt",
+    )
+    return report
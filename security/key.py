@@ -1,15 +1,19 @@
 # Copyright (c) 2025 ililihayy. All rights reserved.
 
+import base64
 import os
 
 from cryptography.fernet import Fernet
-from dotenv import load_dotenv, set_key
+from dotenv import load_dotenv, set_key, unset_key
 
 from log.logger import log
 
+ENV_FILE = ".env"  # every key below is read from and written to this file, relative to the working directory
 
-def ensure_encryption_key(env_file: str = ".env", key_name: str = "ENCRYPTION_KEY") -> None:
-    load_dotenv()
+
+def ensure_encryption_key(env_file: str | None = None, key_name: str = "ENCRYPTION_KEY") -> None:
+    env_file = env_file or ENV_FILE
+    load_dotenv(env_file)
     encryption_key = os.getenv(key_name)
     if encryption_key is None:
         encryption_key = Fernet.generate_key().decode()
@@ -18,11 +22,40 @@ def ensure_encryption_key(env_file: str = ".env", key_name: str = "ENCRYPTION_KE
 
 
 def get_encryption_key() -> str:
-    load_dotenv()
+    load_dotenv(ENV_FILE)
     encryption_key = os.getenv("ENCRYPTION_KEY")
     if not encryption_key:
         log.log("ERROR", "Failed to get the key to the database.")
         ensure_encryption_key()
-        load_dotenv()
+        load_dotenv(ENV_FILE)
         encryption_key = os.getenv("ENCRYPTION_KEY")
     return encryption_key
+
+
+def get_next_encryption_key() -> str | None:
+    """The main key a running rotation re-encrypts with (``NEXT_ENCRYPTION_KEY``), if one is running."""
+    load_dotenv(ENV_FILE)
+    return os.getenv("NEXT_ENCRYPTION_KEY") or None
+
+
+def set_env_key(name: str, value: str | None) -> None:
+    """Write (or with ``None`` remove) a key in ``ENV_FILE`` and in this process's environment."""
+    # set_key/unset_key only edit the file; load_dotenv does not override what os.environ already holds.
+    if value is None:
+        if name in os.environ:
+            del os.environ[name]
+        unset_key(ENV_FILE, name)
+    else:
+        os.environ[name] = value
+        set_key(ENV_FILE, name, value)
+
+
+def get_blind_index_key() -> bytes:
+    """Secret for the HMAC blind indexes; created in ``.env`` next to ``ENCRYPTION_KEY`` if missing."""
+    load_dotenv(ENV_FILE)
+    blind_index_key = os.getenv("BLIND_INDEX_KEY")
+    if not blind_index_key:
+        ensure_encryption_key(key_name="BLIND_INDEX_KEY")
+        load_dotenv(ENV_FILE)
+        blind_index_key = os.getenv("BLIND_INDEX_KEY")
+    return base64.urlsafe_b64decode(blind_index_key)
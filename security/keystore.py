@@ -0,0 +1,198 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+Wrapped per-user keys in the ``user_keys`` table, one row per user looked up by primary key.
+
+A user key is wrapped with a key derived from the user's ``user_id`` and salt, which live in the same database,
+so the table stores it sealed once more with the main ``ENCRYPTION_KEY``: the database file alone does not give
+away the user keys, as when they were kept in ``.env``. Callers pass and get the wrapped key; sealing is done here.
+
+They used to be ``ENCRYPTION_KEY_<username>`` lines in ``.env``; ``import_env_keys`` moves them over.
+"""
+
+from cryptography.fernet import InvalidToken
+from dotenv import dotenv_values, unset_key
+
+from log.logger import log
+
+ENV_KEY_PREFIX = "ENCRYPTION_KEY_"
+
+
+def create_user_keys_table() -> None:
+    from database.connection import db
+
+    with db.connection() as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS user_keys (
+                user_id INTEGER PRIMARY KEY REFERENCES users (user_id),
+                wrapped_key TEXT NOT NULL,
+                next_wrapped_key TEXT
+            )
+            """
+        )
+
+
+def _seal(wrapped_key: str) -> str:
+    from .utils import encrypt_data
+
+    return encrypt_data(wrapped_key)
+
+
+def _unseal(sealed_key: str | None) -> str | None:
+    from .utils import decrypt_data
+
+    return None if sealed_key is None else decrypt_data(sealed_key)
+
+
+def get_wrapped_key(user_id: int) -> str | None:
+    from database.connection import db
+
+    with db.connection() as conn:
+        row = conn.execute("SELECT wrapped_key FROM user_keys WHERE user_id = ?", (user_id,)).fetchone()
+    return _unseal(row[0]) if row else None
+
+
+def add_wrapped_key(user_id: int, wrapped_key: str) -> str:
+    """
+    Store the user's key unless one is already stored, in a single statement, and return the
+    stored key, so two racing writers end up using the same one.
+    """
+    from database.connection import db
+
+    with db.connection() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO user_keys (user_id, wrapped_key) VALUES (?, ?)", (user_id, _seal(wrapped_key))
+        )
+        return _unseal(conn.execute("SELECT wrapped_key FROM user_keys WHERE user_id = ?", (user_id,)).fetchone()[0])
+
+
+def get_next_wrapped_key(user_id: int) -> str | None:
+    """The key a running rotation re-encrypts the user's data with, if one is running."""
+    from database.connection import db
+
+    with db.connection() as conn:
+        row = conn.execute("SELECT next_wrapped_key FROM user_keys WHERE user_id = ?", (user_id,)).fetchone()
+    return _unseal(row[0]) if row else None
+
+
+def add_next_wrapped_key(user_id: int, wrapped_key: str) -> str:
+    """Like ``add_wrapped_key`` for the next key: a rotation that is resumed keeps the key it started with."""
+    from database.connection import db
+
+    with db.connection() as conn:
+        conn.execute(
+            "UPDATE user_keys SET next_wrapped_key = ? WHERE user_id = ? AND next_wrapped_key IS NULL",
+            (_seal(wrapped_key), user_id),
+        )
+        row = conn.execute("SELECT next_wrapped_key FROM user_keys WHERE user_id = ?", (user_id,)).fetchone()
+        return _unseal(row[0])
+
+
+def promote_next_key(user_id: int) -> None:
+    """Make the next key the user's key once every row is re-encrypted with it."""
+    from database.connection import db
+
+    with db.connection() as conn:
+        conn.execute(
+            "UPDATE user_keys SET wrapped_key = next_wrapped_key, next_wrapped_key = NULL "
+            "WHERE user_id = ? AND next_wrapped_key IS NOT NULL",
+            (user_id,),
+        )
+
+
+def replace_wrapped_key(user_id: int, wrapped_key: str) -> None:
+    from database.connection import db
+
+    with db.connection() as conn:
+        conn.execute(
+            "INSERT INTO user_keys (user_id, wrapped_key) VALUES (?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET wrapped_key = excluded.wrapped_key",
+            (user_id, _seal(wrapped_key)),
+        )
+
+
+def seal_stored_keys() -> int:
+    """
+    Seal the keys stored before ``user_keys`` was sealed with the main key; return how many were sealed.
+    A key the main key already opens is sealed and left alone, so running this again changes nothing.
+    """
+    from database.connection import db
+
+    from .utils import get_master_cipher
+
+    def unsealed(value: str | None) -> bool:
+        if value is None:
+            return False
+        try:
+            get_master_cipher().decrypt(value.encode())
+        except InvalidToken:
+            return True
+        return False
+
+    sealed = 0
+    with db.connection() as conn:
+        # A fresh database has no keys: the main key is not read, nor created, just for this.
+        rows = conn.execute("SELECT user_id, wrapped_key, next_wrapped_key FROM user_keys").fetchall()
+        for user_id, wrapped_key, next_wrapped_key in rows:
+            values = [_seal(key) if unsealed(key) else key for key in (wrapped_key, next_wrapped_key)]
+            if values != [wrapped_key, next_wrapped_key]:
+                conn.execute(
+                    "UPDATE user_keys SET wrapped_key = ?, next_wrapped_key = ? WHERE user_id = ?", (*values, user_id)
+                )
+                sealed += 1
+    log.log("INFO", f"Sealed {sealed} stored user keys with the main key")
+    return sealed
+
+
+def env_key(username: str, env_file: str = ".env") -> str | None:
+    """The user's key as still written in ``env_file``, if it is there."""
+    return dotenv_values(env_file).get(f"{ENV_KEY_PREFIX}{username}") or None
+
+
+def _env_entries(env_file: str) -> dict[str, str]:
+    return {
+        name.removeprefix(ENV_KEY_PREFIX): value
+        for name, value in dotenv_values(env_file).items()
+        if name.startswith(ENV_KEY_PREFIX) and value
+    }
+
+
+def import_env_keys(env_file: str = ".env") -> int:
+    """
+    Copy every ``ENCRYPTION_KEY_<username>`` entry of ``env_file`` into ``user_keys`` in one
+    transaction and return how many were added; keys already in the table are kept.
+    """
+    from database.connection import db
+
+    entries = _env_entries(env_file)
+    imported = 0
+    with db.connection() as conn:
+        for username, wrapped_key in entries.items():
+            row = conn.execute("SELECT user_id FROM users WHERE username = ?", (username,)).fetchone()
+            if row is None:
+                log.log("WARNING", f"Skip {ENV_KEY_PREFIX}{username}: user '{username}' does not exist")
+                continue
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO user_keys (user_id, wrapped_key) VALUES (?, ?)", (row[0], _seal(wrapped_key))
+            )
+            imported += cursor.rowcount
+    log.log("INFO", f"Imported {imported} user keys from {env_file}")
+    return imported
+
+
+def prune_env_keys(env_file: str = ".env") -> int:
+    """Remove the ``.env`` entries whose key the keystore holds unchanged; return how many were removed."""
+    from database.connection import db
+
+    pruned = 0
+    for username, wrapped_key in _env_entries(env_file).items():
+        with db.connection() as conn:
+            row = conn.execute(
+                "SELECT wrapped_key FROM user_keys JOIN users USING (user_id) WHERE username = ?", (username,)
+            ).fetchone()
+        if row and _unseal(row[0]) == wrapped_key:
+            unset_key(env_file, f"{ENV_KEY_PREFIX}{username}")
+            pruned += 1
+    log.log("INFO", f"Removed {pruned} imported user keys from {env_file}")
+    return pruned
@@ -0,0 +1,166 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+"""
+Key rotation: re-encrypt stored data under a new key in resumable keyset batches.
+
+While a rotation runs the new key is kept next to the old one (``NEXT_ENCRYPTION_KEY`` in ``.env`` for the
+main key, ``user_keys.next_wrapped_key`` for a user's key), and ciphers built meanwhile encrypt with the new
+key and decrypt with either, so data stays readable half way through. Each batch is committed together with
+its checkpoint in ``migration_progress``; running a rotation again after an interruption resumes with the
+same new key after the last committed row. Only one batch is held in memory at a time.
+
+Other processes keep the ciphers they already built: run a rotation while the app is closed, or from the
+app's own process.
+"""
+
+import sqlite3
+
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+from . import keystore
+from .key import get_next_encryption_key, set_env_key
+from .user_key import get_next_user_encryption_key, session_keys, user_ciphers
+from log.logger import log
+
+BATCH_SIZE = 1000
+LAST_ROW_ID = 2**63 - 1  # the largest rowid SQLite hands out
+MASTER_CHECKPOINT = "rotate:master"
+
+
+def _checkpoint(conn: sqlite3.Connection, name: str) -> int:
+    row = conn.execute("SELECT last_id FROM migration_progress WHERE table_name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def _save_checkpoint(conn: sqlite3.Connection, name: str, last_id: int) -> None:
+    conn.execute(
+        "INSERT INTO migration_progress (table_name, last_id) VALUES (?, ?) "
+        "ON CONFLICT (table_name) DO UPDATE SET last_id = excluded.last_id",
+        (name, last_id),
+    )
+
+
+def _rotate_user_keys(conn: sqlite3.Connection, cipher: MultiFernet, after_id: int, through_id: int) -> None:
+    """Re-seal the stored keys of the users with ``after_id < user_id <= through_id`` under the new main key."""
+    rows = conn.execute(
+        "SELECT user_id, wrapped_key, next_wrapped_key FROM user_keys WHERE user_id > ? AND user_id <= ?",
+        (after_id, through_id),
+    ).fetchall()
+    values = []
+    for user_id, *keys in rows:
+        try:
+            values.append((*(None if key is None else cipher.rotate(key.encode()).decode() for key in keys), user_id))
+        except InvalidToken:
+            log.log("ERROR", f"Cannot decrypt the stored key of user {user_id} with the main key, left unchanged")
+    conn.executemany("UPDATE user_keys SET wrapped_key = ?, next_wrapped_key = ? WHERE user_id = ?", values)
+
+
+def rotate_master_key() -> int:
+    """
+    Re-encrypt every user's email, password and stored key under a new ``ENCRYPTION_KEY``; return how many
+    users were rotated. The keys are written to ``security.key.ENV_FILE``, the file the app reads them from.
+    """
+    from database.connection import db
+    from database.utils import Utils
+
+    from .utils import reload_encryption_key
+
+    new_key = get_next_encryption_key()
+    if new_key is None:
+        new_key = Fernet.generate_key().decode()
+        set_env_key("NEXT_ENCRYPTION_KEY", new_key)
+        log.log("INFO", "Started a rotation of the main encryption key")
+    cipher = reload_encryption_key()
+
+    with db.connection() as conn:
+        last_id = _checkpoint(conn, MASTER_CHECKPOINT)
+    rotated = 0
+    while True:
+        with db.connection() as conn:
+            rows = conn.execute(
+                "SELECT user_id, email, password FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                (last_id, BATCH_SIZE),
+            ).fetchall()
+            if not rows:
+                _rotate_user_keys(conn, cipher, last_id, LAST_ROW_ID)  # keys of users that no longer exist
+                # Clear the checkpoint before switching keys: a run interrupted after this point
+                # re-encrypts everything with the same new key again instead of skipping rows.
+                conn.execute("DELETE FROM migration_progress WHERE table_name = ?", (MASTER_CHECKPOINT,))
+                break
+            values = []
+            for user_id, email, password in rows:
+                try:
+                    values.append(
+                        (cipher.rotate(email.encode()).decode(), cipher.rotate(password.encode()).decode(), user_id)
+                    )
+                except InvalidToken:
+                    log.log("ERROR", f"Cannot decrypt user {user_id} with the main key, left unchanged")
+            conn.executemany("UPDATE users SET email = ?, password = ? WHERE user_id = ?", values)
+            _rotate_user_keys(conn, cipher, last_id, rows[-1][0])
+            last_id = rows[-1][0]
+            _save_checkpoint(conn, MASTER_CHECKPOINT, last_id)
+        rotated += len(values)
+        log.log("INFO", f"Rotated the main key of users up to user_id {last_id}")
+
+    set_env_key("ENCRYPTION_KEY", new_key)
+    set_env_key("NEXT_ENCRYPTION_KEY", None)
+    reload_encryption_key()
+    Utils.forget_user_record()
+    log.log("INFO", f"Rotated the main encryption key, {rotated} users re-encrypted")
+    return rotated
+
+
+def rotate_user_key(username: str) -> int:
+    """Re-encrypt every expense of ``username`` under a new user key; return how many expenses were rotated."""
+    from database.connection import db
+    from database.utils import Utils
+
+    user_id = Utils.get_user_id(username)
+    if user_id is None:
+        raise ValueError(f"User '{username}' does not exist")
+
+    get_next_user_encryption_key(username, create=True)
+    cipher, row_cipher = user_ciphers(username)
+    if session_keys.username == username:
+        # Rows the user adds meanwhile must be sealed with the new key as well.
+        session_keys.open(username)
+
+    name = f"rotate:user:{user_id}"
+    with db.connection() as conn:
+        last_id = _checkpoint(conn, name)
+    rotated = 0
+    while True:
+        with db.connection() as conn:
+            rows = conn.execute(
+                "SELECT expense_id, payload, amount, expense_date FROM expenses "
+                "WHERE user_id = ? AND expense_id > ? ORDER BY expense_id LIMIT ?",
+                (user_id, last_id, BATCH_SIZE),
+            ).fetchall()
+            if not rows:
+                conn.execute("DELETE FROM migration_progress WHERE table_name = ?", (name,))
+                keystore.promote_next_key(user_id)
+                break
+            values = []
+            for expense_id, payload, amount, expense_date in rows:
+                try:
+                    if payload is not None:
+                        sealed = row_cipher.seal(user_id, *row_cipher.open(user_id, payload))
+                        values.append((sealed, None, None, expense_id))
+                    else:
+                        tokens = cipher.rotate(amount.encode()), cipher.rotate(expense_date.encode())
+                        values.append((None, tokens[0].decode(), tokens[1].decode(), expense_id))
+                except (InvalidTag, InvalidToken, ValueError):
+                    log.log("ERROR", f"Cannot decrypt expense {expense_id} of user '{username}', left unchanged")
+            conn.executemany(
+                "UPDATE expenses SET payload = ?, amount = ?, expense_date = ? WHERE expense_id = ?", values
+            )
+            last_id = rows[-1][0]
+            _save_checkpoint(conn, name, last_id)
+        rotated += len(values)
+        log.log("INFO", f"Rotated the key of user '{username}' up to expense_id {last_id}")
+
+    if session_keys.username == username:
+        session_keys.open(username)
+    log.log("INFO", f"Rotated the encryption key of user '{username}', {rotated} expenses re-encrypted")
+    return rotated
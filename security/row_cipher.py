@@ -0,0 +1,67 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+import base64
+import os
+import struct
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+# payload = version (1 byte) | nonce (12 bytes) | AES-GCM(amount_minor int64, expense_day uint32) + tag (16 bytes)
+ROW_FORMAT_VERSION = 1
+NONCE_SIZE = 12
+_FIELDS = struct.Struct(">qI")
+_HKDF_INFO = b"finance-tracker expense row v1"
+
+
+def derive_row_key(user_key: bytes) -> bytes:
+    """AES-256 key for a user's expense rows, derived from the user's Fernet key."""
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=_HKDF_INFO)
+    return hkdf.derive(base64.urlsafe_b64decode(user_key))
+
+
+class RowCipher:
+    """
+    Seals the encrypted fields of one expense into a single authenticated ``payload`` blob.
+
+    The owner's ``user_id`` is authenticated with every row, so a payload copied to
+    another user's row fails to open. ``open`` raises ``cryptography.exceptions.InvalidTag``
+    for a tampered payload and ``ValueError`` for an unknown format version.
+
+    Rows are sealed with ``key``; ``previous_keys`` are still accepted by ``open``, so rows
+    stay readable while a key rotation is re-sealing them.
+    """
+
+    def __init__(self, key: bytes, *previous_keys: bytes):
+        self.keys = (key, *previous_keys)
+        self._aead = AESGCM(key)
+        self._previous = [AESGCM(previous) for previous in previous_keys]
+
+    @staticmethod
+    def _aad(version: int, user_id: int) -> bytes:
+        return bytes([version]) + user_id.to_bytes(8, "big")
+
+    def seal(self, user_id: int, amount_minor: int, expense_day: int) -> bytes:
+        nonce = os.urandom(NONCE_SIZE)
+        sealed = self._aead.encrypt(
+            nonce, _FIELDS.pack(amount_minor, expense_day), self._aad(ROW_FORMAT_VERSION, user_id)
+        )
+        return bytes([ROW_FORMAT_VERSION]) + nonce + sealed
+
+    def open(self, user_id: int, payload: bytes) -> tuple[int, int]:
+        """Return ``(amount_minor, expense_day)``."""
+        version = payload[0]
+        if version != ROW_FORMAT_VERSION:
+            raise ValueError(f"Unknown expense row format version {version}")
+        nonce, sealed, aad = payload[1 : 1 + NONCE_SIZE], payload[1 + NONCE_SIZE :], self._aad(version, user_id)
+        try:
+            return _FIELDS.unpack(self._aead.decrypt(nonce, sealed, aad))
+        except InvalidTag:
+            for previous in self._previous:
+                try:
+                    return _FIELDS.unpack(previous.decrypt(nonce, sealed, aad))
+                except InvalidTag:
+                    pass
+            raise
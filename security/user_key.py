@@ -2,13 +2,15 @@
 
 import base64
 import os
+import threading
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from dotenv import load_dotenv, set_key
 
+from . import keystore
+from .row_cipher import RowCipher, derive_row_key
 from log.logger import log
 
 ITERATIONS = 1
@@ -35,32 +37,141 @@ def _generate_decryption_key(username: str):
     return base64.urlsafe_b64encode(key)
 
 
-def ensure_user_encryption_key(username: str, env_file: str = ".env") -> None:
-    load_dotenv()
-    key_name = f"ENCRYPTION_KEY_{username}"
-    encryption_key = os.getenv(key_name)
+def _stored_user_key(username: str) -> str | None:
+    from database.utils import Utils
+
+    user_id = Utils.get_user_id(username)
+    if not user_id:
+        return None
+    encrypted_key = keystore.get_wrapped_key(user_id)
+    if encrypted_key is None and (env_key := keystore.env_key(username)):
+        # Not imported yet, e.g. a migration needs the key before the import step ran.
+        encrypted_key = keystore.add_wrapped_key(user_id, env_key)
+    return encrypted_key
+
+
+def _wrap_key(username: str, user_encryption_key: bytes) -> str:
+    return Fernet(_generate_decryption_key(username)).encrypt(user_encryption_key).decode()
 
-    if encryption_key is None:
-        gen_key = _generate_decryption_key(username)
-        encryptor = Fernet(gen_key)
-        user_encryption_key = Fernet.generate_key()  # bytes
-        encrypted_user_key = encryptor.encrypt(user_encryption_key)
-        set_key(env_file, key_name, encrypted_user_key.decode())
+
+def _unwrap_key(username: str, encrypted_key: str) -> bytes:
+    return Fernet(_generate_decryption_key(username)).decrypt(encrypted_key.encode())
+
+
+def ensure_user_encryption_key(username: str) -> str:
+    """Create the user's key in the keystore if it has none; return the stored (wrapped) key."""
+    from database.utils import Utils
+
+    encrypted_key = _stored_user_key(username)
+
+    if encrypted_key is None:
+        user_id = Utils.get_user_id(username)
+        encrypted_key = keystore.add_wrapped_key(user_id, _wrap_key(username, Fernet.generate_key()))
         log.log("INFO", "The encryption user`s key has been created")
-        return encrypted_user_key.decode()
+    return encrypted_key
 
 
-def get_user_encryption_key(username: str, env_file: str = ".env") -> bytes:
-    load_dotenv()
-    key_name = f"ENCRYPTION_KEY_{username}"
-    encrypted_key = os.getenv(key_name)
+def get_user_encryption_key(username: str) -> bytes:
+    encrypted_key = _stored_user_key(username)
 
     if not encrypted_key:
         encrypted_key = ensure_user_encryption_key(username)
-        log.log("ERROR", "Encryption user key not found in environment.")
+        log.log("ERROR", "Encryption user key not found in the keystore.")
+
+    return _unwrap_key(username, encrypted_key)
+
 
-    decryption_key = _generate_decryption_key(username)
-    decryptor = Fernet(decryption_key)
-    decrypted_key = decryptor.decrypt(encrypted_key.encode())
+def stored_user_key(user_id: int, username: str) -> bytes | None:
+    """
+    The user's key from the keystore, or from ``.env`` if it was not imported yet, without writing to
+    either: ``None`` when neither has it, where ``get_user_encryption_key`` would create a new one.
+    """
+    encrypted_key = keystore.get_wrapped_key(user_id) or keystore.env_key(username)
+    return _unwrap_key(username, encrypted_key) if encrypted_key else None
 
-    return decrypted_key
+
+def get_next_user_encryption_key(username: str, *, create: bool = False) -> bytes | None:
+    """
+    The key a rotation of the user's key re-encrypts with, if one is running; with ``create``
+    a rotation that is not running yet gets a new key.
+    """
+    from database.utils import Utils
+
+    user_id = Utils.get_user_id(username)
+    encrypted_key = keystore.get_next_wrapped_key(user_id) if user_id else None
+    if encrypted_key is None and create:
+        ensure_user_encryption_key(username)
+        encrypted_key = keystore.add_next_wrapped_key(user_id, _wrap_key(username, Fernet.generate_key()))
+    return _unwrap_key(username, encrypted_key) if encrypted_key else None
+
+
+def get_user_encryption_keys(username: str) -> list[bytes]:
+    """The user's keys, the one to encrypt with first: the next key during a rotation, then the current one."""
+    key = get_user_encryption_key(username)
+    next_key = get_next_user_encryption_key(username)
+    return [next_key, key] if next_key else [key]
+
+
+def _ciphers(keys: list[bytes]) -> tuple[Fernet | MultiFernet, RowCipher]:
+    cipher = Fernet(keys[0]) if len(keys) == 1 else MultiFernet([Fernet(key) for key in keys])
+    return cipher, RowCipher(*(derive_row_key(key) for key in keys))
+
+
+def user_ciphers(username: str) -> tuple[Fernet | MultiFernet, RowCipher]:
+    """Field and row ciphers that encrypt with the user's newest key and decrypt with any of them."""
+    return _ciphers(get_user_encryption_keys(username))
+
+
+def stored_user_ciphers(user_id: int, username: str) -> tuple[Fernet | MultiFernet, RowCipher] | None:
+    """
+    Like ``user_ciphers``, but only from the keys already in the keystore and without writing to it:
+    ``None`` when the user has no stored key, where ``user_ciphers`` would import or create one.
+    """
+    encrypted_key = keystore.get_wrapped_key(user_id)
+    if encrypted_key is None:
+        return None
+    keys = [_unwrap_key(username, encrypted_key)]
+    if next_key := keystore.get_next_wrapped_key(user_id):
+        keys.insert(0, _unwrap_key(username, next_key))
+    return _ciphers(keys)
+
+
+class UserKeyCache:
+    """
+    Keeps ready ciphers for the logged-in user, so encrypting or decrypting a
+    field does not look up the wrapped key, query the salt and re-derive the key.
+
+    ``open()`` is called at login and replaces the ciphers of any previous user;
+    ``clear()`` is called at logout. Other users' keys are derived on every call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.username: str | None = None
+        self._cipher: Fernet | MultiFernet | None = None
+        self._row_cipher: RowCipher | None = None
+
+    def open(self, username: str) -> Fernet | MultiFernet:
+        cipher, row_cipher = user_ciphers(username)
+        with self._lock:
+            self.username, self._cipher, self._row_cipher = username, cipher, row_cipher
+        return cipher
+
+    def clear(self) -> None:
+        with self._lock:
+            self.username, self._cipher, self._row_cipher = None, None, None
+
+    def cipher(self, username: str) -> Fernet | MultiFernet:
+        with self._lock:
+            if self._cipher is not None and username == self.username:
+                return self._cipher
+        return user_ciphers(username)[0]
+
+    def row_cipher(self, username: str) -> RowCipher:
+        with self._lock:
+            if self._row_cipher is not None and username == self.username:
+                return self._row_cipher
+        return user_ciphers(username)[1]
+
+
+session_keys = UserKeyCache()
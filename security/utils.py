@@ -1,32 +1,203 @@
 # Copyright (c) 2025 ililihayy. All rights reserved.
 
-from cryptography.fernet import Fernet
+import hashlib
+import hmac
+import os
+import threading
+from collections.abc import Callable, Sequence
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any
+
+from cryptography.fernet import Fernet, MultiFernet
 
 from auth.auth import Auth
-from .key import get_encryption_key
-from .user_key import get_user_encryption_key
-from pathlib import Path
+from .key import get_blind_index_key, get_encryption_key, get_next_encryption_key
+from .row_cipher import RowCipher
+from .user_key import session_keys
+from workers import SpawnPool
+
+
+def _load_master_cipher() -> Fernet | MultiFernet:
+    cipher = Fernet(get_encryption_key().encode())
+    next_key = get_next_encryption_key()
+    if next_key is None:
+        return cipher
+    # A rotation is running: encrypt with the new key, decrypt with either.
+    return MultiFernet([Fernet(next_key.encode()), cipher])
+
+
+class MasterKeyCache:
+    """
+    The cipher for ``ENCRYPTION_KEY`` and the ``BLIND_INDEX_KEY`` secret, each read from ``.env`` on first
+    use and kept for the process; ``reload()`` re-reads them after they were changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cipher: Fernet | MultiFernet | None = None
+        self._blind_key: bytes | None = None
+
+    def cipher(self) -> Fernet | MultiFernet:
+        cipher = self._cipher
+        if cipher is None:
+            with self._lock:
+                if self._cipher is None:
+                    self._cipher = _load_master_cipher()
+                cipher = self._cipher
+        return cipher
+
+    def blind_key(self) -> bytes:
+        key = self._blind_key
+        if key is None:
+            with self._lock:
+                if self._blind_key is None:
+                    self._blind_key = get_blind_index_key()
+                key = self._blind_key
+        return key
+
+    def reload(self) -> Fernet | MultiFernet:
+        with self._lock:
+            self._cipher = _load_master_cipher()
+            self._blind_key = None
+            return self._cipher
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cipher, self._blind_key = None, None
+
+
+master_keys = MasterKeyCache()
+
+
+def get_master_cipher() -> Fernet | MultiFernet:
+    """Cipher for ``ENCRYPTION_KEY``; ``.env`` is read on the first call only."""
+    return master_keys.cipher()
+
+
+def reload_encryption_key() -> Fernet | MultiFernet:
+    """Re-read ``ENCRYPTION_KEY`` and ``BLIND_INDEX_KEY`` after they were changed, e.g. by a key rotation."""
+    return master_keys.reload()
+
+
+def blind_index(value: str) -> bytes:
+    """
+    Keyed HMAC-SHA256 of a trimmed, lower-cased value. Unlike a Fernet token it is
+    deterministic, so an indexed column of these answers equality lookups on an
+    encrypted column without decrypting it.
+    """
+    return hmac.new(master_keys.blind_key(), value.strip().lower().encode(), hashlib.sha256).digest()
 
 
 def encrypt_data(data: str) -> str:
-    ENCRYPTION_KEY = get_encryption_key().encode()
-    cipher = Fernet(ENCRYPTION_KEY)
-    return cipher.encrypt(data.encode()).decode()
+    return get_master_cipher().encrypt(data.encode()).decode()
 
 
 def decrypt_data(encrypted_data: str) -> str:
-    ENCRYPTION_KEY = get_encryption_key().encode()
-    cipher = Fernet(ENCRYPTION_KEY)
-    return cipher.decrypt(encrypted_data.encode()).decode()
+    return get_master_cipher().decrypt(encrypted_data.encode()).decode()
+
+
+def get_user_cipher(username: str | None = None) -> Fernet | MultiFernet:
+    """Cipher for ``username`` (the logged-in user by default); resolve it once when encrypting many values."""
+    return session_keys.cipher(username or Auth.current_user)
+
+
+def get_row_cipher(username: str | None = None) -> RowCipher:
+    """Expense row cipher for ``username`` (the logged-in user by default)."""
+    return session_keys.row_cipher(username or Auth.current_user)
 
 
 def encrypt_data_user(data: str) -> str:
-    ENCRYPTION_KEY_USER = get_user_encryption_key(Auth.current_user)
-    cipher_user = Fernet(ENCRYPTION_KEY_USER)
+    cipher_user = get_user_cipher()
     return cipher_user.encrypt(data.encode()).decode()
 
 
 def decrypt_data_user(encrypted_data: str) -> str:
-    ENCRYPTION_KEY_USER = get_user_encryption_key(Auth.current_user)
-    cipher_user = Fernet(ENCRYPTION_KEY_USER)
+    cipher_user = get_user_cipher()
     return cipher_user.decrypt(encrypted_data.encode()).decode()
+
+
+# Columns shorter than this are decrypted inline: below it the pool's hand-off costs more than it saves.
+PARALLEL_THRESHOLD = 50_000
+DECRYPT_CHUNK_SIZE = 10_000
+# "process", "thread" or "none"; a pool cannot help on a single CPU.
+DECRYPT_POOL = os.getenv("TRACKER_DECRYPT_POOL", "process" if (os.cpu_count() or 1) > 1 else "none")
+
+_process_pool = SpawnPool()
+_pools: dict[str, Executor] = {}
+_pools_lock = threading.Lock()
+
+
+def _decrypt_pool(kind: str) -> Executor | None:
+    if kind == "none":
+        return None
+    if kind == "process":
+        return _process_pool.get()
+    if kind != "thread":
+        raise ValueError(f"Unknown decrypt pool '{kind}', expected 'process', 'thread' or 'none'")
+    with _pools_lock:
+        if kind not in _pools:
+            _pools[kind] = ThreadPoolExecutor(thread_name_prefix="tracker-decrypt")
+        return _pools[kind]
+
+
+def _in_chunks(
+    func: Callable[..., list[Any]], items: Sequence[Any], *args: Any, pool: str, threshold: int
+) -> list[Any]:
+    """``func(*args, items)``, split into chunks on a ``pool`` of workers when there are ``threshold`` items or more."""
+    executor = _decrypt_pool(pool) if len(items) >= threshold else None
+    if executor is None:
+        return func(*args, items)
+    futures = [
+        executor.submit(func, *args, items[start : start + DECRYPT_CHUNK_SIZE])
+        for start in range(0, len(items), DECRYPT_CHUNK_SIZE)
+    ]
+    return [value for future in futures for value in future.result()]
+
+
+def _decrypt_chunk(
+    cipher: Fernet | MultiFernet, parse: Callable[[str], Any] | None, tokens: Sequence[str]
+) -> list[Any]:
+    decrypt = cipher.decrypt
+    if parse is None:
+        return [decrypt(token.encode()).decode() for token in tokens]
+    return [parse(decrypt(token.encode()).decode()) for token in tokens]
+
+
+def decrypt_many(
+    columns: Sequence[Sequence[str]],
+    cipher: Fernet | MultiFernet | None = None,
+    parsers: Sequence[Callable[[str], Any] | None] | None = None,
+    *,
+    pool: str = DECRYPT_POOL,
+    threshold: int = PARALLEL_THRESHOLD,
+) -> list[list[Any]]:
+    """
+    Decrypt equally long columns of tokens with one cipher (the logged-in user's by default)
+    and pass each value through the column's parser.
+
+    Columns of ``threshold`` rows or more are split into chunks and decrypted on a
+    ``pool`` of workers; parsers must then be picklable module-level functions.
+    """
+    cipher = cipher or get_user_cipher()
+    parsers = parsers or [None] * len(columns)
+    return [
+        _in_chunks(_decrypt_chunk, column, cipher, parse, pool=pool, threshold=threshold)
+        for column, parse in zip(columns, parsers, strict=True)
+    ]
+
+
+def _open_chunk(keys: tuple[bytes, ...], rows: Sequence[tuple[int, bytes]]) -> list[tuple[int, int]]:
+    row_cipher = RowCipher(*keys)
+    return [row_cipher.open(user_id, payload) for user_id, payload in rows]
+
+
+def open_rows(
+    rows: Sequence[tuple[int, bytes]],
+    row_cipher: RowCipher | None = None,
+    *,
+    pool: str = DECRYPT_POOL,
+    threshold: int = PARALLEL_THRESHOLD,
+) -> list[tuple[int, int]]:
+    """``(amount_minor, expense_day)`` of each ``(user_id, payload)``, with the same pooling as ``decrypt_many``."""
+    row_cipher = row_cipher or get_row_cipher()
+    return _in_chunks(_open_chunk, rows, row_cipher.keys, pool=pool, threshold=threshold)
@@ -1,6 +1,6 @@
 from pathlib import Path
 from dotenv import load_dotenv, set_key
-from database.create_database import create_users_table
+from database.create_database import create_full_database
 
 
 def create_env():
@@ -14,6 +14,5 @@ def create_env():
 
 
 def create_db():
-    db_path = Path("tracker.db")
-    if not db_path.exists():
-        create_users_table()
+    # Runs on every start: the tables are created if missing and pending migrations are applied.
+    create_full_database()
@@ -1,7 +1,36 @@
+import asyncio
+import os
+import tempfile
+import threading
 import unittest
+from collections import Counter
+from datetime import UTC, date, datetime, timedelta
+from pathlib import Path
 from unittest.mock import patch
 
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from dotenv import dotenv_values
+
+from auth import hashing
 from auth.auth import Auth
+from database import migrations
+from database.aio import AsyncFacade
+from database.connection import ConnectionManager, db
+from database.create_database import create_full_database, create_users_table
+from database.dates import month_bounds, parse_date
+from database.exceptions import CategoryNotFoundError
+from database.money import from_minor, to_minor
+from database.rollup import rebuild_monthly_totals
+from database.schedules import Schedule
+from database.utils import Utils
+from expenses.analytics import ExpenseColumns
+from expenses.reports import TrendReport
+from expenses.repository import ExpenseRepository
+from security import key as key_file, keystore, rotation, utils as security_utils
+from security.integrity import scan_database
+from security.row_cipher import RowCipher, derive_row_key
+from security.user_key import UserKeyCache, _unwrap_key, _wrap_key, generate_salt_bytes, get_user_encryption_key
 
 
 class TestUtils(unittest.TestCase):
@@ -16,5 +45,669 @@ class TestUtils(unittest.TestCase):
         self.assertFalse(Auth.verify_email_exists("nonexistent@example.com"))
 
 
+class TestHashing(unittest.TestCase):
+    def test_hash_round_trip_and_rehash_check(self):
+        stored_hash = hashing.hash_password("Secret#1", rounds=4)
+        self.assertTrue(hashing.check_password(stored_hash, "Secret#1"))
+        self.assertFalse(hashing.check_password(stored_hash, "secret#1"))
+        self.assertEqual(hashing.hash_rounds(stored_hash), 4)
+        self.assertFalse(hashing.needs_rehash(stored_hash, rounds=4))
+        self.assertTrue(hashing.needs_rehash(stored_hash, rounds=5))
+
+
+class TestConnectionManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manager = ConnectionManager(str(Path(self.tmp.name) / "test.db"))
+
+    def tearDown(self):
+        self.manager.close_all()
+        self.tmp.cleanup()
+
+    def test_connection_is_reused(self):
+        with self.manager.connection() as first:
+            pass
+        with self.manager.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(self.manager.connects, 1)
+
+    def test_nested_blocks_share_one_transaction(self):
+        with self.manager.connection() as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+        with self.assertRaises(RuntimeError), self.manager.connection() as conn:
+            conn.execute("INSERT INTO t VALUES (1)")
+            with self.manager.connection() as inner:
+                inner.execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError
+        with self.manager.connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM t").fetchone()[0], 0)
+
+    def test_storage_profile_is_applied(self):
+        self.manager.configure(profile="fast")
+        with self.manager.connection() as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+
+
+class TempDatabaseTestCase(unittest.TestCase):
+    """A fresh database file per test, with the user-record cache reset on both sides."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.previous_path = db.path
+        db.configure(path=str(Path(self.tmp.name) / "tracker.db"))
+        Utils.forget_user_record()
+
+    def tearDown(self):
+        db.configure(path=self.previous_path)
+        Utils.forget_user_record()
+        self.tmp.cleanup()
+
+
+class ExpenseTestCase(TempDatabaseTestCase):
+    """The full schema with user ``alice`` (``user_id`` 1), whose ciphers are patched to a fresh key."""
+
+    def setUp(self):
+        super().setUp()
+        create_full_database()
+        with db.connection() as conn:
+            conn.execute("INSERT INTO users (username, email, password) VALUES ('alice', 'e', 'p')")
+        key = Fernet.generate_key()
+        self.cipher = Fernet(key)
+        self.patches = [
+            patch("database.utils.get_user_cipher", return_value=self.cipher),
+            patch("database.utils.get_row_cipher", return_value=RowCipher(derive_row_key(key))),
+            patch("security.user_key.get_user_encryption_key", return_value=key),
+            patch("security.user_key.stored_user_key", return_value=key),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        super().tearDown()
+
+
+class TestMigrations(TempDatabaseTestCase):
+    def setUp(self):
+        self.key_patches = [
+            patch("security.utils.get_encryption_key", return_value=Fernet.generate_key().decode()),
+            patch("security.utils.get_blind_index_key", return_value=b"blind-index-test-key"),
+        ]
+        for p in self.key_patches:
+            p.start()
+        security_utils.reload_encryption_key()
+        super().setUp()
+        create_users_table()
+        with db.connection() as conn:
+            conn.execute("INSERT INTO users (username, email, password) VALUES ('alice', 'e', 'p')")
+            conn.execute("CREATE TABLE categories_alice (category_id INTEGER PRIMARY KEY, name TEXT UNIQUE)")
+            conn.execute("INSERT INTO categories_alice (name) VALUES ('Дім'), ('Одяг')")
+            conn.execute(
+                "CREATE TABLE expenses_alice (expense_id INTEGER PRIMARY KEY, category TEXT, amount TEXT, "
+                "expense_date TEXT)"
+            )
+            conn.executemany(
+                "INSERT INTO expenses_alice (category, amount, expense_date) VALUES ('Дім', ?, 'd')",
+                [(str(i),) for i in range(25)],
+            )
+
+    def tearDown(self):
+        super().tearDown()
+        for p in self.key_patches:
+            p.stop()
+        security_utils.master_keys.clear()
+
+    def _tables(self):
+        with db.connection() as conn:
+            return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+    def test_per_user_tables_are_moved(self):
+        migrations.migrate()
+        self.assertNotIn("expenses_alice", self._tables())
+        self.assertNotIn("categories_alice", self._tables())
+        with db.connection() as conn:
+            amounts = [row[0] for row in conn.execute("SELECT amount FROM expenses WHERE user_id = 1")]
+            categories = [row[0] for row in conn.execute("SELECT name FROM categories WHERE user_id = 1")]
+        self.assertEqual(amounts, [str(i) for i in range(25)])
+        self.assertEqual(categories, ["Дім", "Одяг"])
+        self.assertEqual(migrations.schema_version(), len(migrations.MIGRATIONS))
+
+    def test_interrupted_move_resumes(self):
+        migrations._create_shared_tables()
+        with (
+            patch.object(migrations, "BATCH_SIZE", 10),
+            patch.object(migrations.log, "log", side_effect=[None, RuntimeError]),
+            self.assertRaises(RuntimeError),
+        ):
+            migrations._move_expenses("expenses_alice", 1)
+        migrations.migrate()
+        with db.connection() as conn:
+            amounts = [row[0] for row in conn.execute("SELECT amount FROM expenses WHERE user_id = 1")]
+        self.assertEqual(amounts, [str(i) for i in range(25)])
+
+    def test_backfills_decrypt_legacy_rows(self):
+        with db.connection() as conn:
+            conn.execute("UPDATE users SET salt = ?", (generate_salt_bytes(),))
+            conn.execute("DELETE FROM expenses_alice")
+        keystore.create_user_keys_table()
+        cipher = Fernet(get_user_encryption_key("alice"))
+        with db.connection() as conn:
+            conn.executemany(
+                "INSERT INTO expenses_alice (category, amount, expense_date) VALUES ('Дім', ?, ?)",
+                [
+                    (cipher.encrypt(b"12.5").decode(), cipher.encrypt(b"03/02/2025").decode()),
+                    (cipher.encrypt(b"0.1").decode(), cipher.encrypt(b"28/02/2025").decode()),
+                    ("not a token", "not a token"),
+                ],
+            )
+
+        migrations._unify_user_tables()
+        migrations._add_expense_day()
+        migrations._add_amount_minor()
+        with db.connection() as conn:
+            rows = conn.execute("SELECT expense_day, amount_minor FROM expenses ORDER BY expense_id").fetchall()
+        self.assertEqual(
+            rows, [(date(2025, 2, 3).toordinal(), 1250), (date(2025, 2, 28).toordinal(), 10), (None, None)]
+        )
+
+    def test_backfills_skip_a_user_without_a_stored_key(self):
+        with db.connection() as conn:
+            conn.execute("UPDATE users SET salt = ?", (generate_salt_bytes(),))
+        keystore.create_user_keys_table()
+        with patch.object(keystore, "env_key", return_value=None):
+            migrations._unify_user_tables()
+            migrations._add_expense_day()
+            migrations._add_amount_minor()
+        with db.connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM user_keys").fetchone()[0], 0)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM expenses WHERE expense_day IS NULL").fetchone()[0], 25)
+
+    def test_rows_of_a_user_without_a_key_are_finished_once_it_is_imported(self):
+        with db.connection() as conn:
+            conn.execute("UPDATE users SET salt = ?", (generate_salt_bytes(),))
+            conn.execute("DELETE FROM expenses_alice")
+        wrapped_key = _wrap_key("alice", Fernet.generate_key())
+        cipher = Fernet(_unwrap_key("alice", wrapped_key))
+        with db.connection() as conn:
+            conn.execute(
+                "INSERT INTO expenses_alice (category, amount, expense_date) VALUES ('Дім', ?, ?)",
+                (cipher.encrypt(b"12.5").decode(), cipher.encrypt(b"03/02/2025").decode()),
+            )
+
+        with patch.object(keystore, "env_key", return_value=None):
+            migrations.migrate()
+        self.assertIsNone(keystore.get_wrapped_key(1))
+        with db.connection() as conn:
+            self.assertEqual(conn.execute("SELECT payload, expense_day FROM expenses").fetchall(), [(None, None)])
+
+        env_file = Path(self.tmp.name) / ".env"
+        env_file.write_text(f"ENCRYPTION_KEY_alice={wrapped_key}\n")
+        self.assertEqual(keystore.import_env_keys(str(env_file)), 1)
+        migrations.migrate()
+        expenses = Utils.get_user_expenses("alice")
+        self.assertEqual([(e["amount"], e["date"]) for e in expenses], [(12.5, datetime(2025, 2, 3, tzinfo=UTC))])
+        self.assertEqual(Utils.get_monthly_expenses("alice", "02", "2025"), 12.5)
+        with db.connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM expenses WHERE payload IS NULL").fetchone()[0], 0)
+
+    def test_payload_rebuild_recovers_from_an_interrupted_copy(self):
+        keystore.create_user_keys_table()
+        for migration in migrations.MIGRATIONS[:4]:
+            migration()
+        with db.connection() as conn:
+            conn.execute("CREATE TABLE expenses_new (expense_id INTEGER PRIMARY KEY)")  # left by a crashed run
+        migrations._rebuild_expenses_with_payload()
+        self.assertNotIn("expenses_new", self._tables())
+        with db.connection() as conn:
+            self.assertTrue(migrations._has_column(conn, "expenses", "payload"))
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0], 25)
+
+    def test_email_lookups_use_the_blind_index(self):
+        migrations.migrate()
+        with db.connection() as conn:
+            conn.execute(
+                "INSERT INTO users (username, email, password) VALUES ('bob', ?, 'p')",
+                (security_utils.encrypt_data("Bob@Example.com"),),
+            )
+        self.assertIsNone(Utils.get_username_by_email("bob@example.com"))
+        migrations._add_email_index()
+        self.assertEqual(Utils.get_username_by_email(" bob@example.com"), "bob")
+
+        Utils.add_user("carol", "carol@example.com", "hash", b"salt")
+        self.assertTrue(Auth.check_email_exists("CAROL@example.com"))
+        self.assertFalse(Auth.check_email_exists("dave@example.com"))
+
+    def test_env_keys_are_imported_once(self):
+        migrations.migrate()
+        env_file = Path(self.tmp.name) / ".env"
+        env_file.write_text("ENCRYPTION_KEY=master\nENCRYPTION_KEY_alice=wrapped\nENCRYPTION_KEY_ghost=x\n")
+        self.assertEqual(keystore.import_env_keys(str(env_file)), 1)
+        self.assertEqual(keystore.import_env_keys(str(env_file)), 0)
+        self.assertEqual(keystore.get_wrapped_key(1), "wrapped")
+        with db.connection() as conn:
+            conn.execute("UPDATE user_keys SET wrapped_key = 'wrapped'")  # as stored before keys were sealed
+        self.assertEqual(keystore.seal_stored_keys(), 1)
+        self.assertEqual(keystore.seal_stored_keys(), 0)
+        self.assertEqual(keystore.get_wrapped_key(1), "wrapped")
+
+        self.assertEqual(keystore.prune_env_keys(str(env_file)), 1)
+        self.assertNotIn("alice", env_file.read_text())
+        self.assertIn("ENCRYPTION_KEY=", env_file.read_text())
+
+    def test_user_record_is_cached_until_the_user_changes(self):
+        migrations.migrate()
+        Utils.add_user("carol", "carol@example.com", "hash", b"salt")
+        record = Utils.get_user_record("carol")
+        self.assertEqual((record.username, record.salt, record.is_blocked), ("carol", b"salt", False))
+        self.assertIs(Utils.get_user_record("carol"), record)
+        self.assertEqual(Utils.get_user_record("carol@example.com").user_id, record.user_id)
+
+        Utils.block_user("carol")
+        self.assertTrue(Utils.get_user_status("carol"))
+        self.assertTrue(Utils.get_user_status("carol@example.com"))
+
+
+class TestMoney(unittest.TestCase):
+    def test_to_minor_rounds_to_kopecks(self):
+        self.assertEqual(to_minor(0.1), 10)
+        self.assertEqual(to_minor(19.99), 1999)
+        self.assertEqual(to_minor("2.005"), 201)
+        self.assertEqual(sum(to_minor(0.1) for _ in range(10)), to_minor(1))
+
+    def test_from_minor(self):
+        self.assertEqual(from_minor(2029), 20.29)
+
+
+class TestMonthlyTotals(ExpenseTestCase):
+    def _totals(self):
+        with db.connection() as conn:
+            return conn.execute("SELECT * FROM expense_monthly_totals ORDER BY year, month, category").fetchall()
+
+    def test_mutations_keep_totals_in_sync(self):
+        Utils.add_expense("alice", "Дім", 10.5, "01/02/2025")
+        ids = Utils.add_expenses_bulk("alice", [("Дім", 0.1, "03/02/2025"), ("Одяг", 7, "01/03/2025")])
+        Utils.update_user_expense("alice", ids[0], "Одяг", 0.2, "05/03/2025")
+        Utils.delete_user_expense("alice", ids[1])
+        self.assertEqual(Utils.get_monthly_totals_by_category("alice", "2", "2025"), {"Дім": 10.5})
+        self.assertEqual(Utils.get_monthly_totals_by_category("alice", "3", "2025"), {"Одяг": 0.2})
+
+        incremental = self._totals()
+        rebuild_monthly_totals()
+        self.assertEqual(incremental, self._totals())
+
+
+class TestExpenseQueries(ExpenseTestCase):
+    def test_date_range_is_inclusive_and_per_user(self):
+        with db.connection() as conn:
+            conn.execute("INSERT INTO users (username, email, password) VALUES ('bob', 'e2', 'p')")
+        Utils.add_expense("bob", "Дім", 1, "10/03/2025")
+        days = ["28/02/2025", "01/03/2025", "15/03/2025", "31/03/2025", "01/04/2025"]
+        for amount, day in enumerate(days, start=1):
+            Utils.add_expense("alice", "Дім", amount, day)
+        expenses = Utils.get_user_expenses_by_date_range(
+            "alice", datetime(2025, 3, 1, tzinfo=UTC), datetime(2025, 3, 31, tzinfo=UTC)
+        )
+        self.assertEqual([(e["amount"], e["date"].day) for e in expenses], [(4, 31), (3, 15), (2, 1)])
+
+    def test_an_undecryptable_row_is_left_out(self):
+        kept = Utils.add_expense("alice", "Дім", 2, "02/03/2025")
+        damaged = Utils.add_expense("alice", "Дім", 1, "01/03/2025")
+        with db.connection() as conn:
+            conn.execute("UPDATE expenses SET payload = substr(payload, 1, 20) WHERE expense_id = ?", (damaged,))
+        self.assertEqual([e["expense_id"] for e in Utils.get_user_expenses("alice")], [kept])
+        self.assertEqual([row[0] for row in Utils.get_user_expense_rows("alice")], [kept])
+
+    def test_bulk_insert_returns_the_ids_of_its_rows(self):
+        single = Utils.add_expense("alice", "Дім", 1, "01/03/2025")
+        rows = [(f"К{i}", i + 2, "02/03/2025") for i in range(5)]
+        with patch("database.utils.BULK_CHUNK_SIZE", 2):
+            ids = Utils.add_expenses_bulk("alice", rows)
+        self.assertEqual(ids, list(range(single + 1, single + 6)))
+        with db.connection() as conn:
+            stored = conn.execute("SELECT expense_id, category FROM expenses WHERE expense_id > ?", (single,))
+            self.assertEqual(
+                stored.fetchall(), [(expense_id, row[0]) for expense_id, row in zip(ids, rows, strict=True)]
+            )
+        amounts = {e["expense_id"]: e["amount"] for e in Utils.get_user_expenses("alice")}
+        self.assertEqual([amounts[expense_id] for expense_id in ids], [row[1] for row in rows])
+
+    def test_keyset_pages_break_day_ties_by_id(self):
+        days = ["05/03/2025", "02/03/2025", "02/03/2025", "02/03/2025", "02/03/2025", "01/03/2025"]
+        ids = Utils.add_expenses_bulk("alice", [("Дім", 1, day) for day in days])
+        pages, cursor = [], None
+        while True:
+            page, cursor = Utils.get_user_expenses_page("alice", 2, cursor)
+            pages.append([expense["expense_id"] for expense in page])
+            if cursor is None:
+                break
+        # Six rows fill three pages exactly, so the cursor only comes back empty with a fourth, empty page.
+        self.assertEqual(pages, [[ids[0], ids[4]], [ids[3], ids[2]], [ids[1], ids[5]], []])
+
+
+class TestLegacyRows(ExpenseTestCase):
+    def test_legacy_fernet_rows_are_read_and_sealed(self):
+        Utils.add_expense("alice", "Дім", 3, "02/02/2025")
+        with db.connection() as conn:
+            conn.execute(
+                "INSERT INTO expenses (user_id, category, amount, expense_date, expense_day, amount_minor) "
+                "VALUES (1, 'Одяг', ?, ?, ?, 1250)",
+                (
+                    self.cipher.encrypt(b"12.5").decode(),
+                    self.cipher.encrypt(b"01/02/2025").decode(),
+                    datetime(2025, 2, 1, tzinfo=UTC).toordinal(),
+                ),
+            )
+        before = Utils.get_user_expenses("alice")
+        self.assertEqual(
+            [(e["amount"], e["date"]) for e in before],
+            [(3, datetime(2025, 2, 2, tzinfo=UTC)), (12.5, datetime(2025, 2, 1, tzinfo=UTC))],
+        )
+
+        migrations._add_row_payload()
+        with db.connection() as conn:
+            legacy = conn.execute("SELECT COUNT(*) FROM expenses WHERE amount IS NOT NULL OR payload IS NULL")
+            self.assertEqual(legacy.fetchone()[0], 0)
+        self.assertEqual(Utils.get_user_expenses("alice"), before)
+
+
+class TestExpenseRepository(ExpenseTestCase):
+    def test_repository_writes_through_and_reads_from_memory(self):
+        Utils.add_expenses_bulk("alice", [("Дім", 1.25, "03/02/2025"), ("Одяг", 7, "01/03/2025")])
+        repository = ExpenseRepository()
+        self.assertEqual(repository.expenses("alice"), Utils.get_user_expenses("alice"))
+
+        first = repository.add("alice", "Дім", 0.1, "03/02/2025")
+        repository.add_many("alice", [("Одяг", 2, "28/02/2025"), ("Дім", 5, "04/03/2025")])
+        repository.update("alice", 1, "Одяг", 3.5, "02/03/2025")
+        repository.delete("alice", first)
+        with patch.object(Utils, "get_user_expense_rows", side_effect=AssertionError("read from SQLite")):
+            expenses = repository.expenses("alice")
+            page, cursor = repository.page("alice", 2)
+            rest, _ = repository.page("alice", 10, cursor)
+            february = repository.monthly_totals("alice", 2025, 2)
+        self.assertEqual(expenses, Utils.get_user_expenses("alice"))
+        self.assertEqual(page + rest, expenses)
+        self.assertEqual(february, Utils.get_monthly_totals_by_category("alice", "2", "2025"))
+        self.assertEqual(
+            repository.by_date_range("alice", datetime(2025, 3, 1, tzinfo=UTC), datetime(2025, 3, 2, tzinfo=UTC)),
+            Utils.get_user_expenses_by_date_range(
+                "alice", datetime(2025, 3, 1, tzinfo=UTC), datetime(2025, 3, 2, tzinfo=UTC)
+            ),
+        )
+
+
+class TestBudgets(ExpenseTestCase):
+    def test_budget_spend_follows_mutations(self):
+        with db.connection() as conn:
+            conn.execute("INSERT INTO categories (user_id, name) VALUES (1, 'Дім'), (1, 'Одяг')")
+        Utils.set_category_budget("alice", "Дім", 100)
+        repository = ExpenseRepository()
+        self.assertIsNone(repository.budget_status("alice", "Одяг", 2025, 2))
+
+        first = repository.add("alice", "Дім", 60, "03/02/2025")
+        repository.add("alice", "Дім", 50, "10/02/2025")
+        repository.add("alice", "Дім", 500, "01/03/2025")
+        status = repository.budget_status("alice", "Дім", 2025, 2)
+        self.assertTrue(status.exceeded)
+        self.assertEqual((status.spent, status.remaining), (110, -10))
+
+        repository.update("alice", first, "Одяг", 60, "03/02/2025")
+        self.assertEqual(repository.budget_status("alice", "Дім", 2025, 2).remaining, 50)
+        repository.set_budget("alice", "Дім", None)
+        self.assertIsNone(repository.budget_status("alice", "Дім", 2025, 2))
+        self.assertEqual(Utils.get_category_budgets("alice"), {})
+        with self.assertRaises(CategoryNotFoundError):
+            Utils.set_category_budget("alice", "Авто", 10)
+        for limit in (float("inf"), float("nan"), 0, -5):
+            with self.assertRaises(ValueError):
+                Utils.set_category_budget("alice", "Дім", limit)
+
+
+class TestRecurringExpenses(ExpenseTestCase):
+    def test_recurring_expenses_are_materialised_once_when_due(self):
+        rent = Utils.add_recurring_expense("alice", "Дім", 100, "monthly", "31/01/2025")
+        Utils.add_recurring_expense("alice", "Одяг", 5, "weekly", "01/02/2025", "15/02/2025")
+        self.assertEqual(Utils.get_user_expenses("alice"), [])
+        february = month_bounds(2025, 2)
+        upcoming = Utils.get_upcoming_recurring_expenses("alice", *february)
+        expected = [(2, 1), (2, 8), (2, 15), (rent, 28)]
+        self.assertEqual([(rule_id, date.fromordinal(day).day) for rule_id, *_, day in upcoming], expected)
+
+        self.assertEqual(len(Utils.materialize_recurring_expenses("alice", datetime(2025, 2, 10, tzinfo=UTC))), 3)
+        self.assertEqual(Utils.materialize_recurring_expenses("alice", datetime(2025, 2, 10, tzinfo=UTC)), [])
+        upcoming = Utils.get_upcoming_recurring_expenses("alice", *february)
+        self.assertEqual([date.fromordinal(day).day for *_, day in upcoming], [15, 28])
+
+        Utils.materialize_recurring_expenses("alice", datetime(2025, 4, 30, tzinfo=UTC))
+        self.assertEqual(Utils.get_monthly_totals_by_category("alice", "2", "2025"), {"Дім": 100, "Одяг": 15})
+        self.assertEqual(Utils.get_monthly_totals_by_category("alice", "4", "2025"), {"Дім": 100})
+        self.assertEqual(Utils.get_upcoming_recurring_expenses("alice", *month_bounds(2025, 4)), [])
+
+
+class TestSchedule(unittest.TestCase):
+    def _days(self, spec: str, first: date, last: date) -> list[date]:
+        schedule = Schedule(spec, date(2025, 1, 1).toordinal())
+        return [date.fromordinal(day) for day in schedule.occurrences(first.toordinal(), last.toordinal())]
+
+    def test_cron_like_fields(self):
+        self.assertEqual(
+            self._days("1,15 */2 *", date(2024, 12, 1), date(2025, 3, 31)),
+            [date(2025, 1, 1), date(2025, 1, 15), date(2025, 3, 1), date(2025, 3, 15)],
+        )
+        self.assertEqual(
+            self._days("* * 7", date(2025, 6, 1), date(2025, 6, 15)),
+            [date(2025, 6, 1), date(2025, 6, 8), date(2025, 6, 15)],
+        )
+        # both day fields restricted: either one matches, as in cron
+        self.assertEqual(
+            [day.day for day in self._days("13 * 5", date(2025, 2, 1), date(2025, 2, 28))], [7, 13, 14, 21, 28]
+        )
+        with self.assertRaises(ValueError):
+            Schedule("32 * *", 1)
+
+
+class TestExpenseColumns(unittest.TestCase):
+    def test_group_bys_match_loops(self):
+        first = date(2024, 12, 25).toordinal()
+        rows = [(["Дім", "Одяг", "Їжа"][i % 3], 150 * i + 1, first + (i * 7) % 40) for i in range(60)]
+        columns = ExpenseColumns(rows)
+
+        by_period: dict[str, Counter] = {"week": Counter(), "month": Counter(), "year": Counter()}
+        by_category: Counter[str] = Counter()
+        for category, amount_minor, expense_day in rows:
+            day = date.fromordinal(expense_day)
+            by_period["week"][day - timedelta(days=day.weekday())] += amount_minor
+            by_period["month"][day.year, day.month] += amount_minor
+            by_period["year"][day.year] += amount_minor
+            if day.month == 1:
+                by_category[category] += amount_minor
+
+        for period, totals in by_period.items():
+            self.assertEqual(columns.totals_by_period(period), {key: from_minor(v) for key, v in totals.items()})
+        january = (date(2025, 1, 1), date(2025, 1, 31))
+        self.assertEqual(columns.totals_by_category(*january), {key: from_minor(v) for key, v in by_category.items()})
+        self.assertEqual(columns.range_sum(*january), from_minor(sum(by_category.values())))
+        self.assertEqual(columns.totals_by_period_and_category("month")[2025, 1], columns.totals_by_category(*january))
+
+    def test_trend_report_stays_current_under_changes(self):
+        day = date(2025, 3, 10).toordinal()
+        rows = [("Дім", 1000, day), ("Дім", 500, day - 365), ("Їжа", 300, day - 40), ("Їжа", 200, day - 100)]
+        today = date(2025, 3, 31)
+        report = TrendReport(ExpenseColumns(rows), today)
+        self.assertEqual(report.rolling_average(3, 2025, 3), {"Дім": 3.33, "Їжа": 1.0})
+        self.assertEqual(report.rolling_average(12, 2025, 3), {"Дім": 0.83, "Їжа": 0.42})
+        self.assertEqual(report.year_over_year(2025, 3)["Дім"], (10.0, 5.0, 5.0))
+        self.assertEqual(report.yearly_totals(), {2024: 7.0, 2025: 13.0})
+
+        self.assertTrue(report.apply("Їжа", 700, day - 1))
+        self.assertTrue(report.apply("Дім", 1000, day, sign=-1))
+        rebuilt = TrendReport(ExpenseColumns([*rows[1:], ("Їжа", 700, day - 1)]), today)
+        self.assertEqual(report.rolling_average(3, 2025, 3), rebuilt.rolling_average(3, 2025, 3))
+        self.assertEqual(report.weekly_totals(60), rebuilt.weekly_totals(60))
+        self.assertFalse(report.apply("Нова", 100, day))
+
+
+class TestAsyncFacade(unittest.TestCase):
+    def test_calls_run_off_the_event_loop_thread(self):
+        class Target:
+            @staticmethod
+            def thread_name(suffix):
+                return threading.current_thread().name + suffix
+
+        name = asyncio.run(AsyncFacade(Target).thread_name("!"))
+        self.assertTrue(name.startswith("tracker-io"))
+        self.assertTrue(name.endswith("!"))
+
+
+class TestRowCipher(unittest.TestCase):
+    def test_payload_is_bound_to_its_user(self):
+        row_cipher = RowCipher(derive_row_key(Fernet.generate_key()))
+        payload = row_cipher.seal(7, -1999, 739_000)
+        self.assertEqual(len(payload), 41)
+        self.assertEqual(row_cipher.open(7, payload), (-1999, 739_000))
+        with self.assertRaises(InvalidTag):
+            row_cipher.open(8, payload)
+        with self.assertRaises(ValueError):
+            row_cipher.open(7, b"\x02" + payload[1:])
+
+
+class TestUserKeyCache(unittest.TestCase):
+    @patch("security.user_key.get_next_user_encryption_key", return_value=None)
+    @patch("security.user_key.get_user_encryption_key", side_effect=lambda _username: Fernet.generate_key())
+    def test_key_is_derived_once_per_session(self, mock_key, _):
+        cache = UserKeyCache()
+        cipher = cache.open("alice")
+        self.assertIs(cache.cipher("alice"), cipher)
+        self.assertEqual(mock_key.call_count, 1)
+
+        self.assertIsNot(cache.cipher("bob"), cipher)
+        cache.clear()
+        self.assertIsNot(cache.cipher("alice"), cipher)
+        self.assertEqual(mock_key.call_count, 3)
+
+
+class TestMasterCipher(unittest.TestCase):
+    def setUp(self):
+        keys = [Fernet.generate_key().decode(), Fernet.generate_key().decode()]
+        self.key_patch = patch("security.utils.get_encryption_key", side_effect=keys)
+        self.mock_key = self.key_patch.start()
+        security_utils.reload_encryption_key()
+
+    def tearDown(self):
+        self.key_patch.stop()
+        security_utils.master_keys.clear()
+
+    def test_key_is_read_once_until_reload(self):
+        token = security_utils.encrypt_data("user@example.com")
+        self.assertEqual(security_utils.decrypt_data(token), "user@example.com")
+        self.assertEqual(self.mock_key.call_count, 1)
+
+        security_utils.reload_encryption_key()
+        self.assertEqual(self.mock_key.call_count, 2)
+        with self.assertRaises(InvalidToken):
+            security_utils.decrypt_data(token)
+
+
+class TestKeyMaintenance(TempDatabaseTestCase):
+    def setUp(self):
+        self.env_patch = patch.dict(
+            os.environ, {"ENCRYPTION_KEY": Fernet.generate_key().decode(), "BLIND_INDEX_KEY": "YmxpbmQta2V5"}
+        )
+        self.env_patch.start()
+        security_utils.reload_encryption_key()
+        super().setUp()
+        self.env_file = str(Path(self.tmp.name) / ".env")
+        self.env_file_patch = patch.object(key_file, "ENV_FILE", self.env_file)
+        self.env_file_patch.start()
+        create_full_database()
+        Utils.add_user("alice", "alice@example.com", "hash", generate_salt_bytes())
+        Utils.add_expenses_bulk("alice", [("Дім", i / 4, f"{i % 28 + 1:02d}/03/2025") for i in range(7)])
+        legacy = Fernet(get_user_encryption_key("alice"))
+        with db.connection() as conn:
+            conn.execute(
+                "INSERT INTO expenses (user_id, category, amount, expense_date) VALUES (1, 'Одяг', ?, ?)",
+                (legacy.encrypt(b"12.5").decode(), legacy.encrypt(b"01/02/2025").decode()),
+            )
+
+    def tearDown(self):
+        super().tearDown()
+        self.env_file_patch.stop()
+        self.env_patch.stop()
+        security_utils.master_keys.clear()
+
+    def test_stored_key_needs_the_main_key(self):
+        with db.connection() as conn:
+            stored = conn.execute("SELECT wrapped_key FROM user_keys WHERE user_id = 1").fetchone()[0]
+        with self.assertRaises(InvalidToken):
+            _unwrap_key("alice", stored)
+        self.assertEqual(_unwrap_key("alice", keystore.get_wrapped_key(1)), get_user_encryption_key("alice"))
+
+    def test_user_key_rotation_keeps_expenses_readable(self):
+        before = Utils.get_user_expenses("alice")
+        old_key = keystore.get_wrapped_key(1)
+        with patch.object(rotation, "BATCH_SIZE", 3):
+            self.assertEqual(rotation.rotate_user_key("alice"), 8)
+        self.assertNotEqual(keystore.get_wrapped_key(1), old_key)
+        self.assertIsNone(keystore.get_next_wrapped_key(1))
+        self.assertEqual(Utils.get_user_expenses("alice"), before)
+
+    def test_master_key_rotation_keeps_users_readable(self):
+        old_key = os.environ["ENCRYPTION_KEY"]
+        self.assertEqual(rotation.rotate_master_key(), 1)
+        self.assertNotEqual(os.environ["ENCRYPTION_KEY"], old_key)
+        self.assertNotIn("NEXT_ENCRYPTION_KEY", os.environ)
+        self.assertEqual(dotenv_values(self.env_file), {"ENCRYPTION_KEY": os.environ["ENCRYPTION_KEY"]})
+        self.assertEqual(Utils.get_user_email("alice"), "alice@example.com")
+        self.assertEqual(len(Utils.get_user_expenses("alice")), 8)
+        with db.connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM migration_progress").fetchone()[0], 0)
+
+    def test_resumed_master_key_rotation_keeps_its_new_key(self):
+        new_key = Fernet.generate_key().decode()
+        key_file.set_env_key("NEXT_ENCRYPTION_KEY", new_key)
+        del os.environ["NEXT_ENCRYPTION_KEY"]  # as in a new process
+        rotation.rotate_master_key()
+        self.assertEqual(dotenv_values(self.env_file)["ENCRYPTION_KEY"], new_key)
+        self.assertEqual(Utils.get_user_email("alice"), "alice@example.com")
+
+    def test_scan_reports_rows_that_fail_to_decrypt(self):
+        self.assertTrue(scan_database(pool="none").ok)
+        with db.connection() as conn:
+            payload = conn.execute("SELECT payload FROM expenses WHERE expense_id = 2").fetchone()[0]
+            tampered = payload[:-1] + bytes([payload[-1] ^ 1])
+            conn.execute("UPDATE expenses SET payload = ? WHERE expense_id = 2", (tampered,))
+            conn.execute("UPDATE expenses SET expense_date = NULL WHERE expense_id = 8")
+            conn.execute("UPDATE users SET email = 'not a token'")
+        report = scan_database(pool="thread")
+        self.assertEqual((report.users_checked, report.expenses_checked), (1, 8))
+        self.assertEqual((report.bad_users, report.bad_expenses), ([1], [2, 8]))
+
+    def test_scan_does_not_write_missing_keys(self):
+        with db.connection() as conn:
+            conn.execute("DELETE FROM user_keys")
+        report = scan_database(pool="none")
+        self.assertEqual(report.bad_expenses, list(range(1, 9)))
+        with db.connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM user_keys").fetchone()[0], 0)
+
+
+class TestDecryptMany(unittest.TestCase):
+    def test_pool_matches_inline_decryption(self):
+        cipher = Fernet(Fernet.generate_key())
+        amounts = [cipher.encrypt(str(i / 4).encode()).decode() for i in range(25)]
+        dates = [cipher.encrypt(f"{i + 1:02d}/03/2025".encode()).decode() for i in range(25)]
+        inline = security_utils.decrypt_many([amounts, dates], cipher, [float, parse_date], pool="none")
+        pooled = security_utils.decrypt_many([amounts, dates], cipher, [float, parse_date], pool="thread", threshold=0)
+        self.assertEqual(inline, pooled)
+        self.assertEqual(inline[0][5], 1.25)
+        self.assertEqual(inline[1][5], datetime(2025, 3, 6, tzinfo=UTC))
+
+    def test_parse_date_accepts_unpadded_dates(self):
+        self.assertEqual(parse_date("6/3/2025"), datetime(2025, 3, 6, tzinfo=UTC))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,22 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import flet as ft  # type: ignore[import-not-found]
+
+
+@contextmanager
+def busy(page: ft.Page, indicator: ft.Control, *controls: ft.Control) -> Iterator[None]:
+    """Show ``indicator`` and disable ``controls`` while an awaited call is running."""
+    indicator.visible = True
+    for control in controls:
+        control.disabled = True
+    page.update()
+    try:
+        yield
+    finally:
+        indicator.visible = False
+        for control in controls:
+            control.disabled = False
+        page.update()
@@ -8,7 +8,9 @@ from flet_route import Basket, Params  # type: ignore[import-not-found]
 from auth import Auth
 from auth.exceptions import ConfirmCodeError
 from colors import RC
+from database import run_blocking
 from database.exceptions import UserAlreadyExistError
+from ui.components.progress import busy
 
 REGISTER_DATA: dict[str, str] = {}
 
@@ -17,8 +19,7 @@ def confirmation_page(page: ft.Page, params: Params, basket: Basket) -> ft.View:
     page.title = "Підтвердження електронної пошти"
     page.window.width = 800
     page.window.height = 600
-    page.theme = ft.Theme(text_theme=ft.TextTheme(
-        body_medium=ft.TextStyle(color=RC.LIGHT_YELLOW)))
+    page.theme = ft.Theme(text_theme=ft.TextTheme(body_medium=ft.TextStyle(color=RC.LIGHT_YELLOW)))
 
     email = REGISTER_DATA["email"]
     Auth.send_confirmation_email(email)
@@ -54,41 +55,38 @@ def confirmation_page(page: ft.Page, params: Params, basket: Basket) -> ft.View:
         page.snack_bar.open = True
         page.update()
 
-    def submit_click(e: Any) -> None:
+    progress = ft.ProgressRing(visible=False, width=20, height=20, color=RC.LIGHT_YELLOW)
+
+    async def submit_click(e: Any) -> None:
         code = code_field.value
         if not code:
-            error_dialog = ft.AlertDialog(
-                title=ft.Text("Помилка"),
-                content=ft.Text("Введіть код")
-            )
-            page.open(error_dialog)  
+            error_dialog = ft.AlertDialog(title=ft.Text("Помилка"), content=ft.Text("Введіть код"))
+            page.open(error_dialog)
             return
 
         try:
-            Auth.register_user(
-                REGISTER_DATA["username"],
-                REGISTER_DATA["email"],
-                REGISTER_DATA["hash_password"],
-                code,
-            )
-            
+            with busy(page, progress, submit_button):
+                await run_blocking(
+                    Auth.register_user,
+                    REGISTER_DATA["username"],
+                    REGISTER_DATA["email"],
+                    REGISTER_DATA["hash_password"],
+                    code,
+                )
+
             page.update()
             page.go("/")
             page.views.clear()
         except ConfirmCodeError as err:
-            error_dialog = ft.AlertDialog(
-                title=ft.Text("Помилка"),
-                content=ft.Text("Неправильний код підтвердження")
-            )
-            page.open(error_dialog)  
+            error_dialog = ft.AlertDialog(title=ft.Text("Помилка"), content=ft.Text("Неправильний код підтвердження"))
+            page.open(error_dialog)
             return
 
-
-    def resend_code(e: Any) -> None:
+    async def resend_code(e: Any) -> None:
         try:
-            Auth.send_confirmation_email(REGISTER_DATA["email"])
-            show_notification(
-                "Новий код підтвердження надіслано на вашу електронну пошту")
+            with busy(page, progress, resend_code_button):
+                await run_blocking(Auth.send_confirmation_email, REGISTER_DATA["email"])
+            show_notification("Новий код підтвердження надіслано на вашу електронну пошту")
         except Exception as err:
             show_notification(f"Помилка при відправці коду: {err!s}")
 
@@ -120,7 +118,7 @@ def confirmation_page(page: ft.Page, params: Params, basket: Basket) -> ft.View:
         content=ft.Column(
             [
                 code_field,
-                ft.Row([submit_button], alignment=ft.MainAxisAlignment.CENTER),
+                ft.Row([submit_button, progress], alignment=ft.MainAxisAlignment.CENTER),
                 ft.Row(
                     [register_button, resend_code_button],
                     alignment=ft.MainAxisAlignment.CENTER,
@@ -138,8 +136,7 @@ def confirmation_page(page: ft.Page, params: Params, basket: Basket) -> ft.View:
     main_container = ft.Container(
         content=ft.Column(
             [
-                ft.Container(content=confirmation_txt,
-                             alignment=ft.alignment.center),
+                ft.Container(content=confirmation_txt, alignment=ft.alignment.center),
                 ft.Container(height=10),
                 ft.Container(content=info_text, alignment=ft.alignment.center),
                 ft.Container(height=20),
@@ -152,8 +149,7 @@ def confirmation_page(page: ft.Page, params: Params, basket: Basket) -> ft.View:
         alignment=ft.alignment.center,
         bgcolor=ft.Colors.BLACK,
         gradient=ft.LinearGradient(
-            colors=[RC.SUPER_DARK_GREEN,
-                    RC.DARK_GREEN], begin=ft.alignment.top_left, end=ft.alignment.bottom_right
+            colors=[RC.SUPER_DARK_GREEN, RC.DARK_GREEN], begin=ft.alignment.top_left, end=ft.alignment.bottom_right
         ),
     )
 
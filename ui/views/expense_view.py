@@ -1,11 +1,18 @@
-from calendar import monthrange
 from datetime import datetime, timedelta
+from functools import partial
 from typing import Any
 
 import flet as ft
 from flet_route import Basket, Params
 
-from expenses import Expense
+from auth import Auth
+from expenses import AsyncExpense, Expense
+from expenses.budgets import BudgetStatus
+from expenses.reports import TrendReport
+from ui.components.progress import busy
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_LOAD_THRESHOLD = 300  # pixels from the bottom of the list
 
 
 class ExpColors:
@@ -15,6 +22,7 @@ class ExpColors:
     LIGHT_YELLOW = "#F4FFC3"
     SUPER_DARK_GREEN = "#0c3c0f"
     WHITE = "#FFFFFF"
+    OVER_BUDGET = "#FF6B6B"
 
     CHART_COLORS = [
         "#FF6B6B",  # Coral Red
@@ -46,32 +54,56 @@ class MonthlyStatsView:
         self.color_index = (self.color_index + 1) % len(ExpColors.CHART_COLORS)
         return color
 
-    def get_monthly_expenses(self) -> dict[str, float]:
-        start_date = datetime(self.current_year, self.current_month, 1)
-        _, last_day = monthrange(self.current_year, self.current_month)
-        end_date = datetime(self.current_year, self.current_month, last_day)
-
-        expenses = Expense.get_expenses_by_date_range(start_date, end_date)
-        category_totals = {}
+    @staticmethod
+    def non_empty(category_totals: dict[str, float]) -> dict[str, float]:
+        # Only include categories with expenses
+        return {category: amount for category, amount in category_totals.items() if amount > 0}
 
-        # Only add categories that have expenses
-        for expense in expenses:
-            category = expense["category"]
-            amount = float(expense["amount"])
-            if amount > 0:  # Only include categories with expenses
-                category_totals[category] = category_totals.get(
-                    category, 0) + amount
+    def get_monthly_expenses(self) -> dict[str, float]:
+        return self.non_empty(Expense.get_monthly_totals(self.current_year, self.current_month))
 
-        return category_totals
+    async def load_monthly_expenses(self) -> dict[str, float]:
+        return self.non_empty(await AsyncExpense.get_monthly_totals(self.current_year, self.current_month))
 
-    def update_view(self):
+    async def update_view(self):
         """Update the monthly view with current data"""
         if self.container:
-            self.container.content = self.build_monthly_content()
+            # Recurring expenses that fell due are written first, so they are in the totals and not upcoming.
+            upcoming = await AsyncExpense.get_upcoming_expenses(self.current_year, self.current_month)
+            self.container.content = self.build_monthly_content(await self.load_monthly_expenses(), upcoming)
             self.page.update()
 
-    def build_monthly_content(self) -> ft.Column:
-        expenses = self.get_monthly_expenses()
+    async def stop_recurring(self, rule_id: int, e: Any):
+        await AsyncExpense.delete_recurring_expense(rule_id)
+        await self.update_view()
+
+    def upcoming_rows(self, upcoming: list[dict]) -> list[ft.Control]:
+        if not upcoming:
+            return []
+        return [
+            ft.Divider(color=ExpColors.LIGHT_GREEN),
+            ft.Text("Заплановані витрати", size=18, color=ExpColors.LIGHT_YELLOW),
+        ] + [
+            ft.Row(
+                [
+                    ft.Text(
+                        f"{expense['date'].strftime('%d/%m')} - {expense['category']}: {expense['amount']:.2f} ₴",
+                        color=ExpColors.LIGHT_GREEN,
+                        size=16,
+                    ),
+                    ft.IconButton(
+                        icon=ft.Icons.EVENT_BUSY,
+                        tooltip="Зупинити повторення",
+                        icon_color=ExpColors.LIGHT_YELLOW,
+                        on_click=partial(self.stop_recurring, expense["rule_id"]),
+                    ),
+                ],
+                spacing=10,
+            )
+            for expense in upcoming
+        ]
+
+    def build_monthly_content(self, expenses: dict[str, float], upcoming: list[dict] | None = None) -> ft.Column:
         total_amount = sum(expenses.values())
 
         # Reset color index for new chart
@@ -81,16 +113,14 @@ class MonthlyStatsView:
         sections = []
         for category, amount in expenses.items():
             if amount > 0:  # Only add sections for categories with expenses
-                percentage = (amount / total_amount *
-                              100) if total_amount > 0 else 0
+                percentage = (amount / total_amount * 100) if total_amount > 0 else 0
                 sections.append(
                     ft.PieChartSection(
                         value=percentage,
                         title=category,
                         color=self.get_next_color(),
                         radius=100,
-                        title_style=ft.TextStyle(
-                            color=ExpColors.SUPER_DARK_GREEN, size=12, weight=ft.FontWeight.BOLD),
+                        title_style=ft.TextStyle(color=ExpColors.SUPER_DARK_GREEN, size=12, weight=ft.FontWeight.BOLD),
                     )
                 )
 
@@ -98,24 +128,22 @@ class MonthlyStatsView:
         self.color_index = 0  # Reset color index for summary
 
         # Create month navigation buttons
-        def change_month(delta: int):
-            new_date = datetime(
-                self.current_year, self.current_month, 1) + timedelta(days=32 * delta)
+        async def change_month(delta: int, e: Any):
+            new_date = datetime(self.current_year, self.current_month, 1) + timedelta(days=32 * delta)
             self.current_month = new_date.month
             self.current_year = new_date.year
             self.current_date = new_date
-            self.update_view()
+            await self.update_view()
 
         month_navigation = ft.Row(
             [
                 ft.IconButton(
-                    icon=ft.Icons.ARROW_BACK_IOS, on_click=lambda _: change_month(-1), icon_color=ExpColors.LIGHT_YELLOW
+                    icon=ft.Icons.ARROW_BACK_IOS, on_click=partial(change_month, -1), icon_color=ExpColors.LIGHT_YELLOW
                 ),
-                ft.Text(self.current_date.strftime("%B %Y"),
-                        size=20, color=ExpColors.LIGHT_YELLOW),
+                ft.Text(self.current_date.strftime("%B %Y"), size=20, color=ExpColors.LIGHT_YELLOW),
                 ft.IconButton(
                     icon=ft.Icons.ARROW_FORWARD_IOS,
-                    on_click=lambda _: change_month(1),
+                    on_click=partial(change_month, 1),
                     icon_color=ExpColors.LIGHT_YELLOW,
                 ),
             ],
@@ -127,8 +155,7 @@ class MonthlyStatsView:
             ft.Container(
                 content=ft.Column(
                     [
-                        ft.Icon(name=ft.Icons.PIE_CHART_OUTLINE,
-                                size=64, color=ExpColors.LIGHT_YELLOW),
+                        ft.Icon(name=ft.Icons.PIE_CHART_OUTLINE, size=64, color=ExpColors.LIGHT_YELLOW),
                         ft.Text(
                             "Немає витрат за цей місяць",
                             size=20,
@@ -148,10 +175,8 @@ class MonthlyStatsView:
 
         category_summary = ft.Column(
             [
-                ft.Text(f"{self.current_date.strftime('%B %Y')}",
-                        size=24, weight="bold", color=ExpColors.LIGHT_YELLOW),
-                ft.Text(f"Загальна сума: {total_amount:.2f} ₴",
-                        size=18, color=ExpColors.LIGHT_YELLOW),
+                ft.Text(f"{self.current_date.strftime('%B %Y')}", size=24, weight="bold", color=ExpColors.LIGHT_YELLOW),
+                ft.Text(f"Загальна сума: {total_amount:.2f} ₴", size=18, color=ExpColors.LIGHT_YELLOW),
                 ft.Divider(color=ExpColors.LIGHT_GREEN),
             ]
             + [
@@ -172,12 +197,12 @@ class MonthlyStatsView:
                         ],
                         spacing=10,
                     ),
-                    padding=ft.padding.only(
-                        left=10, right=10, top=5, bottom=5),
+                    padding=ft.padding.only(left=10, right=10, top=5, bottom=5),
                 )
                 for category, amount in expenses.items()
                 if amount > 0  # Only show categories with expenses
-            ],
+            ]
+            + self.upcoming_rows(upcoming or []),
             spacing=10,
             scroll=ft.ScrollMode.AUTO,
             expand=True,
@@ -189,8 +214,7 @@ class MonthlyStatsView:
                 ft.Row(
                     [
                         ft.Container(
-                            content=empty_state or ft.PieChart(
-                                sections=sections, width=400, height=400, expand=True),
+                            content=empty_state or ft.PieChart(sections=sections, width=400, height=400, expand=True),
                             expand=True,
                             alignment=ft.alignment.center,
                         ),
@@ -212,7 +236,121 @@ class MonthlyStatsView:
 
     def build_monthly_view(self) -> ft.Container:
         self.container = ft.Container(
-            content=self.build_monthly_content(), padding=20, expand=True, bgcolor=ExpColors.DARK_GREEN
+            content=self.build_monthly_content(
+                self.get_monthly_expenses(), Expense.get_upcoming_expenses(self.current_year, self.current_month)
+            ),
+            padding=20,
+            expand=True,
+            bgcolor=ExpColors.DARK_GREEN,
+        )
+        return self.container
+
+
+class TrendsView:
+    WINDOWS = (3, 12)  # months in the rolling average
+
+    def __init__(self, page: ft.Page):
+        self.page = page
+        self.window = self.WINDOWS[0]
+        self.container = None
+
+    async def update_view(self):
+        if self.container:
+            self.container.content = self.build_trends_content(await AsyncExpense.trends())
+            self.page.update()
+
+    @staticmethod
+    def money_rows(rows: list[tuple[str, float]]) -> list[ft.Control]:
+        return [
+            ft.Row(
+                [
+                    ft.Text(label, color=ExpColors.LIGHT_GREEN, size=16),
+                    ft.Text(f"{amount:.2f} ₴", color=ExpColors.LIGHT_YELLOW, size=16),
+                ],
+                alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+            )
+            for label, amount in rows
+        ]
+
+    def section(self, title: str, controls: list[ft.Control]) -> ft.Container:
+        return ft.Container(
+            content=ft.Column(
+                [
+                    ft.Text(title, size=20, weight="bold", color=ExpColors.LIGHT_YELLOW),
+                    ft.Divider(color=ExpColors.LIGHT_GREEN),
+                    *controls,
+                ],
+                spacing=8,
+                scroll=ft.ScrollMode.AUTO,
+            ),
+            padding=20,
+            border=ft.border.all(1, ExpColors.LIGHT_GREEN),
+            border_radius=10,
+            expand=True,
+        )
+
+    def build_trends_content(self, report: TrendReport) -> ft.Column:
+        today = datetime.now()
+
+        async def change_window(e: Any):
+            self.window = int(e.control.value)
+            await self.update_view()
+
+        weeks = self.money_rows([(monday.strftime("%d/%m/%Y"), total) for monday, total in report.weekly_totals(12)])
+        yearly = sorted(report.yearly_totals().items(), reverse=True)
+        years = self.money_rows([(str(year), total) for year, total in yearly])
+
+        average = report.rolling_average(self.window, today.year, today.month)
+        year_over_year = report.year_over_year(today.year, today.month)
+        categories = [
+            ft.Row(
+                [ft.Text(category, color=ExpColors.LIGHT_GREEN, size=16, expand=True)]
+                + [
+                    ft.Text(value, color=ExpColors.LIGHT_YELLOW, size=16, width=120)
+                    for value in (
+                        f"{average[category]:.2f} ₴",
+                        f"{year_over_year[category][1]:.2f} ₴",
+                        f"{year_over_year[category][2]:+.2f} ₴",
+                    )
+                ]
+            )
+            for category in report.names
+        ]
+        header = ft.Row(
+            [
+                ft.Text("Категорія", color=ExpColors.LIGHT_YELLOW, expand=True),
+                ft.Text(f"Середнє за {self.window} міс.", color=ExpColors.LIGHT_YELLOW, width=120),
+                ft.Text("Рік тому", color=ExpColors.LIGHT_YELLOW, width=120),
+                ft.Text("Зміна за рік", color=ExpColors.LIGHT_YELLOW, width=120),
+            ]
+        )
+        window_dropdown = ft.Dropdown(
+            label="Вікно середнього",
+            width=200,
+            value=str(self.window),
+            options=[ft.dropdown.Option(str(window), f"{window} міс.") for window in self.WINDOWS],
+            on_change=change_window,
+            border_color=ExpColors.LIGHT_YELLOW,
+            color=ExpColors.LIGHT_YELLOW,
+            label_style=ft.TextStyle(color=ExpColors.LIGHT_YELLOW),
+        )
+
+        return ft.Column(
+            [
+                ft.Row(
+                    [self.section("Останні 12 тижнів", weeks), self.section("По роках", years)],
+                    vertical_alignment=ft.CrossAxisAlignment.START,
+                    expand=True,
+                ),
+                self.section(today.strftime("Категорії, %B %Y"), [window_dropdown, header, *categories]),
+            ],
+            spacing=20,
+            expand=True,
+        )
+
+    def build_trends_view(self) -> ft.Container:
+        self.container = ft.Container(
+            content=self.build_trends_content(Expense.trends()), padding=20, expand=True, bgcolor=ExpColors.DARK_GREEN
         )
         return self.container
 
@@ -233,7 +371,7 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
     categories = Expense.list_of_categories()
     selected_date = datetime.now()
 
-    def add_category_click(e: Any):
+    async def add_category_click(e: Any):
         category_name = new_category_input.value.strip()
         if not category_name:
             page.snack_bar = ft.SnackBar(
@@ -252,10 +390,9 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
             return
 
         try:
-            Expense.add_category(category_name)
+            await AsyncExpense.add_category(category_name)
             categories.append(category_name)
-            category_dropdown.options = [
-                ft.dropdown.Option(c) for c in categories]
+            category_dropdown.options = [ft.dropdown.Option(c) for c in categories]
             category_dropdown.value = category_name
             new_category_input.value = ""
             update_category_visibility(False)
@@ -271,20 +408,79 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
             page.snack_bar.open = True
             page.update()
 
+    def notify(message: str):
+        page.snack_bar = ft.SnackBar(content=ft.Text(message), bgcolor=ExpColors.SUPER_DARK_GREEN)
+        page.snack_bar.open = True
+        page.update()
+
+    def budget_summary(status: BudgetStatus | None) -> str:
+        if status is None:
+            return "Бюджет не встановлено"
+        if status.exceeded:
+            return f"Бюджет перевищено на {-status.remaining:.2f} ₴ ({status.spent:.2f} ₴ з {status.limit:.2f} ₴)"
+        return f"Залишок бюджету: {status.remaining:.2f} ₴ з {status.limit:.2f} ₴"
+
+    async def refresh_budget(e: Any = None):
+        category = category_dropdown.value
+        if not category:
+            return
+        status = await AsyncExpense.get_budget_status(category, selected_date.year, selected_date.month)
+        budget_text.value = budget_summary(status)
+        budget_text.color = ExpColors.OVER_BUDGET if status and status.exceeded else ExpColors.LIGHT_GREEN
+        page.update()
+
+    async def warn_if_over_budget(category: str, expense_date: datetime):
+        status = await AsyncExpense.get_budget_status(category, expense_date.year, expense_date.month)
+        if status and status.exceeded:
+            notify(f"Перевищено бюджет категорії '{category}': витрачено {status.spent:.2f} ₴ з {status.limit:.2f} ₴")
+
+    async def set_budget_click(e: Any):
+        if not category_dropdown.value:
+            notify("Спершу оберіть категорію")
+            return
+        try:
+            limit = float(budget_input.value) if budget_input.value.strip() else None
+            await AsyncExpense.set_budget(category_dropdown.value, limit)
+        except ValueError:
+            notify("Будь ласка, введіть коректну суму")
+            return
+        budget_input.value = ""
+        await refresh_budget()
+
     def toggle_new_category(e):
         new_category_input.visible = not new_category_input.visible
         if new_category_input.visible:
             new_category_input.focus()
         page.update()
 
-    def add_expense_click(e: Any):
+    async def add_expense_click(e: Any):
         if category_dropdown.value and expense_input.value:
-            Expense.add_expense(category_dropdown.value, float(
-                expense_input.value), selected_date.strftime("%d/%m/%Y"))
-            expense_input.value = ""
-            expense_list.controls = build_expense_rows()
-            monthly_stats.update_view()  # Update monthly stats when new expense is added
-            page.update()
+            try:
+                amount = float(expense_input.value)
+            except ValueError:
+                notify("Будь ласка, введіть коректну суму")
+                return
+            with busy(page, progress, add_expense_button):
+                if repeat_dropdown.value == "none":
+                    await AsyncExpense.add_expense(category_dropdown.value, amount, selected_date.strftime("%d/%m/%Y"))
+                else:
+                    schedule = schedule_input.value if repeat_dropdown.value == "custom" else repeat_dropdown.value
+                    try:
+                        # Occurrences up to today are added now, later ones when they fall due.
+                        await AsyncExpense.add_recurring_expense(
+                            category_dropdown.value, amount, schedule, selected_date.strftime("%d/%m/%Y")
+                        )
+                    except ValueError:
+                        notify("Некоректний розклад повторення")
+                        return
+                    repeat_dropdown.value = "none"
+                    schedule_input.visible = False
+                expense_input.value = ""
+                await warn_if_over_budget(category_dropdown.value, selected_date)
+                await refresh_budget()
+                await reload_expenses()
+                await monthly_stats.update_view()  # Update monthly stats when new expense is added
+                await trends.update_view()
 
     expense_input = ft.TextField(
         label="Сума витрати",
@@ -320,6 +516,74 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
         focused_border_color=ExpColors.LIGHT_GREEN,
         color=ExpColors.LIGHT_YELLOW,
         label_style=ft.TextStyle(color=ExpColors.LIGHT_YELLOW),
+        on_change=refresh_budget,
+    )
+
+    budget_input = ft.TextField(
+        label="Місячний бюджет",
+        keyboard_type=ft.KeyboardType.NUMBER,
+        prefix_text="₴",
+        width=200,
+        border_color=ExpColors.LIGHT_YELLOW,
+        focused_border_color=ExpColors.LIGHT_GREEN,
+        color=ExpColors.LIGHT_YELLOW,
+        cursor_color=ExpColors.LIGHT_YELLOW,
+        label_style=ft.TextStyle(color=ExpColors.LIGHT_YELLOW),
+        hint_text="Порожньо - без бюджету",
+        hint_style=ft.TextStyle(color=ExpColors.LIGHT_GREEN),
+        on_submit=set_budget_click,
+    )
+
+    budget_text = ft.Text("", size=14, color=ExpColors.LIGHT_GREEN)
+
+    def toggle_schedule_input(e: Any):
+        schedule_input.visible = repeat_dropdown.value == "custom"
+        page.update()
+
+    repeat_dropdown = ft.Dropdown(
+        label="Повторювати",
+        width=200,
+        value="none",
+        options=[
+            ft.dropdown.Option(key="none", text="Без повторення"),
+            ft.dropdown.Option(key="daily", text="Щодня"),
+            ft.dropdown.Option(key="weekly", text="Щотижня"),
+            ft.dropdown.Option(key="monthly", text="Щомісяця"),
+            ft.dropdown.Option(key="custom", text="Свій розклад"),
+        ],
+        border_color=ExpColors.LIGHT_YELLOW,
+        focused_border_color=ExpColors.LIGHT_GREEN,
+        color=ExpColors.LIGHT_YELLOW,
+        label_style=ft.TextStyle(color=ExpColors.LIGHT_YELLOW),
+        on_change=toggle_schedule_input,
+    )
+
+    schedule_input = ft.TextField(
+        label="Розклад",
+        width=200,
+        visible=False,
+        border_color=ExpColors.LIGHT_YELLOW,
+        focused_border_color=ExpColors.LIGHT_GREEN,
+        color=ExpColors.LIGHT_YELLOW,
+        cursor_color=ExpColors.LIGHT_YELLOW,
+        label_style=ft.TextStyle(color=ExpColors.LIGHT_YELLOW),
+        hint_text="день місяць день_тижня, напр. 1,15 * *",
+        hint_style=ft.TextStyle(color=ExpColors.LIGHT_GREEN),
+    )
+
+    budget_row = ft.Row(
+        [
+            budget_input,
+            ft.IconButton(
+                icon=ft.Icons.SAVINGS,
+                tooltip="Зберегти бюджет категорії",
+                icon_color=ExpColors.LIGHT_YELLOW,
+                on_click=set_budget_click,
+            ),
+            budget_text,
+        ],
+        alignment=ft.MainAxisAlignment.START,
+        spacing=10,
     )
 
     add_category_button = ft.IconButton(
@@ -339,8 +603,7 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
                         ft.ElevatedButton(
                             "Додати категорію",
                             on_click=add_category_click,
-                            style=ft.ButtonStyle(
-                                bgcolor=ExpColors.SUPER_DARK_GREEN, color=ExpColors.LIGHT_YELLOW),
+                            style=ft.ButtonStyle(bgcolor=ExpColors.SUPER_DARK_GREEN, color=ExpColors.LIGHT_YELLOW),
                             visible=False,
                         ),
                     ],
@@ -353,22 +616,23 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
         spacing=10,
     )
 
-    date_display = ft.Text(
-        f"Дата: {selected_date.strftime('%d/%m/%Y')}", size=16, color=ExpColors.LIGHT_YELLOW)
+    date_display = ft.Text(f"Дата: {selected_date.strftime('%d/%m/%Y')}", size=16, color=ExpColors.LIGHT_YELLOW)
 
     add_expense_button = ft.FilledButton(
         "Додати витрату",
         on_click=add_expense_click,
-        style=ft.ButtonStyle(
-            bgcolor=ExpColors.SUPER_DARK_GREEN, color=ExpColors.LIGHT_YELLOW),
+        style=ft.ButtonStyle(bgcolor=ExpColors.SUPER_DARK_GREEN, color=ExpColors.LIGHT_YELLOW),
     )
 
+    progress = ft.ProgressBar(visible=False, color=ExpColors.LIGHT_YELLOW, bgcolor=ExpColors.GREEN)
+
     def handle_change(e):
         nonlocal selected_date
         if e.control.value:
             selected_date = e.control.value
             date_display.value = f"Дата: {selected_date.strftime('%d/%m/%Y')}"
             page.update()
+            page.run_task(refresh_budget)
 
     def handle_dismissal(e):
         pass
@@ -384,15 +648,16 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
                 on_dismiss=handle_dismissal,
             )
         ),
-        style=ft.ButtonStyle(
-            bgcolor=ExpColors.SUPER_DARK_GREEN, color=ExpColors.LIGHT_YELLOW),
+        style=ft.ButtonStyle(bgcolor=ExpColors.SUPER_DARK_GREEN, color=ExpColors.LIGHT_YELLOW),
     )
 
-    def delete_expense(expense_id: int):
-        Expense.delete_expense(expense_id)
-        expense_list.controls = build_expense_rows()
-        monthly_stats.update_view()  # Update monthly stats when expense is deleted
-        expense_list.update()
+    async def delete_expense(expense_id: int, e: Any):
+        with busy(page, progress):
+            await AsyncExpense.delete_expense(expense_id)
+            await refresh_budget()
+            await reload_expenses()
+            await monthly_stats.update_view()  # Update monthly stats when expense is deleted
+            await trends.update_view()
 
     def show_edit_dialog(expense: dict):
         edit_category_dropdown = ft.Dropdown(
@@ -419,10 +684,8 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
             label_style=ft.TextStyle(color=ExpColors.LIGHT_YELLOW),
         )
 
-        edit_date = datetime.strptime(
-            expense["date"].strftime("%d/%m/%Y"), "%d/%m/%Y")
-        edit_date_display = ft.Text(
-            f"Дата: {edit_date.strftime('%d/%m/%Y')}", size=16, color=ExpColors.LIGHT_YELLOW)
+        edit_date = datetime.strptime(expense["date"].strftime("%d/%m/%Y"), "%d/%m/%Y")
+        edit_date_display = ft.Text(f"Дата: {edit_date.strftime('%d/%m/%Y')}", size=16, color=ExpColors.LIGHT_YELLOW)
 
         def handle_edit_date_change(e):
             nonlocal edit_date
@@ -442,20 +705,21 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
                     on_dismiss=lambda _: None,
                 )
             ),
-            style=ft.ButtonStyle(
-                bgcolor=ExpColors.SUPER_DARK_GREEN, color=ExpColors.LIGHT_YELLOW),
+            style=ft.ButtonStyle(bgcolor=ExpColors.SUPER_DARK_GREEN, color=ExpColors.LIGHT_YELLOW),
         )
 
-        def save_edit(e):
+        async def save_edit(e):
             if edit_category_dropdown.value and edit_amount_input.value:
                 try:
                     amount = float(edit_amount_input.value)
-                    Expense.update_expense(
-                        expense["expense_id"], edit_category_dropdown.value, amount, edit_date.strftime(
-                            "%d/%m/%Y")
+                    await AsyncExpense.update_expense(
+                        expense["expense_id"], edit_category_dropdown.value, amount, edit_date.strftime("%d/%m/%Y")
                     )
-                    expense_list.controls = build_expense_rows()
-                    monthly_stats.update_view()
+                    await warn_if_over_budget(edit_category_dropdown.value, edit_date)
+                    await refresh_budget()
+                    await reload_expenses()
+                    await monthly_stats.update_view()
+                    await trends.update_view()
                     page.dialog = None  # Close dialog
                     page.update()
                 except ValueError:
@@ -484,8 +748,7 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
                 ft.FilledButton(
                     "Зберегти",
                     on_click=save_edit,
-                    style=ft.ButtonStyle(
-                        bgcolor=ExpColors.SUPER_DARK_GREEN, color=ExpColors.LIGHT_YELLOW),
+                    style=ft.ButtonStyle(bgcolor=ExpColors.SUPER_DARK_GREEN, color=ExpColors.LIGHT_YELLOW),
                 ),
             ],
             bgcolor=ExpColors.DARK_GREEN,
@@ -494,9 +757,7 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
         page.dialog = edit_dialog
         page.update()
 
-    def build_expense_rows():
-        db_expenses = Expense.get_all_user_expenses()
-        db_expenses.sort(key=lambda x: x["date"], reverse=True)
+    def build_expense_rows(db_expenses: list[dict]):
         rows = []
 
         for expense in db_expenses:
@@ -519,8 +780,7 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
                     ft.IconButton(
                         icon=ft.Icons.DELETE,
                         tooltip="Видалити",
-                        on_click=lambda e, id=expense["expense_id"]: delete_expense(
-                            id),
+                        on_click=partial(delete_expense, expense["expense_id"]),
                         icon_color=ExpColors.LIGHT_YELLOW,
                     ),
                 ],
@@ -530,6 +790,45 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
 
         return rows
 
+    history_cursor = None
+    history_exhausted = False
+    history_loading = False  # a scroll event must not fetch the page that is already being fetched
+
+    def show_expenses_page(expenses_page: list[dict], cursor: tuple[int, int] | None):
+        nonlocal history_cursor, history_exhausted
+        history_cursor = cursor
+        history_exhausted = cursor is None
+        expense_list.controls.extend(build_expense_rows(expenses_page))
+        # A page too short to fill the list cannot be scrolled, so scrolling alone would never load the next one.
+        load_more_button.visible = not history_exhausted
+
+    async def load_more_expenses():
+        nonlocal history_loading
+        if history_exhausted or history_loading:
+            return
+        history_loading = True
+        try:
+            show_expenses_page(*await AsyncExpense.get_expenses_page(HISTORY_PAGE_SIZE, history_cursor))
+        finally:
+            history_loading = False
+
+    async def reload_expenses():
+        nonlocal history_cursor, history_exhausted
+        history_cursor = None
+        history_exhausted = False
+        expense_list.controls = []
+        await load_more_expenses()
+
+    async def handle_history_scroll(e: ft.OnScrollEvent):
+        if history_exhausted or e.pixels < e.max_scroll_extent - HISTORY_LOAD_THRESHOLD:
+            return
+        await load_more_expenses()
+        page.update()
+
+    async def load_more_click(e: Any):
+        await load_more_expenses()
+        page.update()
+
     def update_category_visibility(visible: bool):
         new_category_input.visible = visible
         category_row.controls[2].visible = visible
@@ -537,18 +836,19 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
             new_category_input.focus()
         page.update()
 
-    add_category_button.on_click = lambda e: update_category_visibility(
-        not new_category_input.visible)
+    add_category_button.on_click = lambda e: update_category_visibility(not new_category_input.visible)
 
     add_expense_container = ft.Container(
         content=ft.Column(
             [
-                ft.Text("Додати нову витрату", size=20,
-                        weight="bold", color=ExpColors.LIGHT_YELLOW),
+                ft.Text("Додати нову витрату", size=20, weight="bold", color=ExpColors.LIGHT_YELLOW),
                 expense_input,
                 category_row,
+                budget_row,
                 ft.Row([date_display, date_icon_button]),
+                ft.Row([repeat_dropdown, schedule_input], spacing=10),
                 add_expense_button,
+                progress,
             ],
             spacing=10,
         ),
@@ -560,13 +860,20 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
     )
 
     expense_list = ft.ListView(
-        spacing=10, padding=20, auto_scroll=True, expand=True)
-    expense_list.controls = build_expense_rows()
+        spacing=10, padding=20, expand=True, on_scroll=handle_history_scroll, on_scroll_interval=100
+    )
+    load_more_button = ft.TextButton(
+        "Показати ще", on_click=load_more_click, style=ft.ButtonStyle(color=ExpColors.LIGHT_YELLOW)
+    )
+    show_expenses_page(*Expense.get_expenses_page(HISTORY_PAGE_SIZE))
 
     expenses_history_container = ft.Container(
         content=ft.Column(
-            [ft.Text("Історія витрат", size=20, weight="bold",
-                     color=ExpColors.LIGHT_YELLOW), expense_list],
+            [
+                ft.Text("Історія витрат", size=20, weight="bold", color=ExpColors.LIGHT_YELLOW),
+                expense_list,
+                load_more_button,
+            ],
             spacing=10,
             expand=True,
         ),
@@ -578,13 +885,23 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
         bgcolor=ExpColors.DARK_GREEN,
     )
 
+    def logout_click(e: Any):
+        Auth.logout_user()
+        page.go("/")
+
     app_bar = ft.AppBar(
         title=ft.Text("Фінансовий трекер", color=ExpColors.LIGHT_YELLOW),
         center_title=True,
         bgcolor=ExpColors.SUPER_DARK_GREEN,
+        actions=[
+            ft.IconButton(
+                icon=ft.Icons.LOGOUT, tooltip="Вийти", on_click=logout_click, icon_color=ExpColors.LIGHT_YELLOW
+            ),
+        ],
     )
 
     monthly_stats = MonthlyStatsView(page)
+    trends = TrendsView(page)
 
     tabs = ft.Tabs(
         selected_index=0,
@@ -593,14 +910,18 @@ def expense_view(page: ft.Page, params: Params, basket: Basket) -> ft.View:
             ft.Tab(
                 text="Витрати",
                 icon=ft.Icons.PAID,
-                content=ft.Column(
-                    [add_expense_container, expenses_history_container], spacing=10, expand=True),
+                content=ft.Column([add_expense_container, expenses_history_container], spacing=10, expand=True),
             ),
             ft.Tab(
                 text="Місячна статистика",
                 icon=ft.Icons.CALENDAR_MONTH,
                 content=monthly_stats.build_monthly_view(),
             ),
+            ft.Tab(
+                text="Тренди",
+                icon=ft.Icons.TRENDING_UP,
+                content=trends.build_trends_view(),
+            ),
         ],
         indicator_color=ExpColors.LIGHT_GREEN,
         label_color=ExpColors.LIGHT_YELLOW,
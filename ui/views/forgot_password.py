@@ -8,15 +8,15 @@ from flet_route import Basket, Params  # type: ignore[import-not-found]
 from auth import Auth
 from auth.exceptions import ConfirmCodeError
 from colors import LC
-from database.utils import Utils
+from database import AsyncUtils, run_blocking
+from ui.components.progress import busy
 
 
 def forgot_password_page(page: ft.Page, params: Params, basket: Basket) -> ft.View:
     page.title = "Відновлення паролю"
     page.window.width = 800
     page.window.height = 600
-    page.theme = ft.Theme(text_theme=ft.TextTheme(
-        body_medium=ft.TextStyle(color=LC.LIGHT_YELLOW)))
+    page.theme = ft.Theme(text_theme=ft.TextTheme(body_medium=ft.TextStyle(color=LC.LIGHT_YELLOW)))
 
     def show_notification(message: str, is_error: bool = False) -> None:
         page.snack_bar = ft.SnackBar(
@@ -40,10 +40,13 @@ def forgot_password_page(page: ft.Page, params: Params, basket: Basket) -> ft.Vi
             return False, "Пароль повинен містити хоча б один спеціальний символ"
         return True, ""
 
-    def send_code(e: Any) -> None:
-        email = Utils.get_user_email(Auth.blocked_user)
+    progress = ft.ProgressRing(visible=False, width=20, height=20, color=LC.LIGHT_YELLOW)
+
+    async def send_code(e: Any) -> None:
         try:
-            Auth.send_confirmation_email(email)
+            with busy(page, progress, send_code_button):
+                email = await AsyncUtils.get_user_email(Auth.blocked_user)
+                await run_blocking(Auth.send_confirmation_email, email)
             show_notification("Код підтвердження надіслано на вашу пошту")
             code_field.disabled = False
             new_password.disabled = False
@@ -65,18 +68,15 @@ def forgot_password_page(page: ft.Page, params: Params, basket: Basket) -> ft.Vi
             reset_button.disabled = True
             page.update()
 
-    def reset_password(e: Any) -> None:
-        email = Utils.get_user_email(Auth.blocked_user)
+    async def reset_password(e: Any) -> None:
+        email = await AsyncUtils.get_user_email(Auth.blocked_user)
         code = code_field.value
         new_pass = new_password.value
         confirm_pass = confirm_password.value
 
         if not code:
-            error_dialog = ft.AlertDialog(
-                title=ft.Text("Помилка"),
-                content=ft.Text("Введіть код")
-            )
-            page.open(error_dialog)  
+            error_dialog = ft.AlertDialog(title=ft.Text("Помилка"), content=ft.Text("Введіть код"))
+            page.open(error_dialog)
             return
 
         if not all([email, code, new_pass, confirm_pass]):
@@ -92,8 +92,9 @@ def forgot_password_page(page: ft.Page, params: Params, basket: Basket) -> ft.Vi
             show_notification(error_msg, True)
             return
         try:
-            Auth.reset_password(email, code, new_pass)
-            Utils.unblock_user(Auth.blocked_user)
+            with busy(page, progress, reset_button):
+                await run_blocking(Auth.reset_password, email, code, new_pass)
+                await AsyncUtils.unblock_user(Auth.blocked_user)
             show_notification("Пароль успішно змінено!")
             code_field.value = ""
             new_password.value = ""
@@ -105,11 +106,8 @@ def forgot_password_page(page: ft.Page, params: Params, basket: Basket) -> ft.Vi
             page.update()
             page.go("/")
         except ConfirmCodeError as err:
-            error_dialog = ft.AlertDialog(
-                title=ft.Text("Помилка"),
-                content=ft.Text("Неправильний код підтвердження")
-            )
-            page.open(error_dialog)  
+            error_dialog = ft.AlertDialog(title=ft.Text("Помилка"), content=ft.Text("Неправильний код підтвердження"))
+            page.open(error_dialog)
             return
 
     def back_to_login(e: Any) -> None:
@@ -132,17 +130,19 @@ def forgot_password_page(page: ft.Page, params: Params, basket: Basket) -> ft.Vi
         disabled=True,
     )
 
+    send_code_button = ft.ElevatedButton(
+        "Надіслати код",
+        on_click=send_code,
+        bgcolor=LC.SUPER_DARK_GREEN,
+        color=LC.LIGHT_YELLOW,
+        height=40,
+        width=130,
+    )
+
     code_row = ft.Row(
         controls=[
             code_field,
-            ft.ElevatedButton(
-                "Надіслати код",
-                on_click=send_code,
-                bgcolor=LC.SUPER_DARK_GREEN,
-                color=LC.LIGHT_YELLOW,
-                height=40,
-                width=130,
-            ),
+            send_code_button,
         ],
         spacing=10,
         alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
@@ -191,7 +191,7 @@ def forgot_password_page(page: ft.Page, params: Params, basket: Basket) -> ft.Vi
             new_password,
             confirm_password,
             ft.Container(height=10),
-            ft.Row([reset_button], alignment=ft.MainAxisAlignment.CENTER),
+            ft.Row([reset_button, progress], alignment=ft.MainAxisAlignment.CENTER),
             ft.Row([back_button], alignment=ft.MainAxisAlignment.CENTER),
         ],
         spacing=15,
@@ -201,8 +201,7 @@ def forgot_password_page(page: ft.Page, params: Params, basket: Basket) -> ft.Vi
 
     main_container = ft.Container(
         content=ft.Column(
-            [ft.Container(content=title, padding=ft.padding.only(
-                bottom=30)), form_column],
+            [ft.Container(content=title, padding=ft.padding.only(bottom=30)), form_column],
             alignment=ft.MainAxisAlignment.CENTER,
             horizontal_alignment=ft.CrossAxisAlignment.CENTER,
         ),
@@ -210,8 +209,7 @@ def forgot_password_page(page: ft.Page, params: Params, basket: Basket) -> ft.Vi
         alignment=ft.alignment.center,
         bgcolor=ft.Colors.BLACK,
         gradient=ft.LinearGradient(
-            colors=[LC.SUPER_DARK_GREEN,
-                    LC.DARK_GREEN], begin=ft.alignment.top_left, end=ft.alignment.bottom_right
+            colors=[LC.SUPER_DARK_GREEN, LC.DARK_GREEN], begin=ft.alignment.top_left, end=ft.alignment.bottom_right
         ),
         padding=ft.padding.all(20),
     )
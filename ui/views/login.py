@@ -7,15 +7,15 @@ from flet_route import Basket, Params  # type: ignore[import-not-found]
 
 from auth import Auth
 from colors import LC
-from database import Utils
+from database import AsyncUtils, run_blocking
+from ui.components.progress import busy
 
 
 def login_page(page: ft.Page, params: Params, basket: Basket) -> ft.View:
     page.title = "Логін"
     page.window.width = 800
     page.window.height = 600
-    page.theme = ft.Theme(text_theme=ft.TextTheme(
-        body_medium=ft.TextStyle(color=LC.LIGHT_YELLOW)))
+    page.theme = ft.Theme(text_theme=ft.TextTheme(body_medium=ft.TextStyle(color=LC.LIGHT_YELLOW)))
 
     title = ft.Text(
         "Вітаємо в Трекері Фінансів!",
@@ -47,25 +47,27 @@ def login_page(page: ft.Page, params: Params, basket: Basket) -> ft.View:
     # Лічильник спроб
     attempts = 0
 
-    def login_click(e: Any) -> None:
+    progress = ft.ProgressRing(visible=False, width=20, height=20, color=LC.LIGHT_YELLOW)
+
+    async def login_click(e: Any) -> None:
         nonlocal attempts
         username_val = username.value
         Auth.blocked_user = username_val
         print("Auth.blocked_user", Auth.blocked_user)
-        user_status = Utils.get_user_status(username_val)
+        with busy(page, progress, login_button):
+            user_status = await AsyncUtils.get_user_status(username_val)
         if user_status == 1:
-            page.open(ft.SnackBar(
-                ft.Text("Акаунт заблокований. Спробуйте відновити пароль.")))
+            page.open(ft.SnackBar(ft.Text("Акаунт заблокований. Спробуйте відновити пароль.")))
             return
         if attempts >= 3:
-            page.open(ft.SnackBar(
-                ft.Text("Акаунт заблокований. Спробуйте відновити пароль.")))
-            Utils.block_user(username_val)
+            page.open(ft.SnackBar(ft.Text("Акаунт заблокований. Спробуйте відновити пароль.")))
+            await AsyncUtils.block_user(username_val)
             page.update()
             return
 
         try:
-            Auth.login_user(username_val, password.value)
+            with busy(page, progress, login_button):
+                await run_blocking(Auth.login_user, username_val, password.value)
             page.open(ft.SnackBar(ft.Text("Логін успішний!")))
             page.update()
             page.go("/expenses")
@@ -73,12 +75,10 @@ def login_page(page: ft.Page, params: Params, basket: Basket) -> ft.View:
             attempts += 1
             if attempts < 3:
                 page.open(
-                    ft.SnackBar(ft.Text(
-                        f"Пароль або ім'я користувача неправильні. Залишилось спроб: {3 - attempts}"))
+                    ft.SnackBar(ft.Text(f"Пароль або ім'я користувача неправильні. Залишилось спроб: {3 - attempts}"))
                 )
             else:
-                page.open(ft.SnackBar(
-                    ft.Text("Обліковий запис заблоковано. Спробуйте скинути пароль.")))
+                page.open(ft.SnackBar(ft.Text("Обліковий запис заблоковано. Спробуйте скинути пароль.")))
             page.update()
 
     def forgot_password(e: Any) -> None:
@@ -118,9 +118,8 @@ def login_page(page: ft.Page, params: Params, basket: Basket) -> ft.View:
             [
                 username,
                 password,
-                ft.Row([login_button], alignment=ft.MainAxisAlignment.CENTER),
-                ft.Row([forgot_button, register_button],
-                       alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+                ft.Row([login_button, progress], alignment=ft.MainAxisAlignment.CENTER),
+                ft.Row([forgot_button, register_button], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
                 attempt_text,
             ],
             alignment=ft.MainAxisAlignment.CENTER,
@@ -146,8 +145,7 @@ def login_page(page: ft.Page, params: Params, basket: Basket) -> ft.View:
         alignment=ft.alignment.center,
         bgcolor=ft.Colors.BLACK,
         gradient=ft.LinearGradient(
-            colors=[LC.SUPER_DARK_GREEN,
-                    LC.DARK_GREEN], begin=ft.alignment.top_left, end=ft.alignment.bottom_right
+            colors=[LC.SUPER_DARK_GREEN, LC.DARK_GREEN], begin=ft.alignment.top_left, end=ft.alignment.bottom_right
         ),
     )
 
@@ -8,6 +8,8 @@ from flet_route import Basket, Params  # type: ignore[import-not-found]
 
 from auth import Auth
 from colors import RC
+from database import run_blocking
+from ui.components.progress import busy
 from . import confirmation as conf
 
 
@@ -65,8 +67,7 @@ def register_page(page: ft.Page, params: Params, basket: Basket) -> ft.View:
     page.title = "Реєстрація"
     page.window.width = 800
     page.window.height = 700
-    page.theme = ft.Theme(text_theme=ft.TextTheme(
-        body_medium=ft.TextStyle(color=RC.LIGHT_YELLOW)))
+    page.theme = ft.Theme(text_theme=ft.TextTheme(body_medium=ft.TextStyle(color=RC.LIGHT_YELLOW)))
 
     username_error = ft.Text("", color="red", size=12)
     email_error = ft.Text("", color="red", size=12)
@@ -153,38 +154,37 @@ def register_page(page: ft.Page, params: Params, basket: Basket) -> ft.View:
     def login_click(e: Any) -> None:
         page.go("/")
 
-    def register(e: Any) -> None:
+    progress = ft.ProgressRing(visible=False, width=20, height=20, color=RC.LIGHT_YELLOW)
+
+    async def register(e: Any) -> None:
         if not validate_inputs():
-            error_dialog = ft.AlertDialog(
-                    title=ft.Text("Помилка"),
-                    content=ft.Text("Заповніть поля")
-                )
-            page.open(error_dialog)             
+            error_dialog = ft.AlertDialog(title=ft.Text("Помилка"), content=ft.Text("Заповніть поля"))
+            page.open(error_dialog)
             return
 
         username_val = username.value
         email_val = email.value
 
-        if Auth.check_user_name_exists(username_val):
-            error_dialog = ft.AlertDialog(
-                    title=ft.Text("Помилка"),
-                    content=ft.Text("Ім'я вже зайняте")
-                )
-            page.open(error_dialog)  
+        with busy(page, progress, reg_button):
+            name_taken = await run_blocking(Auth.check_user_name_exists, username_val)
+            email_taken = not name_taken and await run_blocking(Auth.check_email_exists, email_val)
+
+        if name_taken:
+            error_dialog = ft.AlertDialog(title=ft.Text("Помилка"), content=ft.Text("Ім'я вже зайняте"))
+            page.open(error_dialog)
             return
 
-        if Auth.check_email_exists(email_val):
-            error_dialog = ft.AlertDialog(
-                    title=ft.Text("Помилка"),
-                    content=ft.Text("Пошта вже зайнята")
-                )
-            page.open(error_dialog)  
+        if email_taken:
+            error_dialog = ft.AlertDialog(title=ft.Text("Помилка"), content=ft.Text("Пошта вже зайнята"))
+            page.open(error_dialog)
             return
 
+        with busy(page, progress, reg_button):
+            hash_password = await run_blocking(Auth.hash_password, password.value)
         conf.REGISTER_DATA = {
             "username": username_val,
             "email": email_val,
-            "hash_password": Auth.hash_password(password.value),
+            "hash_password": hash_password,
         }
         page.go("/confirmation")
 
@@ -210,9 +210,8 @@ def register_page(page: ft.Page, params: Params, basket: Basket) -> ft.View:
                 password_error,
                 repeat_password,
                 repeat_password_error,
-                ft.Row([reg_button], alignment=ft.MainAxisAlignment.CENTER),
-                ft.Row([login_button],
-                       alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+                ft.Row([reg_button, progress], alignment=ft.MainAxisAlignment.CENTER),
+                ft.Row([login_button], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
             ],
             alignment=ft.MainAxisAlignment.CENTER,
             spacing=10,
@@ -237,8 +236,7 @@ def register_page(page: ft.Page, params: Params, basket: Basket) -> ft.View:
         alignment=ft.alignment.center,
         bgcolor=ft.Colors.BLACK,
         gradient=ft.LinearGradient(
-            colors=[RC.SUPER_DARK_GREEN,
-                    RC.DARK_GREEN], begin=ft.alignment.top_left, end=ft.alignment.bottom_right
+            colors=[RC.SUPER_DARK_GREEN, RC.DARK_GREEN], begin=ft.alignment.top_left, end=ft.alignment.bottom_right
         ),
     )
 
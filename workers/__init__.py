@@ -0,0 +1,3 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+from .pools import SpawnPool
@@ -0,0 +1,25 @@
+# Copyright (c) 2025 ililihayy. All rights reserved.
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+class SpawnPool:
+    """
+    A process pool started on first use and shared by every thread that submits to it,
+    for CPU-bound work such as bcrypt and bulk decryption.
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+
+    def get(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that runs the Flet and database threads is not safe
+                context = multiprocessing.get_context("spawn")
+                self._executor = ProcessPoolExecutor(self.max_workers, mp_context=context)
+            return self._executor